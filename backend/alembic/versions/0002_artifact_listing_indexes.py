@@ -0,0 +1,39 @@
+"""artifact listing indexes
+
+Revision ID: 0002_artifact_listing_indexes
+Revises: 0001_create_artifacts
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0002_artifact_listing_indexes"
+down_revision = "0001_create_artifacts"
+branch_labels = None
+depends_on = None
+
+# Summary-listing columns, INCLUDEd on PostgreSQL for index-only scans.
+_INCLUDE = ["kind", "status", "object_key", "updated_at"]
+
+_INDEXES = [
+    ("ix_artifacts_created_at_id", ["created_at", "id"]),
+    ("ix_artifacts_kind_created_at_id", ["kind", "created_at", "id"]),
+    ("ix_artifacts_status_created_at_id", ["status", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps a large artifacts table writable while the indexes build;
+    # it can't run inside a transaction, hence the autocommit block.
+    with op.get_context().autocommit_block():
+        for name, columns in _INDEXES:
+            op.create_index(name, "artifacts", columns, postgresql_include=_INCLUDE, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _columns in reversed(_INDEXES):
+            op.drop_index(name, table_name="artifacts", postgresql_concurrently=True)
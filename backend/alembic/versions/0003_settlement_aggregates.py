@@ -0,0 +1,53 @@
+"""settlement aggregates
+
+Revision ID: 0003_settlement_aggregates
+Revises: 0002_artifact_listing_indexes
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_settlement_aggregates"
+down_revision = "0002_artifact_listing_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "settlement_aggregates",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("channel", sa.String(length=64), nullable=False, server_default="*"),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column("total_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("total_amount", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("success_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("success_amount", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("failed_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("pending_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("success_rate", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("batches", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(timezone=False), nullable=False, server_default=sa.text("now()")),
+        sa.Column("updated_at", sa.DateTime(timezone=False), nullable=False, server_default=sa.text("now()")),
+        sa.UniqueConstraint("month", "channel", name="uq_settlement_aggregates_month_channel"),
+    )
+
+    op.create_table(
+        "settlement_batches",
+        sa.Column("batch_id", sa.String(length=128), primary_key=True),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("rows", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("applied_at", sa.DateTime(timezone=False), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_settlement_batches_month", "settlement_batches", ["month"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_settlement_batches_month", table_name="settlement_batches")
+    op.drop_table("settlement_batches")
+    op.drop_table("settlement_aggregates")
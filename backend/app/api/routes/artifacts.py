@@ -1,15 +1,22 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from fastapi import APIRouter
 from fastapi import HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
+from fastapi import Header, Query, Response
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.db import SessionLocal
-from app.models.artifact import Artifact
+from app.core.storage import safe_put_text
+from app.generator.jsonpatch import JsonPatchConflict, JsonPatchError, PatchOp
+from app.generator.spec_patch import patch_spec, validate_spec
+from app.models.artifact import SUMMARY_COLUMNS, Artifact
+from app.renderer.svg import render_svg, spec_hash, svg_cache
 
 router = APIRouter()
 
@@ -28,30 +35,88 @@ class ArtifactOut(BaseModel):
     updated_at: Optional[str] = None
 
 
+def _artifact_out(a: Any) -> ArtifactOut:
+    # Works for ORM rows and for summary rows that lack the heavy columns.
+    return ArtifactOut(
+        id=a.id,
+        kind=a.kind,
+        status=a.status,
+        request=getattr(a, "request", None) or {},
+        spec=getattr(a, "spec", None),
+        mermaid=getattr(a, "mermaid", None),
+        markdown=getattr(a, "markdown", None),
+        object_key=a.object_key,
+        error=getattr(a, "error", None),
+        created_at=a.created_at.isoformat() if a.created_at else None,
+        updated_at=a.updated_at.isoformat() if a.updated_at else None,
+    )
+
+
+def _encode_cursor(created_at: datetime, artifact_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{artifact_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, artifact_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), artifact_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
 @router.get("/", response_model=List[ArtifactOut])
-def list_artifacts(limit: int = 50):
+def list_artifacts(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Literal["full", "summary"] = "full",
+):
+    """Newest first, keyset-paginated on (created_at, id).
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page;
+    the header is absent on the last page. `fields=summary` skips request/spec/
+    mermaid/markdown/error and returns them empty.
+    """
+
+    if fields == "summary":
+        stmt = select(Artifact.id, Artifact.created_at, *(getattr(Artifact, c) for c in SUMMARY_COLUMNS))
+    else:
+        stmt = select(Artifact)
+
+    if kind:
+        stmt = stmt.where(Artifact.kind == kind)
+    if status:
+        stmt = stmt.where(Artifact.status == status)
+    if created_from is not None:
+        stmt = stmt.where(Artifact.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Artifact.created_at < created_to)
+    if cursor:
+        after_created_at, after_id = _decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Artifact.created_at, Artifact.id) < tuple_(after_created_at, after_id))
+
+    # One extra row tells us whether another page exists.
+    stmt = stmt.order_by(Artifact.created_at.desc(), Artifact.id.desc()).limit(limit + 1)
+
     try:
         with SessionLocal() as db:
-            rows = db.execute(select(Artifact).order_by(Artifact.created_at.desc()).limit(limit)).scalars().all()
-            return [
-                ArtifactOut(
-                    id=a.id,
-                    kind=a.kind,
-                    status=a.status,
-                    request=a.request or {},
-                    spec=a.spec,
-                    mermaid=a.mermaid,
-                    markdown=a.markdown,
-                    object_key=a.object_key,
-                    error=a.error,
-                    created_at=a.created_at.isoformat() if a.created_at else None,
-                    updated_at=a.updated_at.isoformat() if a.updated_at else None,
-                )
-                for a in rows
-            ]
+            result = db.execute(stmt)
+            rows = result.all() if fields == "summary" else result.scalars().all()
     except SQLAlchemyError:
         raise HTTPException(status_code=503, detail="database unavailable")
 
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+    return [_artifact_out(a) for a in rows]
+
 
 @router.get("/{artifact_id}", response_model=ArtifactOut)
 def get_artifact(artifact_id: str):
@@ -60,18 +125,75 @@ def get_artifact(artifact_id: str):
             a = db.get(Artifact, artifact_id)
             if a is None:
                 raise HTTPException(status_code=404, detail="artifact not found")
-            return ArtifactOut(
-                id=a.id,
-                kind=a.kind,
-                status=a.status,
-                request=a.request or {},
-                spec=a.spec,
-                mermaid=a.mermaid,
-                markdown=a.markdown,
-                object_key=a.object_key,
-                error=a.error,
-                created_at=a.created_at.isoformat() if a.created_at else None,
-                updated_at=a.updated_at.isoformat() if a.updated_at else None,
-            )
+            return _artifact_out(a)
     except SQLAlchemyError:
         raise HTTPException(status_code=503, detail="database unavailable")
+
+
+@router.patch("/{artifact_id}/spec", response_model=ArtifactOut)
+def patch_artifact_spec(artifact_id: str, ops: List[PatchOp], response: Response):
+    """Apply a JSON Patch (RFC 6902) to a diagram artifact's spec and re-render its Mermaid.
+
+    No LLM call: the patched spec is validated against its type and, for flow specs,
+    only the edited lines are re-rendered (`X-Rerendered-Lines`; absent when the whole
+    diagram was). A failed `test` operation returns 409.
+    """
+
+    try:
+        with SessionLocal() as db:
+            a = db.execute(select(Artifact).where(Artifact.id == artifact_id).with_for_update()).scalar_one_or_none()
+            if a is None:
+                raise HTTPException(status_code=404, detail="artifact not found")
+            if a.kind != "diagram" or not isinstance(a.spec, dict):
+                raise HTTPException(status_code=409, detail="artifact has no diagram spec")
+            try:
+                result = patch_spec(a.spec, a.mermaid, ops)
+            except JsonPatchConflict as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            except (JsonPatchError, ValidationError) as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+            a.spec = result.spec
+            a.mermaid = result.mermaid
+            if a.object_key:
+                # Keep the stored copy in sync (best-effort, like at creation).
+                a.object_key = safe_put_text(a.object_key, result.mermaid) or a.object_key
+            db.commit()
+            if result.rerendered_lines is not None:
+                response.headers["X-Rerendered-Lines"] = str(result.rerendered_lines)
+            return _artifact_out(a)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
+
+
+@router.get("/{artifact_id}/svg", response_class=Response)
+def get_artifact_svg(artifact_id: str, if_none_match: Optional[str] = Header(None)):
+    """The diagram rendered to SVG on the server (no browser-side Mermaid needed).
+
+    Renders are cached by spec hash, which is also the ETag: a matching
+    `If-None-Match` returns 304 without rendering, and a patched spec gets a new tag.
+    """
+
+    try:
+        with SessionLocal() as db:
+            row = db.execute(select(Artifact.kind, Artifact.spec).where(Artifact.id == artifact_id)).first()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
+    if row is None:
+        raise HTTPException(status_code=404, detail="artifact not found")
+    if row.kind != "diagram" or not isinstance(row.spec, dict):
+        raise HTTPException(status_code=409, detail="artifact has no diagram spec")
+
+    key = spec_hash(row.spec)
+    etag = f'"{key}"'
+    # no-cache: clients keep the SVG but revalidate, since the spec can be patched.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        spec = validate_spec(row.spec)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    svg = svg_cache.get_or_render(key, lambda: render_svg(spec))
+    return Response(content=svg, media_type="image/svg+xml", headers=headers)
@@ -1,23 +1,39 @@
 import json
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import ValidationError
 
 from app.generator.diagram import (
+    DiagramBatchRequest,
+    DiagramBatchResponse,
     DiagramGenerateRequest,
     DiagramGenerateResponse,
     DrawioXmlGenerateRequest,
     DrawioXmlGenerateResponse,
 )
-from app.generator.service import generate_diagram, generate_drawio_xml
+from app.api.sse import sse_response
+from app.generator.rules import FastPathUnavailable
+from app.generator.spec import DiagramSpec
+from app.generator.service import (
+    generate_diagram,
+    generate_diagram_batch,
+    generate_drawio_xml,
+    stream_diagram,
+    stream_drawio_xml,
+)
+from app.renderer.mermaid import iter_chunks, iter_render
 
 router = APIRouter()
 
 
 @router.post("/generate", response_model=DiagramGenerateResponse)
-def generate(req: DiagramGenerateRequest):
+async def generate(req: DiagramGenerateRequest):
     try:
-        return generate_diagram(req)
+        return await generate_diagram(req)
+    except FastPathUnavailable as e:
+        # fast_path=true on free text: the request, not the model, is at fault.
+        raise HTTPException(status_code=422, detail=str(e))
     except ValidationError as e:
         # Spec JSON is parseable but doesn't match our schema.
         raise HTTPException(status_code=422, detail=str(e))
@@ -29,11 +45,42 @@ def generate(req: DiagramGenerateRequest):
         raise HTTPException(status_code=502, detail=str(e))
 
 
+@router.post("/batch", response_model=DiagramBatchResponse)
+async def generate_batch(req: DiagramBatchRequest):
+    """Generate many diagrams in one call; per-item errors don't fail the batch."""
+
+    try:
+        return await generate_diagram_batch(req)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @router.post("/drawio-xml", response_model=DrawioXmlGenerateResponse)
-def generate_drawio(req: DrawioXmlGenerateRequest):
+async def generate_drawio(req: DrawioXmlGenerateRequest):
     try:
-        return generate_drawio_xml(req)
+        return await generate_drawio_xml(req)
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=502, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_stream(req: DiagramGenerateRequest):
+    """SSE variant of /generate: `delta` events with model tokens, then `result`."""
+
+    return sse_response(stream_diagram(req))
+
+
+@router.post("/drawio-xml/stream")
+async def generate_drawio_stream(req: DrawioXmlGenerateRequest):
+    """SSE variant of /drawio-xml: `delta` events with model tokens, then `result`."""
+
+    return sse_response(stream_drawio_xml(req))
+
+
+@router.post("/render", response_class=StreamingResponse)
+def render(spec: DiagramSpec):
+    """Render a spec to Mermaid without calling the LLM; the text is streamed as it is produced."""
+
+    return StreamingResponse(iter_chunks(iter_render(spec)), media_type="text/plain; charset=utf-8")
@@ -1,11 +1,19 @@
 from fastapi import APIRouter
 
+from app.api.sse import sse_response
 from app.generator.integration import IntegrationGenerateRequest, IntegrationGenerateResponse
-from app.generator.service import generate_integration_plan
+from app.generator.service import generate_integration_plan, stream_integration_plan
 
 router = APIRouter()
 
 
 @router.post("/generate", response_model=IntegrationGenerateResponse)
-def generate(req: IntegrationGenerateRequest):
-    return generate_integration_plan(req)
+async def generate(req: IntegrationGenerateRequest):
+    return await generate_integration_plan(req)
+
+
+@router.post("/generate/stream")
+async def generate_stream(req: IntegrationGenerateRequest):
+    """SSE variant of /generate: `delta` events with Markdown tokens, then `result`."""
+
+    return sse_response(stream_integration_plan(req))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import time
 from typing import Literal, Optional
 
@@ -7,7 +8,10 @@ from fastapi import APIRouter
 from pydantic import BaseModel, Field
 
 from app.core.settings import settings
+from app.generator.service import single_flight_stats
+from app.llm.cache import llm_cache
 from app.llm.factory import get_provider
+from app.llm.http import pool_stats
 from app.llm.types import ChatMessage, LLMChatRequest
 
 router = APIRouter()
@@ -119,3 +123,28 @@ async def llm_ping() -> dict:
             "latency_ms": elapsed_ms,
             "error": str(e),
         }
+
+
+@router.get("/pool")
+async def llm_pool() -> dict:
+    """Connection pool stats of the shared LLM HTTP clients (one entry per loop + base URL).
+
+    Useful for sizing LLM_HTTP_MAX_CONNECTIONS / LLM_HTTP_MAX_KEEPALIVE under load:
+    a steadily non-zero `requests_waiting` means the pool is too small.
+    """
+
+    return {"clients": pool_stats()}
+
+
+@router.get("/cache")
+async def llm_cache_stats() -> dict:
+    """LLM completion cache counters (hits per tier, misses, evictions, bypasses)."""
+
+    # stats()/clear() talk to Redis or SQLite (clear scans the key space): keep them off the loop.
+    return {**await asyncio.to_thread(llm_cache.stats), "single_flight": single_flight_stats()}
+
+
+@router.delete("/cache")
+async def llm_cache_clear() -> dict:
+    await asyncio.to_thread(llm_cache.clear)
+    return await asyncio.to_thread(llm_cache.stats)
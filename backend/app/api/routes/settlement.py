@@ -1,14 +1,213 @@
+from typing import AsyncIterator, List, Optional
+
 from fastapi import APIRouter
+from fastapi import File, Form, HTTPException, Path, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.settings import settings
+from app.data_pipeline.arrow_input import SettlementFileRequest, compute_settlement_metrics_file
+from app.data_pipeline.groupby import SettlementGroupByRequest, SettlementGroupByResponse, compute_settlement_groupby
+from app.data_pipeline.ingest import SettlementStreamParser, resolve_format
+from app.data_pipeline.parallel import compute_settlement_metrics_parallel, settlement_workers
+from app.data_pipeline.reconcile import LedgerStreamParser, ReconcileOptions, ReconcileResponse, Reconciler
 from app.data_pipeline.settlement import (
+    SettlementColumnarRequest,
     SettlementMetricsRequest,
     SettlementMetricsResponse,
     compute_settlement_metrics,
+    compute_settlement_metrics_columnar,
+)
+from app.data_pipeline.store import (
+    SettlementAggregateOut,
+    SettlementDeltaRequest,
+    SettlementDeltaResponse,
+    apply_settlement_delta,
+    get_settlement_aggregate,
+    list_settlement_aggregates,
+    reset_settlement_month,
 )
+from app.models.settlement import ALL_CHANNELS
 
 router = APIRouter()
 
+_MONTH = Path(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM")
+
+# Bytes collected from the socket before one parse step runs in the threadpool.
+_PARSE_BATCH_BYTES = 1024 * 1024
+
 
 @router.post("/metrics", response_model=SettlementMetricsResponse)
 def metrics(req: SettlementMetricsRequest):
     return compute_settlement_metrics(req)
+
+
+@router.post("/metrics/columnar", response_model=SettlementMetricsResponse)
+def metrics_columnar(
+    req: SettlementColumnarRequest,
+    parallel: Optional[bool] = Query(
+        None, description="shard across worker processes (default: when rows >= SETTLEMENT_PARALLEL_MIN_ROWS)"
+    ),
+):
+    if parallel is None:
+        parallel = len(req.amount) >= settings.SETTLEMENT_PARALLEL_MIN_ROWS and settlement_workers() > 1
+    if parallel:
+        return compute_settlement_metrics_parallel(req)
+    return compute_settlement_metrics_columnar(req)
+
+
+@router.post("/metrics/groupby", response_model=SettlementGroupByResponse)
+def metrics_groupby(req: SettlementGroupByRequest):
+    """Breakdowns (channel / day / status, in any combination) plus amount quantiles, in one pass."""
+
+    return compute_settlement_groupby(req)
+
+
+@router.post("/metrics/file", response_model=SettlementMetricsResponse)
+def metrics_file(req: SettlementFileRequest):
+    """Arrow IPC / Parquet file (local path under SETTLEMENT_DATA_DIR or storage object key),
+    memory-mapped and aggregated column batch by column batch."""
+
+    try:
+        return compute_settlement_metrics_file(req)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"file not found: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _aggregate_chunks(chunks: AsyncIterator[bytes], month: str, fmt: Optional[str]) -> SettlementMetricsResponse:
+    parser = SettlementStreamParser(fmt)
+    batch: list[bytes] = []
+    size = 0
+    try:
+        async for chunk in chunks:
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= _PARSE_BATCH_BYTES:
+                await run_in_threadpool(parser.feed, b"".join(batch))
+                batch, size = [], 0
+        if batch:
+            await run_in_threadpool(parser.feed, b"".join(batch))
+        acc = await run_in_threadpool(parser.close)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return acc.result(month)
+
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(_PARSE_BATCH_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+@router.post("/metrics/upload", response_model=SettlementMetricsResponse)
+async def metrics_upload(
+    month: str = Form(..., description="YYYY-MM"),
+    file: UploadFile = File(..., description="CSV or NDJSON, optionally gzipped"),
+    fmt: Optional[str] = Form(None, alias="format", description="csv | ndjson (default: from file name / content)"),
+):
+    """Multipart upload; rows are folded into the metrics chunk by chunk."""
+
+    try:
+        resolved = resolve_format(fmt, file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await _aggregate_chunks(_iter_upload(file), month, resolved)
+
+
+@router.post("/metrics/stream", response_model=SettlementMetricsResponse)
+async def metrics_stream(
+    request: Request,
+    month: str = Query(..., description="YYYY-MM"),
+    fmt: Optional[str] = Query(None, alias="format", description="csv | ndjson (default: from Content-Type / content)"),
+):
+    """Raw (e.g. chunked) request body; nothing is spooled, the body is parsed as it arrives."""
+
+    try:
+        resolved = resolve_format(fmt, content_type=request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await _aggregate_chunks(request.stream(), month, resolved)
+
+
+@router.post("/reconcile", response_model=ReconcileResponse)
+async def reconcile(
+    ours: UploadFile = File(..., description="our ledger: CSV or NDJSON, optionally gzipped"),
+    theirs: UploadFile = File(..., description="channel statement: CSV or NDJSON, optionally gzipped"),
+    id_field: str = Form("id"),
+    amount_field: str = Form("amount"),
+    tolerance: float = Form(0.005, ge=0),
+    sample_limit: int = Form(20, ge=0, le=1000),
+):
+    """Join both files on transaction id; report matched / amount_mismatch / missing / extra.
+
+    Both uploads are parsed chunk by chunk; large joins spill to disk partitions
+    (RECONCILE_MEMORY_ROWS). For stored objects use POST /api/tasks/settlement/reconcile.
+    """
+
+    try:
+        options = ReconcileOptions(
+            id_field=id_field, amount_field=amount_field, tolerance=tolerance, sample_limit=sample_limit
+        )
+        formats = [resolve_format(None, f.filename, f.content_type) for f in (ours, theirs)]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    rec = Reconciler(options)
+    try:
+        for side, file, fmt in zip(("ours", "theirs"), (ours, theirs), formats):
+            parser = LedgerStreamParser(rec, side, fmt)
+            async for chunk in _iter_upload(file):
+                await run_in_threadpool(parser.feed, chunk)
+            await run_in_threadpool(parser.close)
+        return await run_in_threadpool(rec.finish)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await run_in_threadpool(rec.close)
+
+
+@router.post("/aggregates/{month}/deltas", response_model=SettlementDeltaResponse)
+def apply_delta(req: SettlementDeltaRequest, month: str = _MONTH):
+    """Add new rows to the stored month aggregate (and per-channel ones when `channel` is sent)."""
+
+    try:
+        return apply_settlement_delta(month, req)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
+
+
+@router.get("/aggregates/{month}", response_model=SettlementAggregateOut)
+def get_aggregate(month: str = _MONTH, channel: str = ALL_CHANNELS):
+    try:
+        out = get_settlement_aggregate(month, channel)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
+    if out is None:
+        raise HTTPException(status_code=404, detail="no aggregate for this month/channel")
+    return out
+
+
+@router.get("/aggregates/{month}/channels", response_model=List[SettlementAggregateOut])
+def list_aggregates(month: str = _MONTH):
+    try:
+        return list_settlement_aggregates(month)
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
+
+
+@router.delete("/aggregates/{month}")
+def reset_aggregates(month: str = _MONTH):
+    try:
+        return {"month": month, "deleted": reset_settlement_month(month)}
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="database unavailable")
@@ -1,24 +1,25 @@
 from __future__ import annotations
 
-import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from fastapi import APIRouter
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from app.core.settings import settings
-from app.generator.diagram import DiagramGenerateRequest
+from app.data_pipeline.parallel import compute_settlement_metrics_parallel
+from app.data_pipeline.reconcile import ReconcileObjectsRequest, reconcile_objects
+from app.data_pipeline.settlement import SettlementColumnarRequest, compute_settlement_metrics_columnar
+from app.generator.diagram import DiagramBatchRequest, DiagramGenerateRequest
 from app.generator.integration import IntegrationGenerateRequest
-from app.generator.service import generate_diagram, generate_integration_plan
+from app.generator.service import generate_diagram, generate_diagram_batch, generate_integration_plan
+from app.jobs.broker import broker_monitor
+from app.jobs.inproc import InprocQueueFull, inproc_executor
 
 router = APIRouter()
 
 
-# Dev-friendly fallback when Redis/Celery broker isn't available.
-_INPROC_TASKS: Dict[str, Dict[str, Any]] = {}
-
-
 def _get_celery_app():
     try:
         from app.jobs.celery_app import celery_app  # local import: optional dependency
@@ -49,27 +50,6 @@ def _get_async_result(task_id: str, celery_app):
         )
 
 
-def _celery_broker_available(celery_app) -> bool:
-    url = getattr(celery_app.conf, "broker_url", None)
-    if not url:
-        return False
-
-    try:
-        from kombu import Connection
-        from kombu.exceptions import OperationalError
-
-        with Connection(url, connect_timeout=0.5) as conn:
-            conn.ensure_connection(max_retries=1)
-        return True
-    except OperationalError:
-        return False
-    except ImportError:
-        # kombu isn't installed (often because celery extras aren't installed).
-        return False
-    except Exception:
-        return False
-
-
 class TaskSubmitResponse(BaseModel):
     task_id: str
 
@@ -80,58 +60,165 @@ class TaskStatusResponse(BaseModel):
     result: Optional[Dict[str, Any]] = None
 
 
-@router.post("/diagram", response_model=TaskSubmitResponse)
-def submit_diagram(req: DiagramGenerateRequest):
-    payload = req.model_dump()
+class TaskCancelResponse(BaseModel):
+    task_id: str
+    cancelled: bool
+    state: Optional[str] = None
+
+
+def _celery_mode() -> bool:
+    return (settings.TASK_MODE or "inproc").lower() == "celery"
+
+
+# A send that slips past the breaker while the broker is going down should fail fast
+# and fall back, not sit in kombu's default publish retries.
+_SEND_RETRY_POLICY = {"max_retries": 1, "interval_start": 0, "interval_step": 0.1, "interval_max": 0.1}
+
+
+def _send_task(name: str, payload: dict) -> Callable[[Any], str]:
+    return lambda app: app.send_task(name, kwargs={}, args=[payload], retry_policy=_SEND_RETRY_POLICY).id
+
+
+def _try_celery_send(send: Callable[[Any], str]) -> Optional[str]:
+    """Submit via Celery if configured and the broker looks healthy; None means use the in-process executor.
+
+    Reachability comes from the cached broker monitor state, so a down broker costs
+    nothing here; send failures are reported back to the circuit breaker.
+    """
+
+    if not _celery_mode():
+        return None
+    if not broker_monitor.allow_request():
+        return None
     try:
-        if (settings.TASK_MODE or "inproc").lower() != "celery":
-            raise RuntimeError("TASK_MODE!=celery")
         celery_app = _get_celery_app()
-        if not _celery_broker_available(celery_app):
-            raise RuntimeError("celery broker unavailable")
-        r = celery_app.send_task("pdc.diagram.generate", kwargs={}, args=[payload])
-        return TaskSubmitResponse(task_id=r.id)
+        task_id = send(celery_app)
     except Exception:
-        task_id = f"inproc-{uuid.uuid4()}"
-        try:
-            result = generate_diagram(req).model_dump()
-            _INPROC_TASKS[task_id] = {"state": "SUCCESS", "result": result}
-            return TaskSubmitResponse(task_id=task_id)
-        except Exception as e:
-            _INPROC_TASKS[task_id] = {"state": "FAILURE", "result": {"error": str(e)}}
-            return TaskSubmitResponse(task_id=task_id)
+        broker_monitor.record_failure()
+        return None
+    broker_monitor.record_success()
+    return task_id
+
+
+def _submit_inproc(kind: str, fn: Callable[[], Awaitable[dict]]) -> TaskSubmitResponse:
+    # Dev-friendly fallback when Redis/Celery broker isn't available: returns at once,
+    # the work runs on the bounded in-process executor.
+    try:
+        return TaskSubmitResponse(task_id=inproc_executor.submit(kind, fn))
+    except InprocQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/diagram", response_model=TaskSubmitResponse)
+async def submit_diagram(req: DiagramGenerateRequest):
+    payload = req.model_dump()
+    task_id = await run_in_threadpool(_try_celery_send, _send_task("pdc.diagram.generate", payload))
+    if task_id:
+        return TaskSubmitResponse(task_id=task_id)
+
+    async def _run() -> dict:
+        return (await generate_diagram(req)).model_dump()
+
+    return _submit_inproc("diagram", _run)
+
+
+@router.post("/diagram/batch", response_model=TaskSubmitResponse)
+async def submit_diagram_batch(req: DiagramBatchRequest):
+    if len(req.items) > settings.DIAGRAM_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"batch too large: {len(req.items)} > {settings.DIAGRAM_BATCH_MAX_ITEMS}")
+
+    def _send(_app) -> str:
+        from app.jobs.tasks import submit_diagram_batch as submit_chord  # local import: optional dependency
+
+        return submit_chord([item.model_dump() for item in req.items], persist=req.persist)
+
+    task_id = await run_in_threadpool(_try_celery_send, _send)
+    if task_id:
+        return TaskSubmitResponse(task_id=task_id)
+
+    async def _run() -> dict:
+        return (await generate_diagram_batch(req)).model_dump()
+
+    return _submit_inproc("diagram_batch", _run)
 
 
 @router.post("/integration", response_model=TaskSubmitResponse)
-def submit_integration(req: IntegrationGenerateRequest):
+async def submit_integration(req: IntegrationGenerateRequest):
     payload = req.model_dump()
-    try:
-        if (settings.TASK_MODE or "inproc").lower() != "celery":
-            raise RuntimeError("TASK_MODE!=celery")
-        celery_app = _get_celery_app()
-        if not _celery_broker_available(celery_app):
-            raise RuntimeError("celery broker unavailable")
-        r = celery_app.send_task("pdc.integration.generate", kwargs={}, args=[payload])
-        return TaskSubmitResponse(task_id=r.id)
-    except Exception:
-        task_id = f"inproc-{uuid.uuid4()}"
-        try:
-            result = generate_integration_plan(req).model_dump()
-            _INPROC_TASKS[task_id] = {"state": "SUCCESS", "result": result}
-            return TaskSubmitResponse(task_id=task_id)
-        except Exception as e:
-            _INPROC_TASKS[task_id] = {"state": "FAILURE", "result": {"error": str(e)}}
-            return TaskSubmitResponse(task_id=task_id)
+    task_id = await run_in_threadpool(_try_celery_send, _send_task("pdc.integration.generate", payload))
+    if task_id:
+        return TaskSubmitResponse(task_id=task_id)
+
+    async def _run() -> dict:
+        return (await generate_integration_plan(req)).model_dump()
+
+    return _submit_inproc("integration", _run)
+
+
+@router.post("/settlement/metrics", response_model=TaskSubmitResponse)
+async def submit_settlement_metrics(req: SettlementColumnarRequest):
+    """Columnar settlement metrics as a task: Celery shards it over a chord, the
+    in-process fallback over the settlement process pool."""
+
+    def _send(_app) -> str:
+        from app.jobs.tasks import submit_settlement_metrics as submit_chord  # local import: optional dependency
+
+        return submit_chord(req.month, req.amount, req.status, settings.SETTLEMENT_CELERY_SHARD_ROWS)
+
+    task_id = await run_in_threadpool(_try_celery_send, _send)
+    if task_id:
+        return TaskSubmitResponse(task_id=task_id)
+
+    async def _run() -> dict:
+        if len(req.amount) >= settings.SETTLEMENT_PARALLEL_MIN_ROWS:
+            res = await run_in_threadpool(compute_settlement_metrics_parallel, req)
+        else:
+            res = await run_in_threadpool(compute_settlement_metrics_columnar, req)
+        return res.model_dump()
+
+    return _submit_inproc("settlement_metrics", _run)
+
+
+@router.post("/settlement/reconcile", response_model=TaskSubmitResponse)
+async def submit_settlement_reconcile(req: ReconcileObjectsRequest):
+    """Reconcile two ledgers already in object storage (ours_key vs theirs_key)."""
+
+    payload = req.model_dump()
+    task_id = await run_in_threadpool(_try_celery_send, _send_task("pdc.settlement.reconcile", payload))
+    if task_id:
+        return TaskSubmitResponse(task_id=task_id)
+
+    async def _run() -> dict:
+        return (await run_in_threadpool(reconcile_objects, req)).model_dump()
+
+    return _submit_inproc("settlement_reconcile", _run)
+
+
+@router.get("/inproc/stats")
+def inproc_stats() -> dict:
+    """Queue depth, per-state counts and eviction counters of the in-process executor."""
+
+    return inproc_executor.stats()
+
+
+@router.get("/broker")
+def broker_status() -> dict:
+    """Cached broker health and circuit breaker state (TASK_MODE=celery)."""
+
+    return {"task_mode": (settings.TASK_MODE or "inproc").lower(), **broker_monitor.snapshot()}
 
 
 @router.get("/{task_id}", response_model=TaskStatusResponse)
 def task_status(task_id: str):
-    if task_id in _INPROC_TASKS:
-        item = _INPROC_TASKS[task_id]
-        return TaskStatusResponse(task_id=task_id, state=item.get("state", "PENDING"), result=item.get("result"))
+    item = inproc_executor.get(task_id)
+    if item is not None:
+        return TaskStatusResponse(task_id=task_id, state=item.state, result=item.result)
+    if task_id.startswith("inproc-"):
+        # Unknown or already evicted (see INPROC_RESULT_TTL_SECONDS / INPROC_MAX_RESULTS).
+        raise HTTPException(status_code=404, detail="task not found")
 
     # If we're not in celery mode, we don't have an external task backend.
-    if (settings.TASK_MODE or "inproc").lower() != "celery":
+    if not _celery_mode():
         raise HTTPException(status_code=404, detail="task not found")
 
     celery_app = _get_celery_app()
@@ -141,3 +228,20 @@ def task_status(task_id: str):
     if isinstance(res, BaseException):
         res = {"error": str(res)}
     return TaskStatusResponse(task_id=task_id, state=ar.state, result=res if isinstance(res, dict) else None)
+
+
+@router.delete("/{task_id}", response_model=TaskCancelResponse)
+def cancel_task(task_id: str):
+    if task_id.startswith("inproc-"):
+        cancelled = inproc_executor.cancel(task_id)
+        item = inproc_executor.get(task_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="task not found")
+        return TaskCancelResponse(task_id=task_id, cancelled=cancelled, state=item.state)
+
+    if not _celery_mode():
+        raise HTTPException(status_code=404, detail="task not found")
+
+    celery_app = _get_celery_app()
+    celery_app.control.revoke(task_id)
+    return TaskCancelResponse(task_id=task_id, cancelled=True, state="REVOKED")
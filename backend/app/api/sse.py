@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, Tuple
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from app.generator.rules import FastPathUnavailable
+
+
+def sse_event(event: str, data: Any) -> str:
+    if isinstance(data, BaseModel):
+        data = data.model_dump()
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _error_payload(e: Exception) -> dict:
+    # Mirrors the HTTP status mapping of the blocking routes; the SSE response
+    # itself is already 200 by the time the error happens.
+    if isinstance(e, (ValidationError, FastPathUnavailable)):
+        return {"status": 422, "detail": str(e)}
+    if isinstance(e, json.JSONDecodeError):
+        return {"status": 502, "detail": f"LLM output is not valid JSON: {e}"}
+    if isinstance(e, ValueError):
+        return {"status": 502, "detail": str(e)}
+    return {"status": 502, "detail": f"LLM stream failed: {e}"}
+
+
+def sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """Serve (event, data) pairs as text/event-stream.
+
+    Event types: `delta` ({"text": ...}) per model chunk, or `progress` ({"done", "total"})
+    per section of a chunked long document, then one `result` with the same body as the
+    blocking endpoint, or one `error` ({"status", "detail"}).
+    """
+
+    async def _gen() -> AsyncIterator[str]:
+        try:
+            async for event, data in events:
+                if event == "delta":
+                    data = {"text": data}
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", _error_payload(e))
+
+    return StreamingResponse(
+        _gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable proxy buffering (nginx) so deltas reach the client immediately.
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# One long-lived event loop per process for sync callers (Celery tasks, sync routes).
+# Reusing the loop keeps loop-bound resources such as pooled httpx clients alive
+# across calls instead of paying for a fresh loop (and fresh connections) each time.
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _thread, _pid
+
+    with _lock:
+        # Celery's prefork pool forks workers; a loop thread doesn't survive fork.
+        alive = _loop is not None and not _loop.is_closed() and _thread is not None and _thread.is_alive()
+        if alive and _pid == os.getpid():
+            return _loop  # type: ignore[return-value]
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="pdc-async-loop", daemon=True)
+        thread.start()
+        _loop, _thread, _pid = loop, thread, os.getpid()
+        return loop
+
+
+def background_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Return the background loop if it has been started in this process."""
+
+    if _loop is None or _loop.is_closed() or _pid != os.getpid():
+        return None
+    return _loop
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the shared background loop and block until it finishes."""
+
+    loop = _ensure_loop()
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()  # type: ignore[arg-type]
+
+
+def stop_background_loop(timeout: float = 5.0) -> None:
+    global _loop, _thread, _pid
+
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop, _thread, _pid = None, None, None
+
+    if loop is None or loop.is_closed():
+        return
+
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout=timeout)
+    if not loop.is_running():
+        loop.close()
+
+
+def run_on_loop(loop: asyncio.AbstractEventLoop, coro: Awaitable[Any], timeout: float = 5.0) -> None:
+    """Best-effort: run a cleanup coroutine on the loop that owns a resource."""
+
+    if loop.is_closed():
+        getattr(coro, "close", lambda: None)()
+        return
+    if loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(coro, loop).result(timeout=timeout)  # type: ignore[arg-type]
+        except Exception:
+            pass
+        return
+    try:
+        loop.run_until_complete(coro)
+    except Exception:
+        pass
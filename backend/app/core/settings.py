@@ -75,6 +75,20 @@ class Settings(BaseSettings):
 
     TASK_MODE: str = "inproc"  # inproc | celery
 
+    # In-process task executor (TASK_MODE=inproc or broker unavailable).
+    INPROC_WORKERS: int = 4
+    INPROC_MAX_QUEUE: int = 100
+    INPROC_RESULT_TTL_SECONDS: float = 3600.0
+    INPROC_MAX_RESULTS: int = 1000
+
+    # Broker health (TASK_MODE=celery): probed in the background, never on the request
+    # path. After BROKER_FAILURE_THRESHOLD consecutive failures submissions go to the
+    # in-process executor for BROKER_OPEN_SECONDS before one trial send is allowed.
+    BROKER_PROBE_INTERVAL_SECONDS: float = 5.0
+    BROKER_STATUS_TTL_SECONDS: float = 15.0
+    BROKER_FAILURE_THRESHOLD: int = 2
+    BROKER_OPEN_SECONDS: float = 10.0
+
     OPENAI_COMPAT_BASE_URL: str = ""
     OPENAI_COMPAT_API_KEY: str = ""
     OPENAI_COMPAT_MODEL: str = ""
@@ -84,5 +98,89 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2:1b"
 
+    # Shared keep-alive HTTP pool for LLM providers (one client per base URL).
+    LLM_HTTP_MAX_CONNECTIONS: int = 20
+    LLM_HTTP_MAX_KEEPALIVE: int = 10
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    # Requires the optional `h2` package; silently falls back to HTTP/1.1 otherwise.
+    LLM_HTTP2: bool = False
+
+    # LLM completion cache: in-process LRU + persistent tier (Redis if reachable, else
+    # SQLite under PDC_DATA_DIR). Requests with temperature > 0 are only cached when
+    # LLM_CACHE_SAMPLED is on or the request sends `X-PDC-Cache: force`. Generation
+    # requests (diagram, draw.io, integration plan) always use temperature 0.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    LLM_CACHE_TTL_SECONDS: float = 3600.0
+    LLM_CACHE_PERSISTENT: bool = True
+    LLM_CACHE_PERSISTENT_TTL_SECONDS: float = 7 * 24 * 3600.0
+    LLM_CACHE_PERSISTENT_MAX_ENTRIES: int = 100_000
+    LLM_CACHE_SAMPLED: bool = False
+
+    # Pass the spec JSON schema to the provider's constrained decoding (Ollama `format`,
+    # OpenAI `response_format` / Responses `text.format`); servers that reject it are
+    # retried with plain JSON mode, then prompt-only, and remembered per provider.
+    LLM_STRUCTURED_OUTPUT: bool = True
+    # A downgrade lasts this long (or until the provider is rebuilt by a config change).
+    LLM_STRUCTURED_RETRY_SECONDS: float = 600.0
+
+    # Server-side SVG renders (GET /api/artifacts/{id}/svg), content-addressed by spec
+    # hash: in-process LRU, plus svg/<hash>.svg in object storage when SVG_CACHE_STORE.
+    SVG_CACHE_MAX_ENTRIES: int = 256
+    SVG_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+    SVG_CACHE_STORE: bool = True
+
+    # Single-flight: identical in-flight generation requests share one LLM call.
+    # With TASK_MODE=celery the coalescing also spans worker processes via Redis.
+    SINGLE_FLIGHT_DISTRIBUTED: bool = True
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS: float = 300.0
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: float = 10.0
+
+    # Max concurrent calls per LLM provider for fan-out work such as batch generation.
+    LLM_MAX_CONCURRENCY: int = 4
+    # TASK_MODE=celery: generation tasks also take one of LLM_CLUSTER_MAX_CONCURRENCY
+    # (0 = LLM_MAX_CONCURRENCY) Redis-held slots per provider, shared by all workers; a
+    # task finding none free is re-queued after ~LLM_SLOT_RETRY_SECONDS. A slot counts a
+    # task, so a chunked item's parallel chunk calls share one. Leases of dead workers
+    # expire after LLM_SLOT_LEASE_SECONDS. Not enforced while Redis is unreachable.
+    LLM_CLUSTER_MAX_CONCURRENCY: int = 0
+    LLM_SLOT_LEASE_SECONDS: float = 300.0
+    LLM_SLOT_RETRY_SECONDS: float = 2.0
+    DIAGRAM_BATCH_MAX_ITEMS: int = 100
+    # Already structured text (arrows, numbered steps, `A->>B: msg`) is turned into a
+    # spec by rules, skipping the LLM; per request `fast_path` overrides this.
+    DIAGRAM_FAST_PATH: bool = True
+    # Text longer than DIAGRAM_CHUNK_CHARS is split on section boundaries and extracted
+    # chunk by chunk in parallel (at most DIAGRAM_MAX_CHUNKS calls), then merged into one
+    # spec; 0 disables chunking.
+    DIAGRAM_CHUNK_CHARS: int = 6000
+    DIAGRAM_MAX_CHUNKS: int = 12
+
+    # Integration plans: a swagger_text of at least SWAGGER_INDEX_MIN_CHARS that parses as
+    # Swagger/OpenAPI is replaced in the prompt by a compact index of the (at most
+    # SWAGGER_MAX_OPERATIONS) endpoints relevant to the request. Indexes are cached by
+    # content hash.
+    SWAGGER_INDEX_MIN_CHARS: int = 20_000
+    SWAGGER_MAX_OPERATIONS: int = 40
+    SWAGGER_INDEX_CACHE_ENTRIES: int = 32
+    SWAGGER_INDEX_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Settlement metrics: columnar inputs of at least SETTLEMENT_PARALLEL_MIN_ROWS rows are
+    # sharded across a process pool (0 workers = one per CPU). Celery submissions are
+    # split into chord tasks of SETTLEMENT_CELERY_SHARD_ROWS rows.
+    SETTLEMENT_WORKERS: int = 0
+    SETTLEMENT_PARALLEL_MIN_ROWS: int = 1_000_000
+    SETTLEMENT_CELERY_SHARD_ROWS: int = 1_000_000
+    # Directory that Arrow/Parquet settlement files may be read from by local path
+    # (empty = local paths are refused; object keys in storage always work).
+    SETTLEMENT_DATA_DIR: str = ""
+
+    # Reconciliation: distinct transaction ids held in memory before the join spills
+    # to RECONCILE_PARTITIONS hash partitions under RECONCILE_SPILL_DIR (empty = system temp dir).
+    RECONCILE_MEMORY_ROWS: int = 1_000_000
+    RECONCILE_PARTITIONS: int = 64
+    RECONCILE_SPILL_DIR: str = ""
+
 
 settings = Settings()
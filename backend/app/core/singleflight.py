@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from pydantic import ValidationError
+from pydantic_core import PydanticCustomError
+
+from app.core.settings import settings
+
+T = TypeVar("T")
+
+# _elect outcomes other than a leader's raw result.
+_LEADER = object()
+_LOCAL = object()
+
+
+_RELEASE_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls so they share one underlying execution.
+
+    In-process: callers with the same key await one asyncio task (per event loop).
+    Cross-process (Celery mode): a Redis lock elects one leader; followers poll for
+    the leader's JSON-encoded result. Results are keyed by the leader's lock token, so
+    only callers that were waiting on that leader can read them (a later caller finds
+    no lock and runs its own call), and the last waiter to read one deletes it. A
+    leader's error is re-raised in its followers with the same type (for the
+    ValueError / ValidationError / JSONDecodeError family the routes map to statuses).
+    """
+
+    lock_prefix = "pdc:sf:lock:"
+    result_prefix = "pdc:sf:result:"
+    waiters_prefix = "pdc:sf:waiters:"
+
+    def __init__(self) -> None:
+        self._calls: dict[tuple[int, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_checked_at: Optional[float] = None
+        self.counters = {"leaders": 0, "coalesced": 0, "remote_followers": 0, "remote_errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        encode: Callable[[T], Any],
+        decode: Callable[[Any], T],
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        k = (id(loop), key)
+
+        with self._lock:
+            task = self._calls.get(k)
+            if task is None or task.get_loop() is not loop:
+                task = loop.create_task(self._run(k, fn, encode, decode))
+                task.add_done_callback(_consume_exception)
+                self._calls[k] = task
+                self.counters["leaders"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        # shield: a caller that disconnects must not cancel the work other callers await.
+        return await asyncio.shield(task)
+
+    async def _run(self, k: tuple[int, str], fn, encode, decode):
+        try:
+            if self._distributed_enabled():
+                return await self._run_distributed(k[1], fn, encode, decode)
+            return await fn()
+        finally:
+            with self._lock:
+                if self._calls.get(k) is asyncio.current_task():
+                    self._calls.pop(k, None)
+
+    def _distributed_enabled(self) -> bool:
+        return bool(settings.SINGLE_FLIGHT_DISTRIBUTED) and (settings.TASK_MODE or "inproc").lower() == "celery"
+
+    def _redis_client(self):
+        if self._redis is not None:
+            return self._redis
+        # Don't hammer an unreachable Redis: re-probe at most every 30 s.
+        now = time.monotonic()
+        if self._redis_checked_at is not None and now - self._redis_checked_at < 30:
+            return None
+        self._redis_checked_at = now
+        try:
+            import redis  # local import: optional dependency
+
+            client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.3, socket_timeout=1.0)
+            client.ping()
+            self._redis = client
+        except Exception:
+            self._redis = None
+        return self._redis
+
+    async def _run_distributed(self, key: str, fn, encode, decode):
+        client = await asyncio.to_thread(self._redis_client)
+        if client is None:
+            return await fn()
+
+        lock_key = self.lock_prefix + key
+        token = uuid.uuid4().hex
+        # Only the Redis calls are guarded: errors from fn() (ours or the leader's)
+        # propagate and are never retried with another call.
+        try:
+            raw = await self._elect(client, key, lock_key, token)
+        except Exception:
+            self._count("remote_errors")
+            return await fn()
+        if raw is _LOCAL:
+            # Leader vanished without publishing; compute locally.
+            return await fn()
+        if raw is not _LEADER:
+            self._count("remote_followers")
+            return _decode_remote(raw, decode)
+
+        try:
+            try:
+                result = await fn()
+            except Exception as e:
+                await self._publish(client, key, token, {"error": _encode_error(e)})
+                raise
+            await self._publish(client, key, token, {"result": encode(result)})
+            return result
+        finally:
+            try:
+                await asyncio.to_thread(client.eval, _RELEASE_LOCK_LUA, 1, lock_key, token)
+            except Exception:
+                self._count("remote_errors")
+
+    async def _elect(self, client, key: str, lock_key: str, token: str) -> Any:
+        """Take the lock (_LEADER), or return a leader's raw result, or _LOCAL on timeout."""
+
+        lock_ttl_ms = int(settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS * 1000)
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS
+        delay = 0.05
+        while True:
+            if await asyncio.to_thread(client.set, lock_key, token, nx=True, px=lock_ttl_ms):
+                return _LEADER
+            leader = await asyncio.to_thread(client.get, lock_key)
+            if leader is not None:
+                leader = leader.decode("utf-8") if isinstance(leader, bytes) else leader
+                raw = await self._follow(client, key, leader, deadline)
+                if raw is not None:
+                    return raw
+            if time.monotonic() > deadline:
+                return _LOCAL
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 0.5)
+
+    async def _follow(self, client, key: str, leader: str, deadline: float) -> Optional[Any]:
+        """Wait for `leader`'s result; None once it is gone without one for us (then retry the lock)."""
+
+        result_key = self.result_prefix + key + ":" + leader
+        waiters_key = self.waiters_prefix + key + ":" + leader
+        lock_key = self.lock_prefix + key
+        # Registered before the first poll, so the leader keeps the result until we read it.
+        await asyncio.to_thread(client.incr, waiters_key)
+        await asyncio.to_thread(client.expire, waiters_key, int(settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS) + 1)
+        delay = 0.05
+        try:
+            while time.monotonic() <= deadline:
+                raw = await asyncio.to_thread(client.get, result_key)
+                if raw is not None:
+                    return raw
+                current = await asyncio.to_thread(client.get, lock_key)
+                current = current.decode("utf-8") if isinstance(current, bytes) else current
+                if current != leader:
+                    # Released (or expired) without a result left for us: results are written
+                    # before the release, so check once more, then give up on this leader.
+                    return await asyncio.to_thread(client.get, result_key)
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.5, 0.5)
+            return None
+        finally:
+            remaining = await asyncio.to_thread(client.decr, waiters_key)
+            if remaining <= 0:
+                await asyncio.to_thread(client.delete, result_key, waiters_key)
+
+    async def _publish(self, client, key: str, token: str, payload: dict) -> None:
+        result_key = self.result_prefix + key + ":" + token
+        waiters_key = self.waiters_prefix + key + ":" + token
+        try:
+            data = json.dumps(payload, ensure_ascii=False)
+            # The TTL only matters if a waiter dies before reading; nobody else can see the key.
+            await asyncio.to_thread(client.set, result_key, data, ex=int(settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS))
+            waiting = await asyncio.to_thread(client.get, waiters_key)
+            if not waiting or int(waiting) <= 0:
+                await asyncio.to_thread(client.delete, result_key)
+        except Exception:
+            self._count("remote_errors")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._calls)}
+
+
+def _encode_error(e: Exception) -> dict[str, Any]:
+    # Enough to rebuild the exceptions the routes map to status codes (see _decode_error).
+    out: dict[str, Any] = {"type": f"{e.__class__.__module__}:{e.__class__.__qualname__}", "message": str(e)}
+    if isinstance(e, ValidationError):
+        out["title"] = e.title
+        out["errors"] = [
+            {"type": err["type"], "loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors(include_url=False)
+        ]
+    elif isinstance(e, json.JSONDecodeError):
+        out.update(message=e.msg, doc=e.doc, pos=e.pos)
+    return out
+
+
+def _decode_error(err: Any) -> Exception:
+    if not isinstance(err, dict):  # published by an older worker
+        return RuntimeError(f"coalesced request failed: {err}")
+    kind, message = err.get("type", ""), err.get("message", "")
+    if "errors" in err:
+        return ValidationError.from_exception_data(
+            err.get("title", ""),
+            [
+                {"type": PydanticCustomError(e["type"], e["msg"]), "loc": tuple(e["loc"]), "input": None}
+                for e in err["errors"]
+            ],
+        )
+    if "pos" in err:
+        return json.JSONDecodeError(message, err.get("doc", ""), err["pos"])
+    module, _, name = kind.partition(":")
+    cls: Any = None
+    if module == "builtins" or module.startswith("app."):
+        cls = getattr(importlib.import_module(module), name, None)
+    if isinstance(cls, type) and issubclass(cls, ValueError):
+        try:
+            return cls(message)
+        except Exception:
+            return ValueError(message)
+    return RuntimeError(f"coalesced request failed: {kind.rpartition(':')[2]}: {message}")
+
+
+def _decode_remote(raw: Any, decode: Callable[[Any], T]) -> T:
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    payload = json.loads(raw)
+    if "error" in payload:
+        raise _decode_error(payload["error"])
+    return decode(payload["result"])
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Mark the exception as retrieved when every waiter has already gone away.
+    if not task.cancelled():
+        task.exception()
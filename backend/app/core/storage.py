@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import io
+import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional
 
 from minio import Minio
 from minio.error import S3Error
@@ -33,13 +36,25 @@ def ensure_bucket() -> None:
         client.make_bucket(bucket)
 
 
+def _local_mode() -> bool:
+    return (settings.STORAGE_MODE or "minio").lower() == "local"
+
+
+def _local_path(object_key: str) -> Path:
+    base = settings.LOCAL_STORAGE_DIR
+    if not base:
+        raise RuntimeError("LOCAL_STORAGE_DIR is not set")
+    # Treat object_key like an S3 key; store under LOCAL_STORAGE_DIR.
+    root = Path(base).resolve()
+    target = (root / object_key).resolve()
+    if not target.is_relative_to(root):
+        raise ValueError(f"object key escapes the storage directory: {object_key}")
+    return target
+
+
 def put_text(object_key: str, text: str, content_type: str = "text/plain; charset=utf-8") -> None:
-    if (settings.STORAGE_MODE or "minio").lower() == "local":
-        base = settings.LOCAL_STORAGE_DIR
-        if not base:
-            raise RuntimeError("LOCAL_STORAGE_DIR is not set")
-        # Treat object_key like an S3 key; store under LOCAL_STORAGE_DIR.
-        target = Path(base) / object_key
+    if _local_mode():
+        target = _local_path(object_key)
         target.parent.mkdir(parents=True, exist_ok=True)
         target.write_text(text, encoding="utf-8")
         return
@@ -64,3 +79,52 @@ def safe_put_text(object_key: str, text: str, content_type: str = "text/plain; c
         return None
     except Exception:
         return None
+
+
+@contextmanager
+def open_object(object_key: str) -> Iterator[BinaryIO]:
+    """Open a stored object for streaming reads (`.read(n)`), without loading it whole.
+
+    Raises FileNotFoundError (local) or S3Error (MinIO) when the object does not exist.
+    """
+
+    if _local_mode():
+        with _local_path(object_key).open("rb") as f:
+            yield f
+        return
+
+    resp = get_minio_client().get_object(settings.MINIO_BUCKET, object_key)
+    try:
+        yield resp
+    finally:
+        resp.close()
+        resp.release_conn()
+
+
+@contextmanager
+def object_path(object_key: str) -> Iterator[Path]:
+    """Filesystem path of a stored object, for readers that need random access (mmap).
+
+    Local storage yields the file itself; a MinIO object is downloaded to a temporary
+    file that is removed on exit. Raises FileNotFoundError when the object does not exist.
+    """
+
+    if _local_mode():
+        path = _local_path(object_key)
+        if not path.is_file():
+            raise FileNotFoundError(object_key)
+        yield path
+        return
+
+    fd, tmp = tempfile.mkstemp(prefix="pdc-object-")
+    os.close(fd)
+    try:
+        try:
+            get_minio_client().fget_object(settings.MINIO_BUCKET, object_key, tmp)
+        except S3Error as e:
+            if e.code in {"NoSuchKey", "NoSuchBucket"}:
+                raise FileNotFoundError(object_key) from e
+            raise
+        yield Path(tmp)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
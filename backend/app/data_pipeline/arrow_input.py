@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.settings import settings
+from app.core.storage import object_path
+from app.data_pipeline.settlement import SettlementAggregate, SettlementMetricsResponse
+
+try:  # optional dependency: Arrow IPC / Parquet input
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+FileFormat = Literal["parquet", "arrow"]
+
+_PARQUET_MAGIC = b"PAR1"
+_ARROW_FILE_MAGIC = b"ARROW1"
+# Rows decoded per Parquet batch; Arrow IPC files keep the batches they were written with.
+_PARQUET_BATCH_ROWS = 1 << 20
+
+
+class SettlementFileRequest(BaseModel):
+    """Settlement rows in an Arrow IPC (Feather v2) or Parquet file.
+
+    Give either `path` (relative to, or inside, SETTLEMENT_DATA_DIR) or `object_key`
+    (configured storage backend). The format is sniffed from the file when omitted.
+    """
+
+    month: str = Field(description="YYYY-MM")
+    path: Optional[str] = None
+    object_key: Optional[str] = None
+    format: Optional[FileFormat] = None
+    amount_field: str = Field(default="amount", min_length=1)
+    status_field: str = Field(default="status", min_length=1)
+
+    @model_validator(mode="after")
+    def _check_source(self) -> "SettlementFileRequest":
+        if (self.path is None) == (self.object_key is None):
+            raise ValueError("give exactly one of path or object_key")
+        return self
+
+
+def _data_path(path: str) -> Path:
+    base = settings.SETTLEMENT_DATA_DIR
+    if not base:
+        raise PermissionError("reading settlement files by path is disabled (SETTLEMENT_DATA_DIR is not set)")
+    root = Path(base).resolve()
+    target = (root / path).resolve()
+    if not target.is_relative_to(root):
+        raise PermissionError(f"path is outside SETTLEMENT_DATA_DIR: {path}")
+    if not target.is_file():
+        raise FileNotFoundError(path)
+    return target
+
+
+@contextmanager
+def _source_path(req: SettlementFileRequest) -> Iterator[Path]:
+    if req.path is not None:
+        yield _data_path(req.path)
+        return
+    with object_path(req.object_key) as path:
+        yield path
+
+
+def sniff_format(path: Path) -> FileFormat:
+    with path.open("rb") as f:
+        head = f.read(len(_ARROW_FILE_MAGIC))
+    if head.startswith(_PARQUET_MAGIC):
+        return "parquet"
+    if head.startswith(_ARROW_FILE_MAGIC) or head.startswith(b"\xff\xff\xff\xff"):
+        return "arrow"  # IPC file, or IPC stream (continuation marker)
+    raise ValueError("not an Arrow IPC or Parquet file")
+
+
+def iter_record_batches(path: Path, fmt: FileFormat, columns: list[str]) -> Iterator["pa.RecordBatch"]:
+    """Record batches holding `columns`, read through a memory map of `path`.
+
+    Arrow IPC batches are zero-copy views of the mapped file (unless the file was
+    written with buffer compression); Parquet only decodes the requested columns.
+    """
+
+    if fmt == "parquet":
+        pf = pq.ParquetFile(str(path), memory_map=True)
+        _check_columns(pf.schema_arrow.names, columns)
+        yield from pf.iter_batches(batch_size=_PARQUET_BATCH_ROWS, columns=columns)
+        return
+
+    with pa.memory_map(str(path), "r") as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        _check_columns(reader.schema.names, columns)
+        yield from batches
+
+
+def _check_columns(names: list[str], columns: list[str]) -> None:
+    missing = [c for c in columns if c not in names]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+
+
+def compute_settlement_metrics_file(req: SettlementFileRequest) -> SettlementMetricsResponse:
+    """Settlement metrics straight from the column buffers of an Arrow/Parquet file.
+
+    Raises RuntimeError without pyarrow, PermissionError/FileNotFoundError for a bad
+    source and ValueError for unreadable files or missing columns.
+    """
+
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; Arrow/Parquet input is unavailable")
+
+    agg = SettlementAggregate()
+    with _source_path(req) as path:
+        fmt = req.format or sniff_format(path)
+        for batch in iter_record_batches(path, fmt, [req.amount_field, req.status_field]):
+            agg.add_arrow(batch.column(req.amount_field), batch.column(req.status_field))
+    return agg.result(req.month)
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.data_pipeline.settlement import (
+    FAILED_STATUSES,
+    SUCCESS_STATUSES,
+    SettlementAggregate,
+    SettlementColumnarRequest,
+    _amount_column,
+    _exact_units_by_group,
+    _factorize,
+    _status_classes,
+    _to_float,
+    np,
+)
+from app.data_pipeline.sketch import (
+    DEFAULT_RELATIVE_ACCURACY,
+    MAX_RELATIVE_ACCURACY,
+    MIN_RELATIVE_ACCURACY,
+    DDSketch,
+    bucket_indexes,
+)
+
+Dimension = Literal["channel", "day", "status"]
+DIMENSIONS: tuple[str, ...] = ("channel", "day", "status")
+
+# Status dimension labels, indexed by the class codes of _status_classes.
+STATUS_LABELS = ("success", "failed", "pending")
+
+
+class SettlementGroupByRequest(SettlementColumnarRequest):
+    """Columnar rows plus the breakdowns to compute in one pass.
+
+    `group_by` lists groupings, e.g. [["channel"], ["day"], ["channel", "status"]].
+    `day` needs the `date` column (ISO date/datetime strings or epoch seconds).
+    """
+
+    date: Optional[list[Any]] = None
+    group_by: list[list[Dimension]] = Field(default_factory=lambda: [["channel"]])
+    quantiles: list[float] = Field(default_factory=lambda: [0.5, 0.95, 0.99])
+    relative_accuracy: float = Field(
+        default=DEFAULT_RELATIVE_ACCURACY, ge=MIN_RELATIVE_ACCURACY, le=MAX_RELATIVE_ACCURACY
+    )
+
+    @field_validator("quantiles")
+    @classmethod
+    def _check_quantiles(cls, v: list[float]) -> list[float]:
+        if any(q < 0 or q > 1 for q in v):
+            raise ValueError("quantiles must be within [0, 1]")
+        return v
+
+    @model_validator(mode="after")
+    def _check_dimensions(self) -> "SettlementGroupByRequest":
+        if self.date is not None and len(self.date) != len(self.amount):
+            raise ValueError("date must have the same length as amount")
+        used = {d for grouping in self.group_by for d in grouping}
+        if "channel" in used and self.channel is None:
+            raise ValueError("grouping by channel needs the channel column")
+        if "day" in used and self.date is None:
+            raise ValueError("grouping by day needs the date column")
+        return self
+
+
+class SettlementGroup(BaseModel):
+    key: dict[str, str]
+    metrics: dict[str, float]
+
+
+class SettlementGroupByResponse(BaseModel):
+    month: str
+    metrics: dict[str, float]
+    # Keyed by the grouping's dimensions joined with "," (e.g. "channel,status").
+    groups: dict[str, list[SettlementGroup]]
+
+
+def _channel_label(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+def _day_label(value: Any) -> str:
+    if value is None or isinstance(value, bool):
+        return ""
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, tz=timezone.utc).date().isoformat()
+        except (OverflowError, OSError, ValueError):
+            return ""
+    return str(value)[:10]
+
+
+def _status_label(value: Any) -> str:
+    status = str(value).lower()
+    if status in SUCCESS_STATUSES:
+        return STATUS_LABELS[0]
+    if status in FAILED_STATUSES:
+        return STATUS_LABELS[1]
+    return STATUS_LABELS[2]
+
+
+def _day_codes(values: list[Any]):
+    arr = np.asarray(values) if values else np.zeros(0, dtype="U10")
+    if arr.ndim == 1 and arr.dtype.kind == "U":
+        # Casting to a 10-char string dtype truncates "YYYY-MM-DDTHH:MM:SS" to the day.
+        return _factorize(arr.astype("U10").tolist())
+    if arr.ndim == 1 and arr.dtype.kind in "iu":
+        days = arr.astype("datetime64[s]").astype("datetime64[D]").astype(str)
+        return _factorize(days.tolist())
+    # Mixed input: label each distinct raw value once, then re-code by label.
+    raw_codes, uniques = _factorize(values)
+    label_codes, labels = _factorize([_day_label(u) for u in uniques])
+    return label_codes[raw_codes], labels
+
+
+class SettlementGroupBy:
+    """Single-pass hash aggregation of settlement rows over several groupings.
+
+    Rows are aggregated once at the finest grain (every requested dimension
+    together) into mergeable (SettlementAggregate, DDSketch) cells; each requested
+    grouping is then a roll-up of those cells, so the data is scanned once no matter
+    how many breakdowns are asked for. `add_columns` can be called per chunk.
+    """
+
+    def __init__(self, dims: tuple[str, ...], relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        self.dims = tuple(d for d in DIMENSIONS if d in dims)
+        self.relative_accuracy = relative_accuracy
+        self.cells: dict[tuple[str, ...], tuple[SettlementAggregate, DDSketch]] = {}
+
+    def _merge_cell(self, key: tuple[str, ...], agg: SettlementAggregate, sketch: DDSketch) -> None:
+        cur = self.cells.get(key)
+        self.cells[key] = (agg, sketch) if cur is None else (cur[0].merge(agg), cur[1].merge(sketch))
+
+    def add_columns(
+        self,
+        amounts: list[Any],
+        statuses: list[Any],
+        channels: Optional[list[Any]] = None,
+        dates: Optional[list[Any]] = None,
+    ) -> None:
+        if not amounts:
+            return
+        columns = {"channel": channels, "day": dates, "status": statuses}
+        if np is None:
+            self._add_columns_py(amounts, statuses, columns)
+            return
+
+        arr = _amount_column(amounts)
+        classes = _status_classes(statuses)
+
+        # Mixed-radix combination of the per-dimension codes -> one cell id per row.
+        combined = np.zeros(arr.size, dtype=np.int64)
+        labels: list[list[str]] = []
+        for dim in self.dims:
+            if dim == "status":
+                codes, dim_labels = classes, list(STATUS_LABELS)
+            elif dim == "day":
+                codes, dim_labels = _day_codes(dates)
+            else:
+                codes, uniques = _factorize(channels)
+                dim_labels = [_channel_label(u) for u in uniques]
+            combined = combined * len(dim_labels) + codes
+            labels.append(dim_labels)
+        cell_ids, group = np.unique(combined, return_inverse=True)
+        group = group.reshape(-1).astype(np.int64)
+        n_groups = int(cell_ids.size)
+
+        counts = np.bincount(group * 3 + classes, minlength=n_groups * 3).reshape(n_groups, 3).tolist()
+        totals = _exact_units_by_group(arr, group, n_groups)
+        ok = classes == 0
+        successes = _exact_units_by_group(arr[ok], group[ok], n_groups)
+        sketches = self._grouped_sketches(arr, group, n_groups)
+
+        for g, cell in enumerate(cell_ids.tolist()):
+            key: list[str] = []
+            for dim_labels in reversed(labels):
+                cell, code = divmod(cell, len(dim_labels))
+                key.append(dim_labels[code])
+            agg = SettlementAggregate(
+                total_count=sum(counts[g]),
+                success_count=counts[g][0],
+                failed_count=counts[g][1],
+                pending_count=counts[g][2],
+                total_amount_units=totals[g][0],
+                total_amount_special=totals[g][1],
+                success_amount_units=successes[g][0],
+                success_amount_special=successes[g][1],
+            )
+            self._merge_cell(tuple(reversed(key)), agg, sketches[g])
+
+    def _grouped_sketches(self, arr, group, n_groups: int) -> list[DDSketch]:
+        sketches = [DDSketch(relative_accuracy=self.relative_accuracy) for _ in range(n_groups)]
+        finite = np.isfinite(arr)
+        zero = finite & (arr == 0)
+        for g, c in enumerate(np.bincount(group[zero], minlength=n_groups).tolist()):
+            sketches[g].zero_count = c
+
+        nonzero = finite & ~zero
+        vals, grp = arr[nonzero], group[nonzero]
+        if not vals.size:
+            return sketches
+        buckets = bucket_indexes(np.abs(vals), sketches[0].gamma)
+        b_min = int(buckets.min())
+        span = int(buckets.max()) - b_min + 1
+        # One np.unique over (group, sign, bucket) builds every group's sketch at once.
+        keys = (grp * 2 + (vals < 0)) * span + (buckets - b_min)
+        uniq, cnt = np.unique(keys, return_counts=True)
+        for key, c in zip(uniq.tolist(), cnt.tolist()):
+            rest, b = divmod(key, span)
+            g, negative = divmod(rest, 2)
+            store = sketches[g].negative if negative else sketches[g].positive
+            store[b + b_min] = c
+        return sketches
+
+    def _add_columns_py(self, amounts: list[Any], statuses: list[Any], columns: dict[str, Any]) -> None:
+        label = {"channel": _channel_label, "day": _day_label, "status": _status_label}
+        groups: dict[tuple[str, ...], tuple[list[Any], list[Any]]] = {}
+        for i, (a, st) in enumerate(zip(amounts, statuses)):
+            key = tuple(label[d](columns[d][i]) for d in self.dims)
+            g = groups.setdefault(key, ([], []))
+            g[0].append(a)
+            g[1].append(st)
+        for key, (a_list, s_list) in groups.items():
+            agg = SettlementAggregate()
+            agg.add_columns(a_list, s_list)
+            sketch = DDSketch(relative_accuracy=self.relative_accuracy)
+            sketch.add_many([_to_float(a) for a in a_list])
+            self._merge_cell(key, agg, sketch)
+
+    def rollup(self, grouping: tuple[str, ...]) -> dict[tuple[str, ...], tuple[SettlementAggregate, DDSketch]]:
+        positions = [self.dims.index(d) for d in grouping]
+        out: dict[tuple[str, ...], tuple[SettlementAggregate, DDSketch]] = {}
+        for key, (agg, sketch) in self.cells.items():
+            sub = tuple(key[p] for p in positions)
+            cur = out.get(sub)
+            if cur is None:
+                # Copy the sketch once per output cell, then fold the rest in place.
+                out[sub] = (agg, sketch.merge(DDSketch(relative_accuracy=self.relative_accuracy)))
+            else:
+                cur[1].update(sketch)
+                out[sub] = (cur[0].merge(agg), cur[1])
+        return out
+
+    def total(self) -> tuple[SettlementAggregate, DDSketch]:
+        return self.rollup(()).get((), (SettlementAggregate(), DDSketch(relative_accuracy=self.relative_accuracy)))
+
+
+def _group_metrics(agg: SettlementAggregate, sketch: DDSketch, quantiles: list[float]) -> dict[str, float]:
+    metrics = agg.metrics()
+    for q in quantiles:
+        value = sketch.quantile(q)
+        metrics[f"amount_p{q * 100:g}"] = round(value, 2) if value is not None else 0.0
+    return metrics
+
+
+def compute_settlement_groupby(req: SettlementGroupByRequest) -> SettlementGroupByResponse:
+    dims = {d for grouping in req.group_by for d in grouping}
+    engine = SettlementGroupBy(tuple(dims), req.relative_accuracy)
+    engine.add_columns(req.amount, req.status, req.channel, req.date)
+
+    groups: dict[str, list[SettlementGroup]] = {}
+    for grouping in req.group_by:
+        grouping_t = tuple(dict.fromkeys(grouping))  # drop repeated dimensions, keep order
+        cells = engine.rollup(grouping_t)
+        groups[",".join(grouping_t)] = [
+            SettlementGroup(key=dict(zip(grouping_t, key)), metrics=_group_metrics(agg, sketch, req.quantiles))
+            for key, (agg, sketch) in sorted(cells.items())
+        ]
+
+    agg, sketch = engine.total()
+    return SettlementGroupByResponse(month=req.month, metrics=_group_metrics(agg, sketch, req.quantiles), groups=groups)
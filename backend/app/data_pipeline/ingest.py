@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from app.data_pipeline.settlement import SettlementAggregate
+
+FORMATS = ("csv", "ndjson")
+
+# Rows buffered before they are folded into the aggregate.
+_FLUSH_ROWS = 50_000
+# Longest single record (CSV row / NDJSON line) we are willing to buffer.
+_MAX_RECORD_CHARS = 1024 * 1024
+# Upper bound on decompressed bytes produced per inflate step (bounds gzip bombs).
+_INFLATE_STEP = 1024 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def resolve_format(fmt: Optional[str], filename: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+    """Pick csv/ndjson from an explicit value, the file name or the content type (None = sniff)."""
+
+    if fmt:
+        fmt = fmt.strip().lower()
+        if fmt in {"jsonl", "json"}:
+            fmt = "ndjson"
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported format: {fmt} (expected csv or ndjson)")
+        return fmt
+
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+
+    ctype = (content_type or "").split(";", 1)[0].strip().lower()
+    if ctype == "text/csv":
+        return "csv"
+    if ctype in {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}:
+        return "ndjson"
+    return None
+
+
+class RecordStreamParser(ABC):
+    """Push parser: raw (optionally gzipped) CSV/NDJSON bytes in, column batches out.
+
+    `fields` maps the columns to extract to the value used when a file lacks that
+    column; short CSV rows read as None, as csv.DictReader would give them.
+    Subclasses receive the columns in `_consume`, at most _FLUSH_ROWS rows at a time.
+
+    Call `feed` with chunks of any size and `close` once at the end; memory stays
+    bounded by one flush batch plus one pending record, whatever the input size.
+    Gzip is detected from the magic bytes, a UTF-8 BOM is tolerated. Malformed input
+    raises ValueError.
+    """
+
+    def __init__(self, fields: dict[str, Any], fmt: Optional[str] = None) -> None:
+        self.fmt = fmt
+        self.fields = dict(fields)
+        self.records = 0
+
+        self._head = b""
+        self._inflater: Optional[Any] = None
+        self._sniffed = False
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._pending_quotes = 0
+        self._header: Optional[list[str]] = None
+        self._indexes: list[Optional[int]] = []
+
+        self._columns: list[list[Any]] = [[] for _ in self.fields]
+
+    # -- bytes -> text -------------------------------------------------------------
+
+    def feed(self, data: bytes) -> None:
+        if not data:
+            return
+        if not self._sniffed:
+            self._head += data
+            if len(self._head) < len(_GZIP_MAGIC):
+                return
+            data, self._head = self._head, b""
+            self._sniffed = True
+            if data.startswith(_GZIP_MAGIC):
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if self._inflater is None:
+            self._feed_bytes(data)
+            return
+        try:
+            while data:
+                out = self._inflater.decompress(data, _INFLATE_STEP)
+                self._feed_bytes(out)
+                data = self._inflater.unconsumed_tail
+                if self._inflater.eof and self._inflater.unused_data:
+                    # Concatenated gzip members (e.g. `cat a.gz b.gz`).
+                    data = self._inflater.unused_data
+                    self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        except zlib.error as e:
+            raise ValueError(f"invalid gzip data: {e}") from e
+
+    def _feed_bytes(self, data: bytes) -> None:
+        if not data:
+            return
+        try:
+            text = self._decoder.decode(data)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"input is not valid UTF-8: {e}") from e
+        if text:
+            self._feed_text(text)
+
+    def close(self) -> None:
+        """Parse whatever is still buffered and hand the last batch to `_consume`."""
+
+        if not self._sniffed and self._head:
+            self._sniffed = True
+            self._feed_bytes(self._head)
+            self._head = b""
+        if self._inflater is not None and not self._inflater.eof:
+            raise ValueError("truncated gzip data")
+        try:
+            tail = self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"input is not valid UTF-8: {e}") from e
+        if tail:
+            self._feed_text(tail)
+        if self._pending:
+            record = "".join(self._pending)
+            self._pending, self._pending_chars, self._pending_quotes = [], 0, 0
+            self._handle_records([record])
+        self._flush()
+
+    # -- text -> records -----------------------------------------------------------
+
+    def _feed_text(self, text: str) -> None:
+        if self.fmt is None:
+            stripped = text.lstrip()
+            if not stripped:
+                self._buffer(text)
+                return
+            self.fmt = "ndjson" if stripped[0] == "{" else "csv"
+
+        parts = text.split("\n")
+        if len(parts) > 1 and (self.fmt == "ndjson" or ('"' not in text and not self._pending_quotes % 2)):
+            # No quoted newline can occur in this text (JSON escapes newlines inside
+            # strings): every line is a whole record, no per-line bookkeeping needed.
+            if self._pending:
+                parts[0] = "".join(self._pending) + parts[0]
+                self._pending, self._pending_chars, self._pending_quotes = [], 0, 0
+            lines = parts[:-1]
+            longest = max(lines, key=len)
+            if len(longest) > _MAX_RECORD_CHARS:
+                raise ValueError(f"record {self.records + lines.index(longest) + 1} exceeds {_MAX_RECORD_CHARS} characters")
+            self._buffer(parts[-1])
+            self._handle_records(lines)
+            return
+
+        records: list[str] = []
+        for part in parts[:-1]:
+            self._buffer(part + "\n")
+            # A CSV record may contain quoted newlines: it is complete only once its
+            # quote count is even ("" escapes count twice, so parity still works).
+            if self.fmt == "csv" and self._pending_quotes % 2:
+                continue
+            records.append("".join(self._pending))
+            self._pending, self._pending_chars, self._pending_quotes = [], 0, 0
+        self._buffer(parts[-1])
+        if records:
+            self._handle_records(records)
+
+    def _buffer(self, piece: str) -> None:
+        if not piece:
+            return
+        self._pending.append(piece)
+        self._pending_chars += len(piece)
+        if self.fmt == "csv":
+            self._pending_quotes += piece.count('"')
+        if self._pending_chars > _MAX_RECORD_CHARS:
+            raise ValueError(f"record {self.records + 1} exceeds {_MAX_RECORD_CHARS} characters")
+
+    def _handle_records(self, records: list[str]) -> None:
+        if self.fmt == "ndjson":
+            self._handle_ndjson(records)
+        else:
+            self._handle_csv(records)
+        if len(self._columns[0]) >= _FLUSH_ROWS:
+            self._flush()
+
+    def _handle_ndjson(self, lines: list[str]) -> None:
+        for line in lines:
+            self.records += 1
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {self.records}: invalid JSON ({e})") from e
+            if not isinstance(row, dict):
+                raise ValueError(f"line {self.records}: expected a JSON object")
+            for column, (name, default) in zip(self._columns, self.fields.items()):
+                column.append(row.get(name, default))
+
+    def _handle_csv(self, records: list[str]) -> None:
+        try:
+            for row in csv.reader(records):
+                self.records += 1
+                if not row:
+                    continue  # blank line, like csv.DictReader
+                if self._header is None:
+                    self._set_header(row)
+                    continue
+                for column, idx, default in zip(self._columns, self._indexes, self.fields.values()):
+                    column.append(default if idx is None else row[idx] if idx < len(row) else None)
+        except csv.Error as e:
+            raise ValueError(f"record {self.records}: invalid CSV ({e})") from e
+
+    def _set_header(self, row: list[str]) -> None:
+        self._header = [c.strip() for c in row]
+        self._indexes = [self._header.index(name) if name in self._header else None for name in self.fields]
+
+    def _flush(self) -> None:
+        if self._columns[0]:
+            columns, self._columns = self._columns, [[] for _ in self.fields]
+            self._consume(*columns)
+
+    @abstractmethod
+    def _consume(self, *columns: list[Any]) -> None: ...
+
+
+class SettlementStreamParser(RecordStreamParser):
+    """Streams `amount` / `status` columns into a SettlementAggregate (`acc`)."""
+
+    def __init__(self, fmt: Optional[str] = None) -> None:
+        super().__init__({"amount": 0, "status": ""}, fmt)
+        self.acc = SettlementAggregate()
+
+    def close(self) -> SettlementAggregate:
+        super().close()
+        return self.acc
+
+    def _consume(self, amounts: list[Any], statuses: list[Any]) -> None:
+        self.acc.add_columns(amounts, statuses)
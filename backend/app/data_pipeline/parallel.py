@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Optional
+
+from app.core.settings import settings
+from app.data_pipeline.settlement import (
+    SettlementAggregate,
+    SettlementColumnarRequest,
+    SettlementMetricsResponse,
+    merge_aggregates,
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def settlement_workers() -> int:
+    return max(1, settings.SETTLEMENT_WORKERS or os.cpu_count() or 1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process runs threads (event loop, probes) that a
+            # forked child would inherit in an undefined state.
+            _pool = ProcessPoolExecutor(
+                max_workers=settlement_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_settlement_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shard_slices(n: int, shards: int) -> list[slice]:
+    """Split range(n) into at most `shards` contiguous, near-equal slices."""
+
+    shards = max(1, min(shards, n))
+    size, extra = divmod(n, shards)
+    out: list[slice] = []
+    start = 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        out.append(slice(start, end))
+        start = end
+    return out
+
+
+def aggregate_shard(amounts: list[Any], statuses: list[Any]) -> SettlementAggregate:
+    # Runs in a worker process (or Celery task); must stay a module-level function.
+    agg = SettlementAggregate()
+    agg.add_columns(amounts, statuses)
+    return agg
+
+
+def aggregate_columns_parallel(
+    amounts: list[Any], statuses: list[Any], workers: Optional[int] = None
+) -> SettlementAggregate:
+    """Shard the columns across the process pool and merge the partial aggregates.
+
+    The merged result is identical to a serial `SettlementAggregate.add_columns`.
+    """
+
+    workers = workers or settlement_workers()
+    if workers <= 1 or len(amounts) < 2:
+        return aggregate_shard(amounts, statuses)
+
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(aggregate_shard, amounts[s], statuses[s]) for s in shard_slices(len(amounts), workers)]
+        return merge_aggregates(f.result() for f in futures)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed): drop the pool and finish serially.
+        shutdown_settlement_pool()
+        return aggregate_shard(amounts, statuses)
+
+
+def compute_settlement_metrics_parallel(
+    req: SettlementColumnarRequest, workers: Optional[int] = None
+) -> SettlementMetricsResponse:
+    return aggregate_columns_parallel(req.amount, req.status, workers).result(req.month)
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Iterator, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.settings import settings
+from app.core.storage import open_object
+from app.data_pipeline.ingest import RecordStreamParser, resolve_format
+from app.data_pipeline.settlement import _amount_column, _exact_units, _exact_units_py, _to_float, _units_to_float, np
+
+SIDES = ("ours", "theirs")
+# missing = in our ledger only, extra = on the channel statement only.
+CATEGORIES = ("matched", "amount_mismatch", "missing", "extra")
+
+# Re-partition a spilled partition that is still too large at most this many times.
+_MAX_SPILL_DEPTH = 3
+# Bytes read from a stored object per parse step.
+_READ_BYTES = 1024 * 1024
+
+
+class ReconcileOptions(BaseModel):
+    id_field: str = Field(default="id", min_length=1)
+    amount_field: str = Field(default="amount", min_length=1)
+    # Absolute amount difference still treated as a match (half a cent by default).
+    tolerance: float = Field(default=0.005, ge=0)
+    sample_limit: int = Field(default=20, ge=0, le=1000)
+
+    @model_validator(mode="after")
+    def _check_fields(self) -> "ReconcileOptions":
+        if self.id_field == self.amount_field:
+            raise ValueError("id_field and amount_field must differ")
+        return self
+
+
+class ReconcileObjectsRequest(ReconcileOptions):
+    """Both ledgers as stored objects (see app.core.storage), CSV or NDJSON, optionally gzipped."""
+
+    ours_key: str = Field(min_length=1)
+    theirs_key: str = Field(min_length=1)
+    ours_format: Optional[str] = None
+    theirs_format: Optional[str] = None
+
+
+class ReconcileCategory(BaseModel):
+    count: int = 0
+    ours_amount: float = 0.0
+    theirs_amount: float = 0.0
+
+
+class ReconcileItem(BaseModel):
+    id: str
+    ours_amount: Optional[float] = None
+    theirs_amount: Optional[float] = None
+
+
+class ReconcileResponse(BaseModel):
+    rows: dict[str, int]
+    # Rows without a transaction id or with a NaN/inf amount; they are not joined and
+    # not counted anywhere else.
+    invalid_rows: dict[str, int]
+    # Ids seen more than once on one side; their amounts are summed before comparing.
+    duplicate_ids: dict[str, int]
+    categories: dict[str, ReconcileCategory]
+    # Up to sample_limit ids per non-matched category, in no particular order.
+    samples: dict[str, list[ReconcileItem]]
+    spilled: bool = False
+
+
+class _Totals:
+    def __init__(self) -> None:
+        self.count = 0
+        self.ours = (0, 0.0)
+        self.theirs = (0, 0.0)
+
+    def add(self, ours: list[float], theirs: list[float], count: int) -> None:
+        self.count += count
+        self.ours = _add_units(self.ours, _sum_units(ours))
+        self.theirs = _add_units(self.theirs, _sum_units(theirs))
+
+    def out(self) -> ReconcileCategory:
+        return ReconcileCategory(
+            count=self.count,
+            ours_amount=round(_units_to_float(*self.ours), 2),
+            theirs_amount=round(_units_to_float(*self.theirs), 2),
+        )
+
+
+def _sum_units(values: list[float]) -> tuple[int, float]:
+    if not values:
+        return 0, 0.0
+    return _exact_units(_amount_column(values)) if np is not None else _exact_units_py(values)
+
+
+def _add_units(a: tuple[int, float], b: tuple[int, float]) -> tuple[int, float]:
+    return a[0] + b[0], a[1] + b[1]
+
+
+class Reconciler:
+    """Hash join of our ledger against a channel statement on transaction id.
+
+    Rows of either side can be added in any order and in any number of batches.
+    Each id is reduced to [ours_sum, ours_rows, theirs_sum, theirs_rows]; when more
+    than `memory_rows` distinct ids are held, the table is spilled to `partitions`
+    hash-partitioned files (Grace hash join) and cleared. `finish` then reduces one
+    partition at a time, so memory stays bounded by memory_rows plus one partition,
+    whatever the size of the inputs. Use as a context manager (or call `close`) to
+    remove the spill files.
+    """
+
+    def __init__(
+        self,
+        options: Optional[ReconcileOptions] = None,
+        memory_rows: Optional[int] = None,
+        partitions: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ) -> None:
+        self.options = options or ReconcileOptions()
+        self.memory_rows = max(1, memory_rows or settings.RECONCILE_MEMORY_ROWS)
+        self.partitions = max(2, partitions or settings.RECONCILE_PARTITIONS)
+        self.spill_dir = spill_dir if spill_dir is not None else (settings.RECONCILE_SPILL_DIR or None)
+
+        self.rows = [0, 0]
+        self.invalid = [0, 0]
+        self._table: dict[str, list[Any]] = {}
+        self._tmpdir: Optional[str] = None
+        self._files: list[BinaryIO] = []
+
+    def __enter__(self) -> "Reconciler":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @property
+    def spilled(self) -> bool:
+        return self._tmpdir is not None
+
+    def add(self, side: str, ids: list[Any], amounts: list[Any]) -> None:
+        s = SIDES.index(side)
+        o = 2 * s
+        table = self._table
+        invalid = 0
+        values = _amount_column(amounts).tolist() if np is not None else [_to_float(a) for a in amounts]
+        for key, amount in zip(ids, values):
+            if key.__class__ is not str:
+                if key is None or isinstance(key, (dict, list)):
+                    invalid += 1
+                    continue
+                key = str(key)
+            key = key.strip()
+            if not key or not math.isfinite(amount):
+                invalid += 1
+                continue
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = [0.0, 0, 0.0, 0]
+            entry[o] += amount
+            entry[o + 1] += 1
+        self.rows[s] += len(ids)
+        self.invalid[s] += invalid
+        if len(table) > self.memory_rows:
+            self._spill()
+
+    # -- spilling ------------------------------------------------------------------
+
+    def _spill(self) -> None:
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="pdc-reconcile-", dir=self.spill_dir)
+            self._files = [
+                open(os.path.join(self._tmpdir, f"part-{i:04d}"), "wb") for i in range(self.partitions)
+            ]
+        _write_partitions(self._table, self._files, salt=0)
+        self._table = {}
+
+    def close(self) -> None:
+        for f in self._files:
+            f.close()
+        self._files = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def _tables(self) -> Iterator[dict[str, list[Any]]]:
+        if not self.spilled:
+            yield self._table
+            return
+        self._spill()
+        paths = [f.name for f in self._files]
+        for f in self._files:
+            f.close()
+        self._files = []
+        for path in paths:
+            yield from self._reduce(path, depth=1)
+
+    def _reduce(self, path: str, depth: int) -> Iterator[dict[str, list[Any]]]:
+        """Reduce one spill file to a table, splitting it further if it is still too large."""
+
+        table: dict[str, list[Any]] = {}
+        split: Optional[list[BinaryIO]] = None
+        for chunk in _read_chunks(path):
+            for key, a, na, b, nb in chunk:
+                entry = table.get(key)
+                if entry is None:
+                    table[key] = [a, na, b, nb]
+                else:
+                    entry[0] += a
+                    entry[1] += na
+                    entry[2] += b
+                    entry[3] += nb
+            if len(table) > self.memory_rows and depth < _MAX_SPILL_DEPTH:
+                # Skewed partition: spread it over sub-partitions with a different hash.
+                if split is None:
+                    split = [open(f"{path}.{i:04d}", "wb") for i in range(self.partitions)]
+                _write_partitions(table, split, salt=depth)
+                table = {}
+        os.remove(path)
+
+        if split is None:
+            yield table
+            return
+        _write_partitions(table, split, salt=depth)
+        for f in split:
+            f.close()
+        for f in split:
+            yield from self._reduce(f.name, depth + 1)
+
+    # -- report --------------------------------------------------------------------
+
+    def finish(self) -> ReconcileResponse:
+        tolerance = self.options.tolerance
+        limit = self.options.sample_limit
+        totals = {c: _Totals() for c in CATEGORIES}
+        samples: dict[str, list[ReconcileItem]] = {c: [] for c in CATEGORIES if c != "matched"}
+        duplicates = [0, 0]
+
+        for table in self._tables():
+            ours: dict[str, list[float]] = {c: [] for c in CATEGORIES}
+            theirs: dict[str, list[float]] = {c: [] for c in CATEGORIES}
+            counts = dict.fromkeys(CATEGORIES, 0)
+            for key, (a, na, b, nb) in table.items():
+                if na > 1:
+                    duplicates[0] += 1
+                if nb > 1:
+                    duplicates[1] += 1
+                if not nb:
+                    category = "missing"
+                elif not na:
+                    category = "extra"
+                elif not abs(b - a) <= tolerance:  # also true when a sum overflowed to inf/nan
+                    category = "amount_mismatch"
+                else:
+                    category = "matched"
+                counts[category] += 1
+                # Only finite sums are totalled or shown: JSON has no NaN/inf.
+                a_ok = na and math.isfinite(a)
+                b_ok = nb and math.isfinite(b)
+                if a_ok:
+                    ours[category].append(a)
+                if b_ok:
+                    theirs[category].append(b)
+                if category != "matched" and len(samples[category]) < limit:
+                    samples[category].append(
+                        ReconcileItem(id=key, ours_amount=a if a_ok else None, theirs_amount=b if b_ok else None)
+                    )
+            for c in CATEGORIES:
+                totals[c].add(ours[c], theirs[c], counts[c])
+
+        return ReconcileResponse(
+            rows=dict(zip(SIDES, self.rows)),
+            invalid_rows=dict(zip(SIDES, self.invalid)),
+            duplicate_ids=dict(zip(SIDES, duplicates)),
+            categories={c: t.out() for c, t in totals.items()},
+            samples=samples,
+            spilled=self.spilled,
+        )
+
+
+def _write_partitions(table: dict[str, list[Any]], files: list[BinaryIO], salt: int) -> None:
+    n = len(files)
+    parts: list[list[tuple]] = [[] for _ in range(n)]
+    if salt:
+        for key, e in table.items():
+            parts[hash((salt, key)) % n].append((key, *e))
+    else:
+        for key, e in table.items():
+            parts[hash(key) % n].append((key, *e))
+    for f, part in zip(files, parts):
+        if part:
+            # Spill files are private to this process (str hashes are per-process anyway).
+            pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_chunks(path: str) -> Iterator[list[tuple]]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class LedgerStreamParser(RecordStreamParser):
+    """Streams one side's id / amount columns into a Reconciler."""
+
+    def __init__(self, reconciler: Reconciler, side: str, fmt: Optional[str] = None) -> None:
+        opts = reconciler.options
+        super().__init__({opts.id_field: None, opts.amount_field: 0}, fmt)
+        self.reconciler = reconciler
+        self.side = side
+
+    def _consume(self, ids: list[Any], amounts: list[Any]) -> None:
+        self.reconciler.add(self.side, ids, amounts)
+
+
+def reconcile_objects(req: ReconcileObjectsRequest) -> ReconcileResponse:
+    """Reconcile two stored ledgers, streaming each object once."""
+
+    options = ReconcileOptions.model_validate(req.model_dump(include=set(ReconcileOptions.model_fields)))
+    with Reconciler(options) as rec:
+        for side, key, fmt in (("ours", req.ours_key, req.ours_format), ("theirs", req.theirs_key, req.theirs_format)):
+            parser = LedgerStreamParser(rec, side, resolve_format(fmt, key))
+            with open_object(key) as f:
+                while chunk := f.read(_READ_BYTES):
+                    parser.feed(chunk)
+            parser.close()
+        return rec.finish()
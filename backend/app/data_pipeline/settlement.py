@@ -1,8 +1,18 @@
 from __future__ import annotations
 
-from typing import Any
+import math
+from typing import Any, Iterable, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+try:  # optional dependency: the columnar path falls back to pure Python without it
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+SUCCESS_STATUSES = frozenset({"success", "succeeded", "ok"})
+FAILED_STATUSES = frozenset({"failed", "fail", "error"})
 
 
 class SettlementMetricsRequest(BaseModel):
@@ -10,6 +20,31 @@ class SettlementMetricsRequest(BaseModel):
     rows: list[dict[str, Any]]
 
 
+class SettlementColumns(BaseModel):
+    """Settlement rows as parallel arrays: `amount[i]`, `status[i]` and `channel[i]` describe row i.
+
+    Validation is per array, not per row, which is what makes multi-million-row
+    inputs affordable.
+    """
+
+    amount: list[Any]
+    status: list[Any]
+    channel: Optional[list[Any]] = None
+
+    @model_validator(mode="after")
+    def _check_lengths(self) -> "SettlementColumns":
+        n = len(self.amount)
+        if len(self.status) != n or (self.channel is not None and len(self.channel) != n):
+            raise ValueError("amount, status and channel must have the same length")
+        return self
+
+
+class SettlementColumnarRequest(SettlementColumns):
+    """Same data as SettlementMetricsRequest, in columnar form."""
+
+    month: str = Field(description="YYYY-MM")
+
+
 class SettlementMetricsResponse(BaseModel):
     month: str
     metrics: dict[str, float]
@@ -18,34 +53,23 @@ class SettlementMetricsResponse(BaseModel):
 def compute_settlement_metrics(req: SettlementMetricsRequest) -> SettlementMetricsResponse:
     # MVP: accept generic rows and compute a stable set of 5+ core metrics.
     # Expected (best-effort) fields: amount, status, channel.
-    total_count = len(req.rows)
-    total_amount = 0.0
-    success_amount = 0.0
-    success_count = 0
-    failed_count = 0
-    pending_count = 0
-
-    for r in req.rows:
-        amount = r.get("amount", 0)
-        try:
-            amount_f = float(amount)
-        except Exception:
-            amount_f = 0.0
-
-        status = str(r.get("status", "")).lower()
-        total_amount += amount_f
-
-        if status in {"success", "succeeded", "ok"}:
-            success_count += 1
-            success_amount += amount_f
-        elif status in {"failed", "fail", "error"}:
-            failed_count += 1
-        else:
-            pending_count += 1
+    # Amounts are summed exactly (see SettlementAggregate), not left to right as in
+    # early versions, so this agrees with every other settlement endpoint.
+    agg = SettlementAggregate()
+    agg.add_rows(req.rows)
+    return agg.result(req.month)
 
-    success_rate = (success_count / total_count) if total_count else 0.0
 
-    metrics: dict[str, float] = {
+def _metrics(
+    total_count: int,
+    total_amount: float,
+    success_count: int,
+    success_amount: float,
+    failed_count: int,
+    pending_count: int,
+) -> dict[str, float]:
+    success_rate = (success_count / total_count) if total_count else 0.0
+    return {
         "total_count": float(total_count),
         "total_amount": round(total_amount, 2),
         "success_count": float(success_count),
@@ -55,4 +79,308 @@ def compute_settlement_metrics(req: SettlementMetricsRequest) -> SettlementMetri
         "success_rate": round(success_rate, 4),
     }
 
-    return SettlementMetricsResponse(month=req.month, metrics=metrics)
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return 0.0
+
+
+def _amount_column(values: list[Any]):
+    try:
+        arr = np.asarray(values)
+    except (ValueError, TypeError):  # ragged input, e.g. a list among the amounts
+        arr = None
+    if arr is not None and arr.ndim == 1 and arr.dtype.kind in "biuf":
+        return arr.astype(np.float64, copy=False)
+    # Strings / nulls / mixed: convert with float() like the row path does, so
+    # odd inputs ("1_000", " 2.5 ", None) are treated identically.
+    return np.fromiter((_to_float(v) for v in values), dtype=np.float64, count=len(values))
+
+
+# Every finite double is an integer multiple of 2**-1074, so amounts are summed
+# exactly as Python ints in those units and rounded to float once at the end. That
+# makes the totals independent of row order and sharding: serial, chunked and
+# merged-partial computations agree bit for bit.
+_EXACT_SHIFT = 1074
+# Rows per bincount pass; keeps every per-exponent partial sum below 2**53.
+_EXACT_BLOCK = 1 << 24
+
+
+def _exact_units_py(values: list[float]) -> tuple[int, float]:
+    units = 0
+    special = 0.0
+    for v in values:
+        if math.isfinite(v):
+            num, den = v.as_integer_ratio()
+            units += num * ((1 << _EXACT_SHIFT) // den)
+        else:
+            special += v
+    return units, special
+
+
+def _exact_units(arr) -> tuple[int, float]:
+    """Exact sum of a float64 array as (units of 2**-1074, sum of inf/nan values)."""
+
+    return _exact_units_by_group(arr, np.zeros(arr.size, dtype=np.int64), 1)[0]
+
+
+def _exact_units_by_group(arr, codes, n_groups: int) -> list[tuple[int, float]]:
+    """`_exact_units` for every group at once; `codes[i]` in [0, n_groups) is row i's group."""
+
+    out_units = [0] * n_groups
+    out_special = [0.0] * n_groups
+    finite = np.isfinite(arr)
+    if not finite.all():
+        bad = ~finite
+        for g, v in zip(codes[bad].tolist(), arr[bad].tolist()):
+            out_special[g] += v
+        arr, codes = arr[finite], codes[finite]
+
+    codes = codes.astype(np.int64, copy=False)
+    for start in range(0, arr.size, _EXACT_BLOCK):
+        block = arr[start : start + _EXACT_BLOCK]
+        mant, exp = np.frexp(block)  # block == mant * 2**exp, 0.5 <= |mant| < 1
+        mi = (mant * 2.0**53).astype(np.int64)  # exact 53-bit integer mantissas
+        hi = mi >> 26
+        lo = mi - (hi << 26)
+        exp_min = int(exp.min())
+        n_exp = int(exp.max()) - exp_min + 1
+        idx = codes[start : start + _EXACT_BLOCK] * n_exp + (exp - exp_min)
+        # bincount sums in float64, exact here since |hi| <= 2**27 and 0 <= lo < 2**26.
+        his = np.bincount(idx, weights=hi, minlength=n_groups * n_exp)
+        los = np.bincount(idx, weights=lo, minlength=n_groups * n_exp)
+        for k in np.flatnonzero((his != 0) | (los != 0)).tolist():
+            g, e = divmod(k, n_exp)
+            total = (int(his[k]) << 26) + int(los[k])
+            shift = e + exp_min - 53 + _EXACT_SHIFT
+            # A negative shift only drops zero bits: each value is a multiple of 2**-1074.
+            out_units[g] += total << shift if shift >= 0 else total >> -shift
+    return list(zip(out_units, out_special))
+
+
+def _units_to_float(units: int, special: float) -> float:
+    try:
+        value = units / (1 << _EXACT_SHIFT)  # int / int is correctly rounded
+    except OverflowError:
+        value = math.inf if units > 0 else -math.inf
+    return value + special if special else value
+
+
+def _factorize(values: list[Any]):
+    """Return (codes, uniques): int32 code per value and the distinct values in first-seen order.
+
+    Hashing beats np.unique's sort for low-cardinality columns like status/channel
+    and keeps mixed types (None, numbers) without coercing them to strings.
+    """
+
+    try:
+        # All C-level loops: dict.fromkeys dedupes, map(dict.__getitem__) encodes.
+        index = {v: i for i, v in enumerate(dict.fromkeys(values))}
+        codes = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+        return codes, list(index)
+    except TypeError:  # unhashable values (list/dict): key them by their text
+        return _factorize([v if _hashable(v) else str(v) for v in values])
+
+
+def _hashable(v: Any) -> bool:
+    try:
+        hash(v)
+    except TypeError:
+        return False
+    return True
+
+
+def _status_classes(values: list[Any]):
+    """Map each status to 0 = success, 1 = failed, 2 = pending (other)."""
+
+    codes, uniques = _factorize(values)
+    return _status_lut(uniques)[codes]
+
+
+def _status_lut(uniques: list[Any]):
+    # Classify distinct values only, with the row path's `str(status).lower()`.
+    return np.array(
+        [0 if str(u).lower() in SUCCESS_STATUSES else 1 if str(u).lower() in FAILED_STATUSES else 2 for u in uniques],
+        dtype=np.int8,
+    )
+
+
+class SettlementAggregate(BaseModel):
+    """Mergeable partial settlement aggregate.
+
+    Fed chunk by chunk (`add_rows` / `add_columns`), it holds only counters, so any
+    input size fits in constant memory. Partials computed over shards combine with
+    `merge` (or `merge_aggregates`) into exactly what one pass over all rows gives;
+    the model is JSON-serializable so partials can travel through Celery.
+    """
+
+    total_count: int = 0
+    success_count: int = 0
+    failed_count: int = 0
+    pending_count: int = 0
+    # Exact amount sums in units of 2**-1074, plus the float sum of any inf/nan amounts.
+    total_amount_units: int = 0
+    success_amount_units: int = 0
+    total_amount_special: float = 0.0
+    success_amount_special: float = 0.0
+
+    def add_rows(self, rows: list[dict[str, Any]]) -> None:
+        self.add_columns([r.get("amount", 0) for r in rows], [r.get("status", "") for r in rows])
+
+    def add_columns(self, amounts: list[Any], statuses: list[Any]) -> None:
+        if not amounts:
+            return
+        self.total_count += len(amounts)
+
+        if np is None:
+            values = [_to_float(a) for a in amounts]
+            success: list[float] = []
+            for amount_f, st in zip(values, statuses):
+                status = str(st).lower()
+                if status in SUCCESS_STATUSES:
+                    self.success_count += 1
+                    success.append(amount_f)
+                elif status in FAILED_STATUSES:
+                    self.failed_count += 1
+                else:
+                    self.pending_count += 1
+            self._add_amounts(_exact_units_py(values), _exact_units_py(success))
+            return
+
+        self._add_arrays(_amount_column(amounts), _status_classes(statuses), count=False)
+
+    def add_arrow(self, amounts, statuses) -> None:
+        """Fold pyarrow arrays (e.g. two columns of a RecordBatch) into the aggregate.
+
+        Works on the Arrow buffers: float64 amounts without nulls are viewed, not
+        copied, and statuses are classified once per distinct value of their
+        dictionary encoding. No per-row Python objects are created.
+        """
+
+        if len(amounts):
+            self._add_arrays(_arrow_amounts(amounts), _arrow_status_classes(statuses))
+
+    def _add_arrays(self, arr, classes, count: bool = True) -> None:
+        # arr: float64 amounts, classes: status classes from _status_classes.
+        if count:
+            self.total_count += int(arr.size)
+        counts = np.bincount(classes, minlength=3)
+        self.success_count += int(counts[0])
+        self.failed_count += int(counts[1])
+        self.pending_count += int(counts[2])
+        self._add_amounts(_exact_units(arr), _exact_units(arr[classes == 0]))
+
+    def _add_amounts(self, total: tuple[int, float], success: tuple[int, float]) -> None:
+        self.total_amount_units += total[0]
+        self.total_amount_special += total[1]
+        self.success_amount_units += success[0]
+        self.success_amount_special += success[1]
+
+    def merge(self, other: "SettlementAggregate") -> "SettlementAggregate":
+        return SettlementAggregate(
+            total_count=self.total_count + other.total_count,
+            success_count=self.success_count + other.success_count,
+            failed_count=self.failed_count + other.failed_count,
+            pending_count=self.pending_count + other.pending_count,
+            total_amount_units=self.total_amount_units + other.total_amount_units,
+            success_amount_units=self.success_amount_units + other.success_amount_units,
+            total_amount_special=self.total_amount_special + other.total_amount_special,
+            success_amount_special=self.success_amount_special + other.success_amount_special,
+        )
+
+    @property
+    def total_amount(self) -> float:
+        return _units_to_float(self.total_amount_units, self.total_amount_special)
+
+    @property
+    def success_amount(self) -> float:
+        return _units_to_float(self.success_amount_units, self.success_amount_special)
+
+    def metrics(self) -> dict[str, float]:
+        return _metrics(
+            self.total_count,
+            self.total_amount,
+            self.success_count,
+            self.success_amount,
+            self.failed_count,
+            self.pending_count,
+        )
+
+    def result(self, month: str) -> SettlementMetricsResponse:
+        return SettlementMetricsResponse(month=month, metrics=self.metrics())
+
+
+def _arrow_amounts(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if values.type != pa.float64() or values.null_count:
+        try:
+            values = pc.cast(values, pa.float64())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Text/odd amounts: same per-value parsing as the row path (rare, not zero-copy).
+            return _amount_column(values.to_pylist())
+        values = pc.fill_null(values, 0.0)  # like _to_float(None)
+    return values.to_numpy(zero_copy_only=False)
+
+
+def _arrow_status_classes(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not pa.types.is_dictionary(values.type):
+        values = pc.dictionary_encode(values)
+    uniques = values.dictionary.to_pylist()
+    # Nulls take the extra last slot and classify like a None status in the row path.
+    lut = _status_lut(uniques + [None])
+    indices = pc.fill_null(values.indices, len(uniques)).to_numpy(zero_copy_only=False)
+    return lut[indices]
+
+
+def merge_aggregates(parts: Iterable[SettlementAggregate]) -> SettlementAggregate:
+    out = SettlementAggregate()
+    for part in parts:
+        out = out.merge(part)
+    return out
+
+
+def aggregate_by_key(amounts: list[Any], statuses: list[Any], keys: list[Any]) -> dict[Any, SettlementAggregate]:
+    """One SettlementAggregate per distinct key (e.g. channel), in first-seen key order."""
+
+    if np is None:
+        groups: dict[Any, tuple[list[Any], list[Any]]] = {}
+        for a, st, k in zip(amounts, statuses, keys):
+            g = groups.setdefault(k, ([], []))
+            g[0].append(a)
+            g[1].append(st)
+        out: dict[Any, SettlementAggregate] = {}
+        for k, (a_list, s_list) in groups.items():
+            out[k] = SettlementAggregate()
+            out[k].add_columns(a_list, s_list)
+        return out
+
+    arr = _amount_column(amounts)
+    classes = _status_classes(statuses)
+    codes, uniques = _factorize(keys)
+    # Stable sort by key code turns each group into one contiguous slice of `order`.
+    order = np.argsort(codes, kind="stable")
+    ends = np.cumsum(np.bincount(codes, minlength=len(uniques))).tolist()
+    out = {}
+    start = 0
+    for key, end in zip(uniques, ends):
+        idx = order[start:end]
+        agg = SettlementAggregate()
+        agg._add_arrays(arr[idx], classes[idx])
+        out[key] = agg
+        start = end
+    return out
+
+
+def compute_settlement_metrics_columnar(req: SettlementColumnarRequest) -> SettlementMetricsResponse:
+    """Vectorized equivalent of compute_settlement_metrics for columnar input."""
+
+    agg = SettlementAggregate()
+    agg.add_columns(req.amount, req.status)
+    return agg.result(req.month)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional
+
+from pydantic import BaseModel, Field
+
+try:  # optional dependency: bulk inserts are vectorized when available
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Below ~1e-4 gamma rounds towards 1.0 (log(gamma) -> 0) and the bucket indexes of one
+# group span more than int64 can key; above 0.5 the quantiles are meaningless.
+MIN_RELATIVE_ACCURACY = 1e-4
+MAX_RELATIVE_ACCURACY = 0.5
+
+
+class DDSketch(BaseModel):
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmic buckets: bucket i holds (gamma**(i-1), gamma**i]
+    with gamma = (1 + a) / (1 - a), so any returned quantile is within a factor
+    (1 +/- a) of the true one. Memory grows with log(max/min), not with the number
+    of values; two sketches with the same accuracy merge by adding bucket counts.
+    """
+
+    relative_accuracy: float = Field(
+        default=DEFAULT_RELATIVE_ACCURACY, ge=MIN_RELATIVE_ACCURACY, le=MAX_RELATIVE_ACCURACY
+    )
+    zero_count: int = 0
+    positive: dict[int, int] = Field(default_factory=dict)
+    negative: dict[int, int] = Field(default_factory=dict)  # buckets of |value|
+
+    @property
+    def gamma(self) -> float:
+        a = self.relative_accuracy
+        return (1 + a) / (1 - a)
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _bucket(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / math.log(self.gamma))
+
+    def add(self, value: float) -> None:
+        if not math.isfinite(value):
+            return
+        if value == 0:
+            self.zero_count += 1
+            return
+        store = self.positive if value > 0 else self.negative
+        b = self._bucket(abs(value))
+        store[b] = store.get(b, 0) + 1
+
+    def add_many(self, values: Iterable[float]) -> None:
+        if np is None:
+            for v in values:
+                self.add(v)
+            return
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[np.isfinite(arr)]
+        self.zero_count += int(np.count_nonzero(arr == 0))
+        for store, part in ((self.positive, arr[arr > 0]), (self.negative, -arr[arr < 0])):
+            if part.size:
+                _add_counts(store, *bucket_counts(part, self.gamma))
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        out = DDSketch.model_construct(
+            relative_accuracy=self.relative_accuracy,
+            zero_count=self.zero_count,
+            positive=dict(self.positive),
+            negative=dict(self.negative),
+        )
+        out.update(other)
+        return out
+
+    def update(self, other: "DDSketch") -> None:
+        """In-place merge of `other` into this sketch."""
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        _add_counts(self.positive, other.positive.keys(), other.positive.values())
+        _add_counts(self.negative, other.negative.keys(), other.negative.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q in [0, 1]; None for an empty sketch."""
+
+        n = self.count
+        if n == 0:
+            return None
+        rank = min(max(q, 0.0), 1.0) * (n - 1)
+        gamma = self.gamma
+
+        seen = 0
+        # Ascending value order: most negative first, then zeros, then positives.
+        for b in sorted(self.negative, reverse=True):
+            seen += self.negative[b]
+            if seen > rank:
+                return -_bucket_value(b, gamma)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for b in sorted(self.positive):
+            seen += self.positive[b]
+            if seen > rank:
+                return _bucket_value(b, gamma)
+        return _bucket_value(max(self.positive), gamma) if self.positive else 0.0
+
+
+def _bucket_value(b: int, gamma: float) -> float:
+    # Midpoint estimate of (gamma**(b-1), gamma**b], within relative accuracy of both ends.
+    return 2 * gamma**b / (gamma + 1)
+
+
+def bucket_indexes(magnitudes, gamma: float):
+    """Vectorized DDSketch bucket index of positive magnitudes."""
+
+    return np.ceil(np.log(magnitudes) / math.log(gamma)).astype(np.int64)
+
+
+def bucket_counts(magnitudes, gamma: float):
+    buckets, counts = np.unique(bucket_indexes(magnitudes, gamma), return_counts=True)
+    return buckets.tolist(), counts.tolist()
+
+
+def _add_counts(store: dict[int, int], buckets: Iterable[int], counts: Iterable[int]) -> None:
+    for b, c in zip(buckets, counts):
+        store[b] = store.get(b, 0) + c
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import math
+import threading
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.db import SessionLocal
+from app.data_pipeline.settlement import SettlementAggregate, SettlementColumns, aggregate_by_key
+from app.models.settlement import ALL_CHANNELS, SettlementAggregateRecord, SettlementBatch
+
+# Rows with no channel are aggregated under this channel value.
+NO_CHANNEL = ""
+
+# Serializes writers within one process (SQLite has no SELECT ... FOR UPDATE).
+_write_lock = threading.Lock()
+
+
+class SettlementDeltaRequest(SettlementColumns):
+    """New rows for a month. Re-sending the same `batch_id` is a no-op."""
+
+    batch_id: Optional[str] = Field(default=None, max_length=128)
+
+
+class SettlementAggregateOut(BaseModel):
+    month: str
+    channel: str
+    metrics: dict[str, float]
+    batches: int
+    updated_at: Optional[str] = None
+
+
+class SettlementDeltaResponse(BaseModel):
+    applied: bool
+    rows: int
+    total: Optional[SettlementAggregateOut] = None
+
+
+def _channel_key(value: Any) -> str:
+    if value is None or value == "":
+        return NO_CHANNEL
+    key = str(value)[:64]
+    if key == ALL_CHANNELS:
+        raise ValueError(f"channel {ALL_CHANNELS!r} is reserved for the all-channels aggregate")
+    return key
+
+
+def _out(rec: SettlementAggregateRecord) -> SettlementAggregateOut:
+    # Built from the denormalized metric columns only: no state decoding on reads.
+    return SettlementAggregateOut(
+        month=rec.month,
+        channel=rec.channel,
+        metrics={
+            "total_count": float(rec.total_count),
+            "total_amount": rec.total_amount,
+            "success_count": float(rec.success_count),
+            "success_amount": rec.success_amount,
+            "failed_count": float(rec.failed_count),
+            "pending_count": float(rec.pending_count),
+            "success_rate": rec.success_rate,
+        },
+        batches=rec.batches,
+        updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
+    )
+
+
+def _encode_state(agg: SettlementAggregate) -> dict[str, Any]:
+    # JSON has no NaN/Infinity (PostgreSQL rejects them in json columns): store them as
+    # the strings "nan" / "inf" / "-inf".
+    return {
+        k: repr(v) if isinstance(v, float) and not math.isfinite(v) else v for k, v in agg.model_dump().items()
+    }
+
+
+def _decode_state(state: dict[str, Any]) -> SettlementAggregate:
+    return SettlementAggregate.model_validate({k: float(v) if isinstance(v, str) else v for k, v in state.items()})
+
+
+def _store(rec: SettlementAggregateRecord, agg: SettlementAggregate) -> None:
+    m = agg.metrics()
+    rec.state = _encode_state(agg)
+    rec.total_count = agg.total_count
+    rec.total_amount = m["total_amount"]
+    rec.success_count = agg.success_count
+    rec.success_amount = m["success_amount"]
+    rec.failed_count = agg.failed_count
+    rec.pending_count = agg.pending_count
+    rec.success_rate = m["success_rate"]
+    rec.batches = (rec.batches or 0) + 1
+    rec.updated_at = datetime.utcnow()
+
+
+def _deltas(req: SettlementDeltaRequest) -> list[tuple[str, SettlementAggregate]]:
+    total = SettlementAggregate()
+    total.add_columns(req.amount, req.status)
+    out = [(ALL_CHANNELS, total)]
+    if req.channel is not None:
+        by_channel = aggregate_by_key(req.amount, req.status, [_channel_key(c) for c in req.channel])
+        # Fixed lock order across writers (ALL_CHANNELS sorts first) avoids deadlocks.
+        out += sorted(by_channel.items())
+    return out
+
+
+def apply_settlement_delta(month: str, req: SettlementDeltaRequest) -> SettlementDeltaResponse:
+    """Fold a batch of new rows into the stored month (and per-channel) aggregates.
+
+    The delta is aggregated in memory first; the transaction only merges a handful
+    of partial aggregates, whatever the batch size. Raises ValueError on bad input
+    and SQLAlchemyError when the database is unavailable.
+    """
+
+    deltas = _deltas(req)
+    rows = len(req.amount)
+
+    with _write_lock:
+        for attempt in range(2):
+            try:
+                with SessionLocal() as db:
+                    if req.batch_id and db.get(SettlementBatch, req.batch_id) is not None:
+                        return SettlementDeltaResponse(applied=False, rows=0, total=_get(db, month, ALL_CHANNELS))
+                    if req.batch_id:
+                        db.add(SettlementBatch(batch_id=req.batch_id, month=month, rows=rows))
+
+                    total_rec: Optional[SettlementAggregateRecord] = None
+                    for channel, delta in deltas:
+                        rec = db.execute(
+                            select(SettlementAggregateRecord)
+                            .where(SettlementAggregateRecord.month == month, SettlementAggregateRecord.channel == channel)
+                            .with_for_update()
+                        ).scalar_one_or_none()
+                        if rec is None:
+                            rec = SettlementAggregateRecord(month=month, channel=channel, batches=0)
+                            db.add(rec)
+                            merged = delta
+                        else:
+                            merged = _decode_state(rec.state).merge(delta)
+                        _store(rec, merged)
+                        if channel == ALL_CHANNELS:
+                            total_rec = rec
+
+                    db.commit()
+                    return SettlementDeltaResponse(applied=True, rows=rows, total=_out(total_rec) if total_rec else None)
+            except IntegrityError:
+                # Another process inserted the batch id or a first-time (month, channel)
+                # row concurrently: retry once, which sees its commit.
+                if attempt:
+                    raise
+    raise AssertionError("unreachable")
+
+
+def _get(db, month: str, channel: str) -> Optional[SettlementAggregateOut]:
+    rec = db.execute(
+        select(SettlementAggregateRecord).where(
+            SettlementAggregateRecord.month == month, SettlementAggregateRecord.channel == channel
+        )
+    ).scalar_one_or_none()
+    return _out(rec) if rec is not None else None
+
+
+def get_settlement_aggregate(month: str, channel: str = ALL_CHANNELS) -> Optional[SettlementAggregateOut]:
+    with SessionLocal() as db:
+        return _get(db, month, channel)
+
+
+def list_settlement_aggregates(month: str) -> list[SettlementAggregateOut]:
+    with SessionLocal() as db:
+        recs = db.execute(
+            select(SettlementAggregateRecord)
+            .where(SettlementAggregateRecord.month == month)
+            .order_by(SettlementAggregateRecord.channel)
+        ).scalars()
+        return [_out(r) for r in recs]
+
+
+def reset_settlement_month(month: str) -> int:
+    """Drop a month's aggregates and applied batch ids (e.g. before a full recompute)."""
+
+    with _write_lock, SessionLocal() as db:
+        deleted = db.execute(delete(SettlementAggregateRecord).where(SettlementAggregateRecord.month == month)).rowcount
+        db.execute(delete(SettlementBatch).where(SettlementBatch.month == month))
+        db.commit()
+        return int(deleted or 0)
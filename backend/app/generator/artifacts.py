@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import uuid
+from typing import Optional, Sequence
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db import SessionLocal
+from app.core.storage import safe_put_text
+from app.generator.diagram import DiagramGenerateRequest, DiagramGenerateResponse
+from app.generator.integration import IntegrationGenerateRequest, IntegrationGenerateResponse
+from app.models.artifact import Artifact
+
+
+def _diagram_artifact(req: DiagramGenerateRequest, result: DiagramGenerateResponse) -> Artifact:
+    # Assign the id up front: the column default only fires on flush, but the object key needs it.
+    artifact_id = str(uuid.uuid4())
+    a = Artifact(
+        id=artifact_id,
+        kind="diagram",
+        status="done",
+        request=req.model_dump(),
+        spec=result.spec,
+        mermaid=result.mermaid,
+    )
+    # Store a copy in MinIO (best-effort)
+    object_key = f"artifacts/{artifact_id}/diagram.mmd"
+    a.object_key = safe_put_text(object_key, result.mermaid, content_type="text/plain; charset=utf-8")
+    return a
+
+
+def save_diagram_artifacts(
+    items: Sequence[tuple[DiagramGenerateRequest, Optional[DiagramGenerateResponse]]],
+) -> list[Optional[str]]:
+    """Persist successful diagram results in one transaction; returns ids aligned with `items`."""
+
+    ids: list[Optional[str]] = [None] * len(items)
+    try:
+        with SessionLocal() as db:
+            pending: list[tuple[int, Artifact]] = []
+            for i, (req, result) in enumerate(items):
+                if result is None:
+                    continue
+                a = _diagram_artifact(req, result)
+                db.add(a)
+                pending.append((i, a))
+            if not pending:
+                return ids
+            db.commit()
+            for i, a in pending:
+                ids[i] = a.id
+    except SQLAlchemyError:
+        return [None] * len(items)
+    except Exception:
+        return [None] * len(items)
+    return ids
+
+
+def save_diagram_artifact(req: DiagramGenerateRequest, result: DiagramGenerateResponse) -> Optional[str]:
+    return save_diagram_artifacts([(req, result)])[0]
+
+
+def save_integration_artifact(req: IntegrationGenerateRequest, result: IntegrationGenerateResponse) -> Optional[str]:
+    try:
+        with SessionLocal() as db:
+            artifact_id = str(uuid.uuid4())
+            a = Artifact(
+                id=artifact_id,
+                kind="integration",
+                status="done",
+                request=req.model_dump(),
+                markdown=result.markdown,
+            )
+            object_key = f"artifacts/{artifact_id}/integration.md"
+            a.object_key = safe_put_text(object_key, result.markdown, content_type="text/markdown; charset=utf-8")
+            db.add(a)
+            db.commit()
+            return a.id
+    except SQLAlchemyError:
+        return None
+    except Exception:
+        return None
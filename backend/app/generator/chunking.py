@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import math
+import re
+from typing import Callable, Optional, Sequence, Union
+
+from app.generator.spec import FlowSpec, SequenceSpec, StateSpec
+
+# Long documents are split into chunks that are extracted independently (map) and then
+# merged into one spec (reduce). Cuts prefer the strongest boundary that keeps chunks
+# under the size limit: headings, then paragraphs, lines, sentences, and only as a last
+# resort a hard cut.
+_BOUNDARIES = (
+    # Markdown headings, 第一章 / 第2节, 一、 ; the cut goes before the heading line.
+    re.compile(r"\n(?=[ \t]*(?:#{1,6}\s|第[一二三四五六七八九十百\d]+[章节部分]|[一二三四五六七八九十]+[、.．]))"),
+    re.compile(r"\n[ \t]*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[。！？；.!?;])"),
+)
+
+# Flow chunks are told to mark their own start/end with these labels (see diagram_prompt).
+_START_LABELS = {"开始", "start", "begin", "起点"}
+_END_LABELS = {"结束", "end", "finish", "终点"}
+_STATE_MARKER = "[*]"
+
+AnySpec = Union[FlowSpec, SequenceSpec, StateSpec]
+Edge = tuple[int, int, str]
+
+
+def _spans(text: str, a: int, b: int, size: int, level: int) -> list[tuple[int, int]]:
+    if b - a <= size:
+        return [(a, b)]
+    if level == len(_BOUNDARIES):
+        return [(i, min(i + size, b)) for i in range(a, b, size)]
+    cuts = [m.end() for m in _BOUNDARIES[level].finditer(text, a, b) if a < m.end() < b]
+    if not cuts:
+        return _spans(text, a, b, size, level + 1)
+    # Greedily pack whole sections; a section too large on its own is split one level down.
+    out: list[tuple[int, int]] = []
+    start = a
+    bounds = [a, *cuts, b]
+    for lo, hi in zip(bounds, bounds[1:]):
+        if hi - lo > size:
+            if lo > start:
+                out.append((start, lo))
+            out.extend(_spans(text, lo, hi, size, level + 1))
+            start = hi
+        elif hi - start > size:
+            out.append((start, lo))
+            start = lo
+    if start < b:
+        out.append((start, b))
+    return out
+
+
+def split_text(text: str, max_chars: int, max_chunks: int) -> list[str]:
+    """Split `text` on section boundaries into chunks of at most ~`max_chars` characters.
+
+    Text within the limit (or max_chars <= 0) comes back as a single chunk. The chunk
+    size grows as needed so there are never more than `max_chunks` chunks.
+    """
+
+    text = (text or "").strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    size = max(max_chars, math.ceil(len(text) / max(1, max_chunks)))
+    while True:
+        chunks = [c for c in (text[a:b].strip() for a, b in _spans(text, 0, len(text), size, 0)) if c]
+        if len(chunks) <= max_chunks:
+            return chunks
+        size = math.ceil(size * 1.25)
+
+
+def _label_key(label: str) -> str:
+    return re.sub(r"\s+", "", label).casefold()
+
+
+def _stitch(chunks: list[list[Edge]], is_start: Callable[[int], bool], is_end: Callable[[int], bool]) -> list[Edge]:
+    """Join consecutive chunks: edges into chunk i's end marker continue at chunk i+1's first steps.
+
+    Without this every chunk would hang off the shared start/end nodes in parallel.
+    """
+
+    chunks = [list(c) for c in chunks]
+    for i in range(1, len(chunks)):
+        prev, cur = chunks[i - 1], chunks[i]
+        exits = [(u, label) for u, v, label in prev if is_end(v) and not is_start(u)]
+        entries = [(v, label) for u, v, label in cur if is_start(u) and not is_end(v)]
+        if not exits or not entries:
+            continue
+        chunks[i - 1] = [e for e in prev if not (is_end(e[1]) and not is_start(e[0]))]
+        chunks[i] = [e for e in cur if not (is_start(e[0]) and not is_end(e[1]))]
+        chunks[i] = [(u, v, a or b) for u, a in exits for v, b in entries] + chunks[i]
+    return list(dict.fromkeys(e for c in chunks for e in c))
+
+
+def _notes(specs: Sequence[AnySpec]) -> Optional[str]:
+    notes = list(dict.fromkeys(s.note.strip() for s in specs if s.note and s.note.strip()))
+    return "\n".join(notes) or None
+
+
+def _merge_flow(specs: Sequence[FlowSpec]) -> dict:
+    labels: list[str] = []
+    by_label: dict[str, int] = {}
+    chunks: list[list[Edge]] = []
+
+    for spec in specs:
+        local: dict[str, int] = {}
+        used: set[int] = set()
+
+        def _node(node_id: str, label: str) -> int:
+            if node_id in local:
+                return local[node_id]
+            g = by_label.get(_label_key(label))
+            if g is None or g in used:
+                # New label, or a second node with the same label inside one chunk: keep it distinct.
+                g = len(labels)
+                labels.append(label)
+                by_label.setdefault(_label_key(label), g)
+            local[node_id] = g
+            used.add(g)
+            return g
+
+        for n in spec.nodes:
+            _node(n.id, n.label)
+        chunks.append([(_node(e.from_, e.from_), _node(e.to, e.to), e.label or "") for e in spec.edges])
+
+    keys = [_label_key(s) for s in labels]
+    edges = _stitch(chunks, lambda i: keys[i] in _START_LABELS, lambda i: keys[i] in _END_LABELS)
+    linked = {i for u, v, _ in edges for i in (u, v)}
+    # Renumber, dropping start/end nodes that lost all their edges to the stitching.
+    ids: dict[int, str] = {}
+    nodes = []
+    for i, label in enumerate(labels):
+        if i not in linked and (keys[i] in _START_LABELS or keys[i] in _END_LABELS):
+            continue
+        ids[i] = f"n{len(nodes) + 1}"
+        nodes.append({"id": ids[i], "label": label})
+    return {
+        "type": "flow",
+        "direction": specs[0].direction,
+        "nodes": nodes,
+        "edges": [{"from": ids[u], "to": ids[v], "label": label} for u, v, label in edges],
+        "note": _notes(specs),
+    }
+
+
+def _merge_sequence(specs: Sequence[SequenceSpec]) -> dict:
+    participants: list[str] = []
+    messages: list[dict] = []
+    for spec in specs:
+        participants.extend(spec.participants)
+        for m in spec.messages:
+            participants.extend((m.from_, m.to))
+            msg = {"from": m.from_, "to": m.to, "label": m.label}
+            # Order matters here, so only a repeat across a chunk boundary is dropped.
+            if not messages or messages[-1] != msg:
+                messages.append(msg)
+    return {
+        "type": "sequence",
+        "participants": list(dict.fromkeys(participants)),
+        "messages": messages,
+        "note": _notes(specs),
+    }
+
+
+def _merge_state(specs: Sequence[StateSpec]) -> dict:
+    names: list[str] = [_STATE_MARKER]
+    index: dict[str, int] = {_STATE_MARKER: 0}
+    chunks: list[list[Edge]] = []
+
+    def _state(name: str) -> int:
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        return index[name]
+
+    for spec in specs:
+        for s in spec.states:
+            _state(s)
+        chunks.append([(_state(t.from_), _state(t.to), t.label or "") for t in spec.transitions])
+
+    transitions = _stitch(chunks, lambda i: i == 0, lambda i: i == 0)
+    return {
+        "type": "state",
+        "states": names[1:],
+        "transitions": [{"from": names[u], "to": names[v], "label": label or None} for u, v, label in transitions],
+        "note": _notes(specs),
+    }
+
+
+def merge_specs(specs: Sequence[AnySpec]) -> dict:
+    """Merge per-chunk specs (in document order, all of one type) into one spec dict.
+
+    Flow nodes with the same label are one node and get fresh ids; participants and
+    states are matched by name; duplicate edges/transitions are dropped. Where a chunk
+    ends at 结束 / [*] and the next starts at 开始 / [*], the two are chained.
+    """
+
+    if not specs:
+        raise ValueError("no chunk produced a usable spec")
+    if isinstance(specs[0], FlowSpec):
+        return _merge_flow(specs)
+    if isinstance(specs[0], SequenceSpec):
+        return _merge_sequence(specs)
+    return _merge_state(specs)
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from typing import Any, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
+from app.generator.spec import DiagramSpec
 
 DiagramType = Literal["flow", "sequence", "state"]
 
@@ -12,16 +13,70 @@ class DiagramGenerateRequest(BaseModel):
     diagram_type: DiagramType = Field(description="flow | sequence | state")
     text: str
     scene: Optional[str] = None
+    fast_path: Optional[bool] = Field(
+        None,
+        description="Rule-based extraction without the LLM for already structured text (arrows, numbered "
+        "steps, `A->>B: msg`). true: rules only (422 if the text does not parse); false: always ask the "
+        "model; default: rules when they parse with confidence (DIAGRAM_FAST_PATH), else the model",
+    )
 
 
 class DiagramGenerateResponse(BaseModel):
     spec: dict[str, Any]
     mermaid: str
+    repairs: list[str] = Field(
+        default_factory=list, description="Fixes applied to malformed/truncated model JSON (empty if none)"
+    )
+    chunks: Optional[int] = Field(
+        None, description="Number of sections long text was split into and extracted separately (unset if not split)"
+    )
 
 
 class DrawioXmlGenerateRequest(BaseModel):
-    text: str = Field(description="User description to be converted into draw.io mxfile XML")
+    text: str = Field("", description="User description to be converted into draw.io mxfile XML")
+    spec: Optional[DiagramSpec] = Field(
+        None, description="A flow/sequence/state spec (e.g. from /generate) to export without the LLM"
+    )
+    engine: Optional[Literal["llm", "layout"]] = Field(
+        None,
+        description="llm: ask the model for XML from `text`; layout: export `spec` with the built-in "
+        "auto-layout. Default: layout when a spec is given, else llm",
+    )
+
+    @model_validator(mode="after")
+    def _check_engine(self) -> "DrawioXmlGenerateRequest":
+        if self.engine == "layout" and self.spec is None:
+            raise ValueError("engine=layout needs a spec")
+        if not self.use_layout and not self.text.strip():
+            raise ValueError("text is required unless a spec is exported with engine=layout")
+        return self
+
+    @property
+    def use_layout(self) -> bool:
+        return self.engine == "layout" or (self.engine is None and self.spec is not None)
 
 
 class DrawioXmlGenerateResponse(BaseModel):
     xml: str = Field(description="draw.io mxfile XML")
+
+
+class DiagramBatchRequest(BaseModel):
+    items: list[DiagramGenerateRequest] = Field(min_length=1, description="One request per diagram (e.g. per scene)")
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Max parallel provider calls for this batch (capped by LLM_MAX_CONCURRENCY)"
+    )
+    persist: bool = Field(True, description="Save successful results as Artifact rows in one transaction")
+
+
+class DiagramBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[DiagramGenerateResponse] = None
+    error: Optional[str] = None
+    artifact_id: Optional[str] = None
+
+
+class DiagramBatchResponse(BaseModel):
+    items: list[DiagramBatchItem]
+    succeeded: int
+    failed: int
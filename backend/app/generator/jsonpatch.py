@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JsonPatchError(ValueError):
+    """The patch is malformed or does not apply to the document."""
+
+
+class JsonPatchConflict(JsonPatchError):
+    """A `test` operation failed."""
+
+
+class PatchOp(BaseModel):
+    """One RFC 6902 operation."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Any = None
+    from_: Optional[str] = Field(default=None, alias="from")
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """RFC 6901 JSON pointer -> reference tokens ("" is the whole document)."""
+
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"invalid JSON pointer: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def _index(token: str, size: int, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return size
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"invalid array index: {token!r}")
+    i = int(token)
+    if i > size or (i == size and not allow_end):
+        raise JsonPatchError(f"array index out of range: {i}")
+    return i
+
+
+class JsonPatcher:
+    """Applies operations one by one to a private copy of `doc`.
+
+    Copy-on-write: only the containers on the paths that operations touch are
+    copied (shallowly, once each), so a small patch against a large spec costs
+    about the size of the lists it edits, not a deep copy of the document. The
+    input document is never modified.
+    """
+
+    def __init__(self, doc: Any) -> None:
+        self.doc = copy.copy(doc)
+        self._owned: set[int] = {id(self.doc)}
+
+    def get(self, pointer: str) -> Any:
+        node = self.doc
+        for token in parse_pointer(pointer):
+            node = self._child(node, token)
+        return node
+
+    def apply(self, op: PatchOp) -> None:
+        if op.op == "test":
+            if not _json_equal(self.get(op.path), self._value(op)):
+                raise JsonPatchConflict(f"test failed at {op.path!r}")
+            return
+        if op.op in {"move", "copy"}:
+            if op.from_ is None:
+                raise JsonPatchError(f"{op.op} needs 'from'")
+            if op.op == "move" and (op.path + "/").startswith(op.from_ + "/"):
+                if op.path != op.from_:
+                    raise JsonPatchError("cannot move a value into one of its children")
+                self.get(op.from_)
+                return
+            value = self.get(op.from_) if op.op == "copy" else self._remove(op.from_)
+            self._add(op.path, copy.deepcopy(value) if op.op == "copy" else value)
+            return
+        if op.op == "add":
+            self._add(op.path, self._value(op))
+        elif op.op == "remove":
+            self._remove(op.path)
+        else:
+            self._replace(op.path, self._value(op))
+
+    @staticmethod
+    def _value(op: PatchOp) -> Any:
+        if "value" not in op.model_fields_set:
+            raise JsonPatchError(f"{op.op} needs 'value'")
+        return copy.deepcopy(op.value)
+
+    @staticmethod
+    def _child(node: Any, token: str) -> Any:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f"path not found: member {token!r}")
+            return node[token]
+        if isinstance(node, list):
+            return node[_index(token, len(node), allow_end=False)]
+        raise JsonPatchError(f"path not found: {token!r} of a scalar")
+
+    def _parent(self, pointer: str) -> tuple[Any, str]:
+        tokens = parse_pointer(pointer)
+        if not tokens:
+            raise JsonPatchError("the document root cannot be the target here")
+        node = self.doc
+        for token in tokens[:-1]:
+            child = self._child(node, token)
+            if isinstance(child, (dict, list)) and id(child) not in self._owned:
+                child = copy.copy(child)
+                self._owned.add(id(child))
+                node[_index(token, len(node), False) if isinstance(node, list) else token] = child
+            node = child
+        if not isinstance(node, (dict, list)):
+            raise JsonPatchError(f"path not found: {pointer!r}")
+        return node, tokens[-1]
+
+    def _add(self, pointer: str, value: Any) -> None:
+        if pointer == "":
+            self.doc = value
+            return
+        parent, token = self._parent(pointer)
+        if isinstance(parent, list):
+            parent.insert(_index(token, len(parent), allow_end=True), value)
+        else:
+            parent[token] = value
+
+    def _remove(self, pointer: str) -> Any:
+        parent, token = self._parent(pointer)
+        if isinstance(parent, list):
+            return parent.pop(_index(token, len(parent), allow_end=False))
+        if token not in parent:
+            raise JsonPatchError(f"path not found: member {token!r}")
+        return parent.pop(token)
+
+    def _replace(self, pointer: str, value: Any) -> None:
+        if pointer == "":
+            self.doc = value
+            return
+        parent, token = self._parent(pointer)
+        if isinstance(parent, list):
+            parent[_index(token, len(parent), allow_end=False)] = value
+        else:
+            if token not in parent:
+                raise JsonPatchError(f"path not found: member {token!r}")
+            parent[token] = value
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    # JSON semantics: 1 == 1.0, but true != 1.
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def apply_patch(doc: Any, ops: list[PatchOp]) -> Any:
+    """Apply an RFC 6902 patch; returns the patched copy (atomic: errors leave `doc` as is)."""
+
+    patcher = JsonPatcher(doc)
+    for op in ops:
+        patcher.apply(op)
+    return patcher.doc
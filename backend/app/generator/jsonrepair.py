@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+# Model output is often cut off by max_tokens or wrapped in prose/markdown. Well-formed
+# JSON is decoded by the C decoder straight from the first brace; only broken output
+# goes through the token scanner below, which moves one regex match per token (strings
+# are matched whole) and hands every complete nested value back to the C decoder.
+
+_DECODER = json.JSONDecoder(strict=False)  # strict=False: raw newlines/tabs inside strings
+
+_FENCE = re.compile(r"```[ \t]*(?:json|JSON|javascript|js)?[ \t]*\r?\n?")
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<str>"[^"\\]*(?:\\.[^"\\]*)*")
+    |(?P<open_str>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)
+    |(?P<num>-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<lit>true|false|null)
+    |(?P<py>True|False|None)
+    |(?P<punct>[{}\[\]:,])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# What may follow a complete number; anything else (end of text, "1." cut before its
+# fraction digits) means the number itself may be cut short.
+_AFTER_NUMBER = set(" \t\r\n,]}")
+_CLOSERS = {"{": "}", "[": "]"}
+# A string cut inside an escape sequence: drop the partial escape before closing it.
+_PARTIAL_ESCAPE = re.compile(r"\\(?:u[0-9a-fA-F]{0,3})?\Z")
+
+
+@dataclass
+class RepairResult:
+    value: Any
+    # What had to be fixed, in order; empty when the JSON parsed as is.
+    repairs: list[str] = field(default_factory=list)
+
+
+def _start(text: str, openers: str, repairs: list[str]) -> int:
+    """Offset of the first opener, preferring one inside a markdown fence."""
+
+    fence = _FENCE.search(text)
+    if fence is not None:
+        inside = min((i for i in (text.find(c, fence.end()) for c in openers) if i >= 0), default=-1)
+        if inside >= 0:
+            repairs.append("stripped markdown fence")
+            return inside
+    start = min((i for i in (text.find(c) for c in openers) if i >= 0), default=-1)
+    if start > 0 and text[:start].strip():
+        repairs.append("skipped leading text")
+    return start
+
+
+def _note(repairs: list[str], msg: str) -> None:
+    if msg not in repairs:
+        repairs.append(msg)
+
+
+def _trailing(text: str, end: int, repairs: list[str]) -> None:
+    rest = text[end:].strip()
+    if rest and rest.strip("`").strip():
+        _note(repairs, "ignored trailing text")
+
+
+def _repair(text: str, start: int, repairs: list[str]) -> str:
+    """Rewrite text[start:] into parseable JSON: cut at the last complete element, then close."""
+
+    out: list[str] = []
+    # [opener, state, len(out) before the opener, element of an array?]; state: key | colon | value | next
+    stack: list[list[Any]] = []
+    after_comma = False
+    safe_len, safe_stack = -1, []  # last cut point that closes into valid JSON
+    scanner = _TOKEN.scanner(text, start)
+    end = start
+    exhausted = False  # every character was consumed as a token
+    closed_at = -1  # index in `out` of a string closed by us
+
+    def _mark_safe() -> None:
+        nonlocal safe_len, safe_stack
+        safe_len, safe_stack = len(out), [frame[0] for frame in stack]
+
+    while True:
+        m = scanner.match()
+        if m is None:
+            exhausted = end == len(text)
+            break
+        kind, tok = m.lastgroup, m.group()
+        end = m.end()
+        if kind == "ws":
+            continue
+        top = stack[-1] if stack else None
+
+        if tok in ("}", "]"):
+            if top is None or _CLOSERS[top[0]] != tok or (top[0] == "{" and top[1] in ("colon", "value")):
+                break
+            if after_comma:
+                out.pop()
+                _note(repairs, "removed trailing comma")
+            stack.pop()
+            out.append(tok)
+            after_comma = False
+            if not stack:
+                _trailing(text, end, repairs)
+                return "".join(out)
+            stack[-1][1] = "next"
+            _mark_safe()
+            continue
+        if tok == ":":
+            if top is None or top[1] != "colon":
+                break
+            top[1] = "value"
+            out.append(tok)
+            continue
+        if tok == ",":
+            if top is None or top[1] != "next":
+                break
+            top[1] = "key" if top[0] == "{" else "value"
+            out.append(tok)
+            after_comma = True
+            continue
+
+        # A value, or an object key.
+        if top is None:
+            if out or tok not in _CLOSERS:
+                break
+        elif top[1] == "key":
+            if kind != "str":
+                break  # includes a key cut off mid-string
+            out.append(tok)
+            top[1] = "colon"
+            after_comma = False
+            continue
+        elif top[1] != "value":
+            break
+
+        after_comma = False
+        if tok in _CLOSERS and top is not None:
+            # Complete nested values (every node/edge before the cut) go through the C decoder
+            # in one call; only containers still open at the cut are walked token by token.
+            try:
+                _, value_end = _DECODER.raw_decode(text, m.start())
+            except json.JSONDecodeError:
+                pass
+            else:
+                out.append(text[m.start() : value_end])
+                top[1] = "next"
+                _mark_safe()
+                end = value_end
+                scanner = _TOKEN.scanner(text, value_end)
+                continue
+        if tok in _CLOSERS:
+            out.append(tok)
+            stack.append([tok, "key" if tok == "{" else "value", len(out) - 1, top is not None and top[0] == "["])
+            _mark_safe()
+            continue
+        if kind == "num" and (end == len(text) or text[end] not in _AFTER_NUMBER):
+            break  # a possibly truncated number (`1.`, `12` at the cut) is not a value
+        if kind == "open_str":
+            tok = _PARTIAL_ESCAPE.sub("", tok) + '"'
+            closed_at = len(out)
+        elif kind == "py":
+            tok = _PY_LITERALS[tok]
+            _note(repairs, "converted Python literal")
+        out.append(tok)
+        top[1] = "next"
+        _mark_safe()
+
+    if safe_len < 0:
+        raise ValueError("LLM output does not contain a JSON object")
+    # An unterminated object inside an array (a node, an edge, ...) is dropped whole:
+    # list elements with missing fields fail validation where a shorter list does not.
+    for j in range(len(stack) - 1, 0, -1):
+        if stack[j][0] == "{" and stack[j][3]:
+            safe_len, safe_stack = stack[j][2], [frame[0] for frame in stack[:j]]
+            if out[safe_len - 1] == ",":
+                safe_len -= 1
+            break
+    if 0 <= closed_at < safe_len:
+        _note(repairs, "closed unterminated string")
+    if safe_len < len(out) or not exhausted:
+        _note(repairs, "dropped incomplete trailing element")
+    del out[safe_len:]
+    if safe_stack and safe_stack[-1] == "{" and out[-1] == "{":
+        # Every key of an object the output had started was lost: that is not a repair
+        # (e.g. a single-quoted Python dict would otherwise come back as {}).
+        raise ValueError("LLM output JSON could not be repaired: no complete key/value pair")
+    if safe_stack:
+        _note(repairs, f"closed {len(safe_stack)} unterminated array(s)/object(s)")
+    out.extend(_CLOSERS[o] for o in reversed(safe_stack))
+    return "".join(out)
+
+
+def repair_json(text: str, openers: str = "{") -> RepairResult:
+    """Parse the first JSON value starting with one of `openers` out of model output.
+
+    Handles markdown fences and surrounding prose, and repairs truncation: unterminated
+    strings, arrays and objects are closed and a trailing partial element (half a key,
+    a key without value, a cut-off literal) is dropped. Trailing commas and Python
+    True/False/None are fixed too. Raises ValueError when there is nothing to salvage.
+    """
+
+    t = (text or "").strip()
+    repairs: list[str] = []
+    start = _start(t, openers, repairs)
+    if start < 0:
+        raise ValueError("LLM output does not contain a JSON object")
+    try:
+        value, end = _DECODER.raw_decode(t, start)
+        _trailing(t, end, repairs)
+        return RepairResult(value=value, repairs=repairs)
+    except json.JSONDecodeError:
+        pass
+    fixed = _repair(t, start, repairs)
+    return RepairResult(value=_DECODER.decode(fixed), repairs=repairs)
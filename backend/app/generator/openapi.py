@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+from app.core.lru import MemoryLRU
+from app.core.settings import settings
+
+# Partner Swagger/OpenAPI documents run to hundreds of KB, nearly all of it schemas and
+# examples the plan never needs. They are parsed once into a compact endpoint index
+# (cached by content hash) and only the endpoints relevant to the request text, plus
+# auth schemes and webhooks, go into the integration prompt.
+
+_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+_IDEMPOTENCY_HEADER = re.compile(r"idempot|nonce|dedup", re.I)
+_MAX_FIELDS = 25
+_MAX_WEBHOOKS = 10
+
+
+@dataclass
+class Operation:
+    method: str
+    path: str
+    operation_id: str = ""
+    summary: str = ""
+    tags: list[str] = field(default_factory=list)
+    # "in:name", "*" suffix when required
+    params: list[str] = field(default_factory=list)
+    # Top-level request body fields, "*" suffix when required
+    body: list[str] = field(default_factory=list)
+    responses: list[str] = field(default_factory=list)
+    # None: the document's default security; []: explicitly public
+    security: Optional[list[str]] = None
+    idempotency: list[str] = field(default_factory=list)
+    # "name: METHOD url-expression"
+    callbacks: list[str] = field(default_factory=list)
+    deprecated: bool = False
+    # Search terms (path, operationId, summary, tags, fields), precomputed so cache hits
+    # only score; not rendered.
+    search: str = ""
+
+
+@dataclass
+class OpenAPIIndex:
+    title: str = ""
+    version: str = ""
+    servers: list[str] = field(default_factory=list)
+    # scheme name -> one-line description
+    auth: dict[str, str] = field(default_factory=dict)
+    security: list[str] = field(default_factory=list)
+    operations: list[Operation] = field(default_factory=list)
+    webhooks: list[str] = field(default_factory=list)
+
+
+def parse_document(text: str) -> Optional[dict[str, Any]]:
+    """The Swagger 2 / OpenAPI 3 document in `text` (JSON, or YAML with PyYAML installed), else None."""
+
+    t = (text or "").strip()
+    doc: Any = None
+    if t.startswith("{"):
+        try:
+            doc = json.loads(t)
+        except ValueError:
+            return None
+    else:
+        try:
+            import yaml  # local import: optional dependency
+        except ImportError:
+            return None
+        try:
+            doc = yaml.load(t, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        except yaml.YAMLError:
+            return None
+    if not isinstance(doc, dict) or not ("openapi" in doc or "swagger" in doc):
+        return None
+    if not isinstance(doc.get("paths") or {}, dict):
+        return None
+    return doc
+
+
+def _dict(node: Any) -> dict[Any, Any]:
+    # Partner documents are often loosely typed (YAML especially): anything that is not
+    # the expected shape is treated as absent.
+    return node if isinstance(node, dict) else {}
+
+
+def _list(node: Any) -> list[Any]:
+    return node if isinstance(node, list) else []
+
+
+def _str(value: Any) -> str:
+    # YAML turns unquoted `2024-01-01`, `Yes` or `1.0` into date/bool/float.
+    return "" if value is None else str(value)
+
+
+def _resolve(doc: dict[str, Any], node: Any) -> Any:
+    # Local refs only (#/components/..., #/definitions/...); remote refs stay unresolved.
+    for _ in range(16):
+        if not isinstance(node, dict) or not isinstance(node.get("$ref"), str) or not node["$ref"].startswith("#/"):
+            return node
+        target: Any = doc
+        for part in node["$ref"][2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            target = target.get(part) if isinstance(target, dict) else None
+        node = target
+    return node
+
+
+def _fields(doc: dict[str, Any], schema: Any) -> list[str]:
+    schema = _resolve(doc, schema)
+    if not isinstance(schema, dict):
+        return []
+    if schema.get("type") == "array":
+        return _fields(doc, schema.get("items"))
+    props: dict[str, Any] = {}
+    required: set[str] = set()
+    for part in [schema, *_list(schema.get("allOf"))]:
+        part = _resolve(doc, part)
+        if isinstance(part, dict):
+            props.update((_str(k), v) for k, v in _dict(part.get("properties")).items())
+            # `required: true` (Swagger 2 parameter style) on a schema is ignored.
+            required.update(_str(r) for r in _list(part.get("required")))
+    out = [f"{name}*" if name in required else name for name in props]
+    return out[:_MAX_FIELDS] + (["…"] if len(out) > _MAX_FIELDS else [])
+
+
+def _scheme_summary(scheme: dict[str, Any]) -> str:
+    kind = _str(scheme.get("type"))
+    if kind == "http":
+        fmt = f" ({_str(scheme['bearerFormat'])})" if scheme.get("bearerFormat") else ""
+        return f"http {_str(scheme.get('scheme'))}{fmt}".strip()
+    if kind == "apiKey":
+        return f"apiKey {_str(scheme.get('in'))} {_str(scheme.get('name'))}".strip()
+    if kind == "oauth2":
+        # OpenAPI 3 has one entry per flow; Swagger 2 describes a single flow inline.
+        flows = scheme.get("flows") if isinstance(scheme.get("flows"), dict) else {_str(scheme.get("flow")): scheme}
+        parts = [
+            f"{_str(name)} {_str(_dict(f).get('tokenUrl') or _dict(f).get('authorizationUrl'))}"
+            for name, f in flows.items()
+        ]
+        return "oauth2 " + "; ".join(p.strip() for p in parts)
+    if kind == "openIdConnect":
+        return f"openIdConnect {_str(scheme.get('openIdConnectUrl'))}".strip()
+    return kind
+
+
+def _requirements(reqs: Any) -> list[str]:
+    # [{a: [], b: []}, {c: []}] -> ["a+b", "c"]: alternatives, each a set of schemes used together.
+    if not isinstance(reqs, list):
+        return []
+    return ["+".join(map(_str, r)) if r else "none" for r in reqs if isinstance(r, dict)]
+
+
+def _operation(doc: dict[str, Any], path: str, method: str, op: dict[str, Any], shared: list[Any]) -> Operation:
+    params: dict[tuple[str, str], dict[str, Any]] = {}
+    for p in [*shared, *_list(op.get("parameters"))]:
+        p = _resolve(doc, p)
+        if isinstance(p, dict) and p.get("name"):
+            params[(_str(p.get("in")), _str(p["name"]))] = p
+
+    body: list[str] = []
+    listed: list[str] = []
+    idempotency: list[str] = []
+    for (where, name), p in params.items():
+        if where == "body":  # Swagger 2
+            body = _fields(doc, p.get("schema"))
+            continue
+        star = "*" if p.get("required") else ""
+        if where == "formData":
+            body.append(name + star)
+        elif where == "header" and _IDEMPOTENCY_HEADER.search(name):
+            idempotency.append(name + star)
+        else:
+            listed.append(f"{where}:{name}{star}")
+    request_body = _resolve(doc, op.get("requestBody"))
+    if isinstance(request_body, dict):
+        content = _dict(request_body.get("content"))
+        media = content.get("application/json") or next(iter(content.values()), None)
+        if isinstance(media, dict):
+            body = _fields(doc, media.get("schema"))
+
+    callbacks = []
+    for name, cb in _dict(op.get("callbacks")).items():
+        for expr, item in _dict(_resolve(doc, cb)).items():
+            item = _resolve(doc, item)
+            for m in _METHODS:
+                if isinstance(item, dict) and m in item:
+                    callbacks.append(f"{_str(name)}: {m.upper()} {_str(expr)}")
+
+    operation_id = _str(op.get("operationId"))
+    description = _str(op.get("description"))
+    summary = (_str(op.get("summary")) or description).strip().splitlines()
+    tags = [_str(t) for t in _list(op.get("tags"))]
+    words = [
+        path,
+        operation_id,
+        _str(op.get("summary")),
+        description[:300],
+        *tags,
+        *(name for _, name in params),
+        *(f.rstrip("*") for f in body),
+        *(c.split(":", 1)[0] for c in callbacks),
+    ]
+    return Operation(
+        method=method.upper(),
+        path=path,
+        operation_id=operation_id,
+        summary=summary[0][:120] if summary else "",
+        tags=tags,
+        params=listed,
+        body=body,
+        responses=[_str(code) for code in _dict(op.get("responses"))],
+        security=_requirements(op["security"]) if "security" in op else None,
+        idempotency=idempotency,
+        callbacks=callbacks,
+        deprecated=bool(op.get("deprecated")),
+        search=" ".join(sorted(_terms(" ".join(w for w in words if w)))),
+    )
+
+
+def build_index(doc: dict[str, Any]) -> OpenAPIIndex:
+    info = _dict(doc.get("info"))
+    if "servers" in doc:
+        servers = [_str(s.get("url")) for s in _list(doc.get("servers")) if isinstance(s, dict)]
+    else:
+        host = _str(doc.get("host"))
+        scheme = (_list(doc.get("schemes")) or ["https"])[0]
+        servers = [f"{_str(scheme)}://{host}{_str(doc.get('basePath'))}"] if host else []
+    schemes = _dict(_dict(doc.get("components")).get("securitySchemes")) or _dict(doc.get("securityDefinitions"))
+
+    operations = []
+    for path, item in _dict(doc.get("paths")).items():
+        item = _resolve(doc, item)
+        if not isinstance(item, dict):
+            continue
+        for method in _METHODS:
+            if isinstance(item.get(method), dict):
+                operations.append(_operation(doc, _str(path), method, item[method], _list(item.get("parameters"))))
+
+    webhooks = []
+    for name, item in _dict(doc.get("webhooks")).items():  # OpenAPI 3.1
+        item = _resolve(doc, item)
+        for method in _METHODS:
+            if isinstance(item, dict) and isinstance(item.get(method), dict):
+                summary = _str(item[method].get("summary"))
+                webhooks.append(f"{_str(name)}: {method.upper()} {summary}".strip())
+
+    return OpenAPIIndex(
+        title=_str(info.get("title")),
+        version=_str(info.get("version")),
+        servers=servers[:3],
+        auth={_str(name): _scheme_summary(_dict(_resolve(doc, s))) for name, s in schemes.items()},
+        security=_requirements(doc.get("security")),
+        operations=operations,
+        webhooks=webhooks,
+    )
+
+
+_index_cache = MemoryLRU(settings.SWAGGER_INDEX_CACHE_ENTRIES, settings.SWAGGER_INDEX_CACHE_MAX_BYTES, 0)
+
+
+def get_index(text: str) -> Optional[OpenAPIIndex]:
+    """Index of the document in `text`, cached by content hash; None if it is not Swagger/OpenAPI."""
+
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cached = _index_cache.get(key)
+    if cached is not None:
+        if not cached:
+            return None  # remembered: not a parseable spec
+        data = json.loads(cached)
+        data["operations"] = [Operation(**op) for op in data["operations"]]
+        return OpenAPIIndex(**data)
+    doc = parse_document(text)
+    try:
+        index = build_index(doc) if doc is not None else None
+    except Exception:
+        # Shapes the builder does not anticipate: send the document as-is instead.
+        index = None
+    _index_cache.set(key, json.dumps(asdict(index), ensure_ascii=False) if index is not None else "")
+    return index
+
+
+# Relevance: words from the request against each operation's path, operationId, summary,
+# tags and field names, weighted by rarity. Chinese requests are matched on character
+# bigrams and, for common integration vocabulary, English equivalents.
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_WORD = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+_STOP = {
+    "api", "v1", "v2", "v3", "the", "and", "for", "with", "id", "by", "of", "to", "in", "on", "or",
+    "get", "post", "put", "patch", "delete", "http", "https", "json", "data", "info",
+}
+_SYNONYMS = {
+    "支付": "pay payment charge", "付款": "pay payment", "退款": "refund", "订单": "order",
+    "下单": "order create checkout", "回调": "callback webhook notify notification",
+    "通知": "notify notification webhook", "查询": "query search list", "创建": "create",
+    "取消": "cancel", "关闭": "close", "用户": "user customer", "客户": "customer",
+    "会员": "member", "登录": "login auth token session", "鉴权": "auth token oauth",
+    "授权": "authorize auth oauth", "令牌": "token", "对账": "reconcile reconciliation statement",
+    "账单": "bill statement invoice", "结算": "settlement settle", "发票": "invoice",
+    "商户": "merchant", "账户": "account", "余额": "balance", "转账": "transfer",
+    "提现": "withdraw payout", "物流": "shipment logistics delivery", "发货": "ship shipment",
+    "库存": "inventory stock", "商品": "product item sku goods", "文件": "file", "上传": "upload",
+    "下载": "download", "签名": "signature sign", "订阅": "subscription subscribe",
+    "价格": "price", "优惠": "coupon discount", "地址": "address", "短信": "sms",
+    "消息": "message", "报表": "report",
+}
+
+
+def _terms(text: str) -> set[str]:
+    out: set[str] = set()
+    for tok in _WORD.findall(_CAMEL.sub(" ", text).lower()):
+        if tok[0] >= "\u4e00":
+            if len(tok) == 1:
+                out.add(tok)
+            out.update(tok[i : i + 2] for i in range(len(tok) - 1))
+        elif len(tok) > 1 and tok not in _STOP:
+            # Crude singular so "payments" matches "payment".
+            out.add(tok[:-1] if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss") else tok)
+    return out
+
+
+def _query_terms(text: str) -> set[str]:
+    terms = _terms(text)
+    for t in list(terms):
+        if t in _SYNONYMS:
+            terms |= _terms(_SYNONYMS[t])
+    return terms
+
+
+def select_operations(index: OpenAPIIndex, query: str, limit: int) -> tuple[list[Operation], bool]:
+    """Up to `limit` operations most relevant to `query`, in document order.
+
+    The flag is False when nothing matched and the first operations were taken instead.
+    """
+
+    ops = index.operations
+    if len(ops) <= limit:
+        return ops, True
+    q = _query_terms(query)
+    op_terms = [set(op.search.split()) for op in ops]
+    df: dict[str, int] = {}
+    for terms in op_terms:
+        for t in terms & q:
+            df[t] = df.get(t, 0) + 1
+    idf = {t: math.log(1 + len(ops) / n) for t, n in df.items()}
+    scores = [sum(idf[t] for t in terms & q) for terms in op_terms]
+    ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: -scores[i])[:limit]
+    if not ranked:
+        return ops[:limit], False
+    return [ops[i] for i in sorted(ranked)], True
+
+
+def _operation_line(op: Operation) -> str:
+    head = f"{op.method} {op.path}"
+    if op.operation_id:
+        head += f" {op.operation_id}"
+    if op.summary:
+        head += f" — {op.summary}"
+    if op.deprecated:
+        head += " (deprecated)"
+    parts = [head]
+    if op.security is not None:
+        parts.append("auth: " + (" | ".join(op.security) or "none"))
+    for label, values in (
+        ("idempotency", op.idempotency),
+        ("params", op.params),
+        ("body", op.body),
+        ("responses", op.responses),
+        ("callbacks", op.callbacks),
+    ):
+        if values:
+            parts.append(f"{label}: " + ", ".join(values))
+    return " | ".join(parts)
+
+
+def render_index(index: OpenAPIIndex, ops: list[Operation], matched: bool) -> str:
+    lines = [f"API: {index.title} {index.version}".rstrip()]
+    if index.servers:
+        lines.append("Servers: " + ", ".join(index.servers))
+    if index.auth:
+        lines.append("Auth schemes: " + "; ".join(f"{k} = {v}" for k, v in index.auth.items()))
+    if index.security:
+        lines.append("Default auth: " + " | ".join(index.security))
+    total = len(index.operations)
+    if len(ops) == total:
+        lines.append(f"Endpoints ({total}):")
+    elif matched:
+        lines.append(f"Endpoints ({len(ops)} of {total}, those relevant to the request):")
+    else:
+        lines.append(f"Endpoints (first {len(ops)} of {total}; none matched the request text):")
+    lines.extend("- " + _operation_line(op) for op in ops)
+    if index.webhooks:
+        lines.append("Webhooks: " + "; ".join(index.webhooks[:_MAX_WEBHOOKS]))
+    return "\n".join(lines)
+
+
+def swagger_context(swagger_text: str, query: str) -> Optional[str]:
+    """Compact, request-specific summary of a Swagger/OpenAPI document, or None if it does not parse."""
+
+    try:
+        index = get_index(swagger_text)
+        if index is None:
+            return None
+        ops, matched = select_operations(index, query, settings.SWAGGER_MAX_OPERATIONS)
+        return render_index(index, ops, matched)
+    except Exception:
+        # The index is an optimization: never fail the plan over it, use the raw text.
+        return None
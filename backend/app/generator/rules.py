@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+
+class FastPathUnavailable(ValueError):
+    """The fast path was forced but the text is not structured enough for the rules."""
+
+
+# Steps longer than this read like prose (conditions, explanations): leave them to the model.
+MAX_LABEL_CHARS = 60
+
+_ARROW = r"(?:-->|->|→|⇒|=>)"
+# `A -> B`, `A -->|label| B`, `A -- label --> B`; the label part is optional.
+_FLOW_LINK = re.compile(rf"\s*(?:{_ARROW}\s*\|([^|]*)\|\s*|--\s*([^-<>|]+?)\s*{_ARROW}\s*|{_ARROW}\s*)")
+# Mermaid node syntax: id[label], id(label), id{{label}}, id([label]) ...
+_FLOW_NODE = re.compile(r"^([A-Za-z_][\w-]*)\s*[\[\(\{>]+\s*\"?(.*?)\"?\s*[\]\)\}]+$")
+_FLOW_HEADER = re.compile(r"^(?:flowchart|graph)(?:\s+(TD|TB|BT|LR|RL))?\s*;?$", re.I)
+
+# 1. / 1) / 1、 / (1) / （1） / 第1步 / 步骤1: ; the number is captured.
+_NUMBERED = re.compile(r"^(?:[(（]?(\d{1,3})[.)）、．:：]|第\s*(\d{1,3})\s*步[:：、.]?|步骤\s*(\d{1,3})[:：、.]?)\s*(.+)$")
+
+# `A->>B: msg`, `A-->>B: reply`, `A->B: msg`, `A → B：msg`. Cut at the first arrow and
+# then the first colon (str.partition-style) rather than with one backtracking regex.
+_SEQ_ARROW = re.compile(r"-->>|->>|-->|->|→")
+_SEQ_COLON = re.compile(r"[:：]")
+_SEQ_PARTICIPANT = re.compile(r"^(?:participant|actor)\s+(.+?)(?:\s+as\s+.+)?$", re.I)
+
+# `A --> B`, `A -> B: event`, `[*] --> A`
+_STATE_TRANSITION = re.compile(rf"^(.+?)\s*{_ARROW}\s*(.+?)(?:\s*[:：]\s*(.*))?$")
+_STATE_DECL = re.compile(r"^state\s+(\S+)$", re.I)
+
+_COMMENT = re.compile(r"^(?:%%|#|//)")
+
+# Structured lines are short; anything longer is prose for the model, and is not fed
+# to the line regexes at all.
+MAX_LINE_CHARS = 1000
+
+
+def _lines(text: str, header: Optional[re.Pattern[str]] = None) -> list[str]:
+    out = []
+    for line in (text or "").splitlines():
+        line = line.strip().rstrip(";；")
+        if not line or _COMMENT.match(line) or line.strip("`").lower() in {"", "mermaid"}:
+            continue
+        if header is not None and header.match(line):
+            continue
+        out.append(line)
+    return out
+
+
+def _ok_label(label: str) -> bool:
+    return 0 < len(label) <= MAX_LABEL_CHARS
+
+
+class _FlowBuilder:
+    def __init__(self) -> None:
+        self.nodes: list[dict] = []
+        self.edges: list[dict] = []
+        self._ids: dict[str, str] = {}  # explicit id or label -> spec node id
+
+    def node(self, token: str) -> Optional[str]:
+        token = token.strip()
+        m = _FLOW_NODE.match(token)
+        key, label = (m.group(1), m.group(2).strip() or m.group(1)) if m else (token, token)
+        if not _ok_label(label):
+            return None
+        if key not in self._ids:
+            self._ids[key] = f"n{len(self.nodes) + 1}"
+            self.nodes.append({"id": self._ids[key], "label": label})
+        elif m:
+            # A later `id[label]` names a node first seen as a bare id.
+            for n in self.nodes:
+                if n["id"] == self._ids[key] and n["label"] == key:
+                    n["label"] = label
+        return self._ids[key]
+
+    def edge(self, a: str, b: str, label: Optional[str]) -> None:
+        self.edges.append({"from": a, "to": b, "label": (label or "").strip()})
+
+    def spec(self, direction: str) -> Optional[dict]:
+        if len(self.nodes) < 2 or not self.edges:
+            return None
+        return {"type": "flow", "direction": direction, "nodes": self.nodes, "edges": self.edges}
+
+
+def _flow_from_arrows(lines: list[str], direction: str) -> Optional[dict]:
+    b = _FlowBuilder()
+    for line in lines:
+        # A trailing `: label` on a single link labels that edge (`A -> B: 通过`).
+        parts = _FLOW_LINK.split(line)
+        # split() interleaves: token, label1, label2, token, ...
+        tokens = parts[0::3]
+        labels = [x or y for x, y in zip(parts[1::3], parts[2::3])]
+        if len(tokens) < 2:
+            return None
+        tail_label = None
+        if len(tokens) == 2 and not labels[0]:
+            m = re.match(r"^(.+?)\s*[:：]\s*(.+)$", tokens[1])
+            if m and not _FLOW_NODE.match(tokens[1]):
+                tokens[1], tail_label = m.group(1), m.group(2)
+        ids = [b.node(t) for t in tokens]
+        if any(i is None for i in ids):
+            return None
+        for k in range(len(ids) - 1):
+            b.edge(ids[k], ids[k + 1], labels[k] or (tail_label if k == 0 else None))
+    return b.spec(direction)
+
+
+def _numbered_steps(lines: list[str]) -> Optional[list[str]]:
+    steps: list[str] = []
+    expected = None
+    for line in lines:
+        m = _NUMBERED.match(line)
+        if not m:
+            return None
+        num = int(next(g for g in m.groups()[:3] if g))
+        if expected is not None and num != expected:
+            return None
+        expected = num + 1
+        label = m.group(4).strip()
+        if not _ok_label(label):
+            return None
+        steps.append(label)
+    return steps if len(steps) >= 2 else None
+
+
+def flow_spec_from_text(text: str) -> Optional[dict]:
+    direction = "TD"
+    for line in _lines(text):
+        m = _FLOW_HEADER.match(line)
+        if m:
+            direction = (m.group(1) or "TD").upper()
+            break
+    lines = _lines(text, _FLOW_HEADER)
+    if not lines:
+        return None
+    steps = _numbered_steps(lines)
+    if steps is not None:
+        b = _FlowBuilder()
+        ids = [b.node(s) for s in steps]
+        if any(i is None for i in ids):
+            return None
+        for k in range(len(ids) - 1):
+            b.edge(ids[k], ids[k + 1], None)
+        return b.spec(direction)
+    return _flow_from_arrows(lines, direction)
+
+
+def _seq_message(line: str) -> Optional[tuple[str, str, str]]:
+    arrow = _SEQ_ARROW.search(line, 1)
+    if arrow is None:
+        return None
+    rest = line[arrow.end() :]
+    # The receiver is at least one character, so a colon right after the arrow is part of it.
+    colon = _SEQ_COLON.search(line, arrow.end() + len(rest) - len(rest.lstrip()) + 1)
+    if colon is None:
+        return None
+    return line[: arrow.start()], line[arrow.end() : colon.start()], line[colon.end() :]
+
+
+def sequence_spec_from_text(text: str) -> Optional[dict]:
+    participants: list[str] = []
+    messages: list[dict] = []
+
+    def _participant(name: str) -> Optional[str]:
+        name = name.strip()
+        if not _ok_label(name):
+            return None
+        if name not in participants:
+            participants.append(name)
+        return name
+
+    for line in _lines(text, re.compile(r"^sequenceDiagram$", re.I)):
+        m = _SEQ_PARTICIPANT.match(line)
+        if m:
+            if _participant(m.group(1)) is None:
+                return None
+            continue
+        message = _seq_message(line)
+        if message is None:
+            return None
+        a, b, label = _participant(message[0]), _participant(message[1]), message[2].strip()
+        if a is None or b is None or not label:
+            return None
+        messages.append({"from": a, "to": b, "label": label})
+    if not messages:
+        return None
+    return {"type": "sequence", "participants": participants, "messages": messages}
+
+
+def state_spec_from_text(text: str) -> Optional[dict]:
+    states: list[str] = []
+    transitions: list[dict] = []
+
+    def _state(name: str) -> Optional[str]:
+        name = name.strip()
+        if name == "[*]":
+            return name
+        if not _ok_label(name):
+            return None
+        if name not in states:
+            states.append(name)
+        return name
+
+    for line in _lines(text, re.compile(r"^stateDiagram(?:-v2)?$", re.I)):
+        m = _STATE_DECL.match(line)
+        if m:
+            if _state(m.group(1)) is None:
+                return None
+            continue
+        # A chain without labels: `待支付 -> 已支付 -> 已完成`.
+        if ":" not in line and "：" not in line:
+            chain = re.split(rf"\s*{_ARROW}\s*", line)
+            if len(chain) >= 2:
+                names = [_state(s) for s in chain]
+                if any(s is None for s in names):
+                    return None
+                transitions.extend({"from": a, "to": b} for a, b in zip(names, names[1:]))
+                continue
+        m = _STATE_TRANSITION.match(line)
+        if not m:
+            return None
+        if re.search(_ARROW, m.group(2)):
+            return None  # a labelled chain: which hop does the label belong to?
+        a, b = _state(m.group(1)), _state(m.group(2))
+        if a is None or b is None:
+            return None
+        label = (m.group(3) or "").strip()
+        transitions.append({"from": a, "to": b, "label": label or None})
+    if not transitions or not states:
+        return None
+    return {"type": "state", "states": states, "transitions": transitions}
+
+
+_EXTRACTORS = {
+    "flow": flow_spec_from_text,
+    "sequence": sequence_spec_from_text,
+    "state": state_spec_from_text,
+}
+
+
+def spec_from_text(diagram_type: str, text: str) -> Optional[dict]:
+    """Spec dict for text that is already structured (arrows, numbered steps, `A->>B: msg`), else None.
+
+    Only answers when every non-empty line parses, so prose never gets a half-right
+    diagram; anything else is left to the model.
+    """
+
+    extract = _EXTRACTORS.get((diagram_type or "").strip().lower())
+    if extract is None or any(len(line) > MAX_LINE_CHARS for line in (text or "").splitlines()):
+        return None
+    return extract(text)
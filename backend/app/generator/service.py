@@ -1,74 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import re
 import xml.etree.ElementTree as ET
 
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple, TypeVar
 
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
+from app.core.aio import run_sync
+from app.core.settings import settings
+from app.core.singleflight import SingleFlight
+from app.generator.chunking import merge_specs, split_text
 from app.generator.diagram import (
+    DiagramBatchItem,
+    DiagramBatchRequest,
+    DiagramBatchResponse,
     DiagramGenerateRequest,
     DiagramGenerateResponse,
     DrawioXmlGenerateRequest,
     DrawioXmlGenerateResponse,
 )
 from app.generator.integration import IntegrationGenerateRequest, IntegrationGenerateResponse
-from app.generator.spec import FlowSpec, SequenceSpec, StateSpec
-from app.llm.factory import get_provider
+from app.generator.jsonrepair import repair_json
+from app.generator.openapi import swagger_context
+from app.generator.rules import FastPathUnavailable, spec_from_text
+from app.generator.spec import SPEC_MODELS, FlowSpec, SequenceSpec, StateSpec, spec_json_schema
+from app.llm.cache import current_cache_policy
+from app.llm.factory import get_provider, get_provider_limiter
 from app.llm.prompts import diagram_prompt, drawio_xml_prompt, integration_prompt
 from app.llm.types import LLMChatRequest
+from app.renderer.drawio import render_drawio
 from app.renderer.mermaid import render_flow, render_sequence, render_state
 
 
-def _extract_first_json_object(text: str) -> Optional[str]:
-    start = text.find("{")
-    if start < 0:
-        return None
-
-    depth = 0
-    in_string = False
-    escape = False
-
-    for i in range(start, len(text)):
-        ch = text[i]
-        if in_string:
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                in_string = False
-            continue
-
-        if ch == '"':
-            in_string = True
-        elif ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return text[start : i + 1]
-
-    return None
-
-
-def _parse_json_maybe(text: str) -> dict:
-    # Best-effort parse: models sometimes wrap JSON in markdown fences or add extra prose.
-    t = (text or "").strip()
-    try:
-        return json.loads(t)
-    except Exception:
-        pass
-
-    candidate = _extract_first_json_object(t)
-    if not candidate:
-        raise ValueError("LLM output does not contain a JSON object")
-
-    return json.loads(candidate)
-
-
 def _coerce_spec_type(spec_obj: dict, req_type: str) -> str:
     t = (spec_obj.get("type") or spec_obj.get("diagram_type") or req_type or "").strip().lower()
     if not t:
@@ -154,19 +121,65 @@ _FALLBACK_MXFILE_XML = (
 )
 
 
-def generate_diagram(req: DiagramGenerateRequest) -> DiagramGenerateResponse:
-    provider = get_provider()
-    messages = diagram_prompt(req.diagram_type, req.text, req.scene)
+# Generation is extraction, not creative writing: all generation requests run at
+# temperature 0, which also makes their completions cacheable (see LLMCache.should_use).
+_GENERATION_TEMPERATURE = 0.0
+
 
-    # Run provider in sync FastAPI handler (simple MVP). If later need perf, switch to async routes.
-    import anyio
+def _diagram_request(
+    req: DiagramGenerateRequest, text: Optional[str] = None, part: Optional[tuple[int, int]] = None
+) -> LLMChatRequest:
+    return LLMChatRequest(
+        messages=diagram_prompt(req.diagram_type, req.text if text is None else text, req.scene, part),
+        temperature=_GENERATION_TEMPERATURE,
+        response_schema=spec_json_schema(req.diagram_type),
+    )
 
-    async def _run():
-        return await provider.chat(LLMChatRequest(messages=messages))
 
-    resp = anyio.run(_run)
-    spec_obj = _parse_json_maybe(resp.content)
+async def _integration_request(req: IntegrationGenerateRequest) -> LLMChatRequest:
+    swagger_text, swagger_index = req.swagger_text, None
+    if swagger_text and len(swagger_text) >= settings.SWAGGER_INDEX_MIN_CHARS:
+        # Parsing a large (YAML) spec takes a while on a cache miss: keep it off the loop.
+        swagger_index = await asyncio.to_thread(swagger_context, swagger_text, req.text)
+        if swagger_index is not None:
+            swagger_text = None
+    return LLMChatRequest(
+        messages=integration_prompt(req.text, swagger_text, swagger_index),
+        temperature=_GENERATION_TEMPERATURE,
+        max_tokens=2048,
+    )
 
+
+def _drawio_request(req: DrawioXmlGenerateRequest) -> LLMChatRequest:
+    text = (req.text or "").strip()
+    if not text:
+        raise ValueError("text 不能为空")
+    # XML may be longer than JSON specs.
+    return LLMChatRequest(messages=drawio_xml_prompt(text), temperature=_GENERATION_TEMPERATURE, max_tokens=4096)
+
+
+_SPEC_LISTS = {"flow": ("nodes", "edges"), "sequence": ("participants", "messages"), "state": ("states", "transitions")}
+
+
+def _diagram_from_content(req: DiagramGenerateRequest, content: str) -> DiagramGenerateResponse:
+    # Tolerant: fences/prose are skipped and output cut off by max_tokens is closed up,
+    # so a near-miss still yields a spec instead of a 502 and a second generation.
+    parsed = repair_json(content)
+    if parsed.repairs and isinstance(parsed.value, dict):
+        # A cut-off spec may end before its later lists (e.g. all nodes, no "edges" yet).
+        # Only then are the missing lists defaulted: output cut before the first list has
+        # nothing to keep and must not validate as an empty diagram.
+        t = str(parsed.value.get("type") or req.diagram_type).strip().lower()
+        keys = _SPEC_LISTS.get(t, ())
+        if any(parsed.value.get(key) for key in keys):
+            for key in keys:
+                parsed.value.setdefault(key, [])
+    resp = _diagram_from_spec_obj(req, parsed.value)
+    resp.repairs = parsed.repairs
+    return resp
+
+
+def _diagram_from_spec_obj(req: DiagramGenerateRequest, spec_obj: Any) -> DiagramGenerateResponse:
     if not isinstance(spec_obj, dict):
         raise ValueError("LLM output JSON must be an object")
 
@@ -193,35 +206,75 @@ def generate_diagram(req: DiagramGenerateRequest) -> DiagramGenerateResponse:
     return DiagramGenerateResponse(spec=spec_obj, mermaid=mermaid)
 
 
-def generate_integration_plan(req: IntegrationGenerateRequest) -> IntegrationGenerateResponse:
-    provider = get_provider()
-    messages = integration_prompt(req.text, req.swagger_text)
+def _chunk_spec(req: DiagramGenerateRequest, content: str) -> tuple[Any, list[str]]:
+    """Validated partial spec of one chunk, plus the JSON repairs it needed.
 
-    import anyio
+    Unlike whole-document output there is no text fallback: a bad chunk is skipped.
+    """
 
-    async def _run():
-        return await provider.chat(LLMChatRequest(messages=messages, max_tokens=2048))
+    parsed = repair_json(content)
+    if not isinstance(parsed.value, dict):
+        raise ValueError("LLM output JSON must be an object")
+    t = (req.diagram_type or "").strip().lower()
+    model = SPEC_MODELS.get(t)
+    if model is None:
+        raise ValueError(f"Unsupported spec.type: {t}")
+    # Every chunk is merged as the requested type; a section may legitimately have no edges.
+    spec_obj = {**parsed.value, "type": t}
+    for key in _SPEC_LISTS[t]:
+        spec_obj.setdefault(key, [])
+    return model.model_validate(spec_obj), parsed.repairs
 
-    resp = anyio.run(_run)
-    return IntegrationGenerateResponse(markdown=resp.content)
 
+def _map_chunks(req: DiagramGenerateRequest, chunks: list[str]) -> list[asyncio.Task]:
+    """One provider call per chunk, all started at once.
 
-def generate_drawio_xml(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateResponse:
-    text = (req.text or "").strip()
-    if not text:
-        raise ValueError("text 不能为空")
+    Calls take slots of the shared per-provider limiter, so chunked requests together
+    never exceed LLM_MAX_CONCURRENCY. Wall-clock time follows the slowest chunk rather
+    than the document length; chunk calls run at temperature 0 and are cached, so a
+    re-run after an edit that keeps the section split only re-extracts changed sections.
+    """
 
     provider = get_provider()
-    messages = drawio_xml_prompt(text)
-
-    import anyio
-
-    async def _run():
-        # XML may be longer than JSON specs.
-        return await provider.chat(LLMChatRequest(messages=messages, max_tokens=4096))
-
-    resp = anyio.run(_run)
-    raw = (resp.content or "").strip()
+    limiter = get_provider_limiter()
+
+    async def _one(i: int, chunk: str) -> tuple[Any, list[str]]:
+        async with limiter:
+            resp = await provider.chat(_diagram_request(req, chunk, (i + 1, len(chunks))))
+        return _chunk_spec(req, resp.content)
+
+    return [asyncio.ensure_future(_one(i, c)) for i, c in enumerate(chunks)]
+
+
+def _reduce_chunks(req: DiagramGenerateRequest, outcomes: list[Any]) -> DiagramGenerateResponse:
+    specs = []
+    repairs: list[str] = []
+    failed: Optional[BaseException] = None
+    n = len(outcomes)
+    for i, o in enumerate(outcomes):
+        if isinstance(o, ValueError):  # bad JSON / spec (pydantic's ValidationError included)
+            repairs.append(f"chunk {i + 1}/{n}: skipped ({_batch_error(o)})")
+            failed = failed or o
+        elif isinstance(o, BaseException):
+            raise o  # provider errors fail the request like an unchunked call would
+        else:
+            spec, fixes = o
+            specs.append(spec)
+            repairs.extend(f"chunk {i + 1}/{n}: {f}" for f in fixes)
+    if not specs:
+        raise failed or ValueError("no chunk produced a usable spec")
+    resp = _diagram_from_spec_obj(req, merge_specs(specs))
+    resp.repairs = repairs
+    resp.chunks = n
+    return resp
+
+
+def _split_diagram_text(req: DiagramGenerateRequest) -> list[str]:
+    return split_text(req.text, settings.DIAGRAM_CHUNK_CHARS, settings.DIAGRAM_MAX_CHUNKS)
+
+
+def _drawio_from_content(content: str) -> DrawioXmlGenerateResponse:
+    raw = (content or "").strip()
     xml = _extract_first_mxfile_xml(raw)
     if not xml:
         # Some providers may ignore instructions; keep UX functional.
@@ -229,3 +282,241 @@ def generate_drawio_xml(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateRespo
 
     _validate_mxfile_xml(xml)
     return DrawioXmlGenerateResponse(xml=xml)
+
+
+R = TypeVar("R", bound=BaseModel)
+
+# Identical concurrent requests (double clicks, a shared doc opened by several people,
+# duplicate task submissions) are coalesced into one provider call.
+_single_flight = SingleFlight()
+
+
+def _flight_key(kind: str, req: BaseModel) -> str:
+    provider = get_provider()
+    raw = json.dumps(
+        {
+            "kind": kind,
+            "provider": getattr(provider, "name", provider.__class__.__name__),
+            "model": getattr(provider, "model", ""),
+            "request": req.model_dump(mode="json"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _coalesce(kind: str, req: BaseModel, fn: Callable[[], Awaitable[R]], model: type[R]) -> R:
+    if current_cache_policy() == "bypass":
+        # The caller asked for a fresh completion; a coalesced or replayed one is not that.
+        return await fn()
+    return await _single_flight.do(
+        _flight_key(kind, req),
+        fn,
+        encode=lambda r: r.model_dump(mode="json"),
+        decode=model.model_validate,
+    )
+
+
+def single_flight_stats() -> dict:
+    return _single_flight.stats()
+
+
+def _fast_path_response(req: DiagramGenerateRequest) -> Optional[DiagramGenerateResponse]:
+    """Deterministic answer for structured text, or None when the model is needed."""
+
+    if req.fast_path is False or (req.fast_path is None and not settings.DIAGRAM_FAST_PATH):
+        return None
+    spec_obj = spec_from_text(req.diagram_type, req.text)
+    if spec_obj is None:
+        if req.fast_path:
+            raise FastPathUnavailable("text is not structured enough for the rule-based fast path")
+        return None
+    # Same validation and rendering as model output.
+    return _diagram_from_spec_obj(req, spec_obj)
+
+
+async def _generate_diagram(req: DiagramGenerateRequest) -> DiagramGenerateResponse:
+    chunks = _split_diagram_text(req)
+    if len(chunks) > 1:
+        outcomes = await asyncio.gather(*_map_chunks(req, chunks), return_exceptions=True)
+        return _reduce_chunks(req, outcomes)
+    provider = get_provider()
+    resp = await provider.chat(_diagram_request(req))
+    return _diagram_from_content(req, resp.content)
+
+
+async def _generate_integration_plan(req: IntegrationGenerateRequest) -> IntegrationGenerateResponse:
+    provider = get_provider()
+    resp = await provider.chat(await _integration_request(req))
+    return IntegrationGenerateResponse(markdown=resp.content)
+
+
+def _drawio_from_spec(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateResponse:
+    # Built with ElementTree, so well-formed by construction; no size cap (it exists for model output).
+    return DrawioXmlGenerateResponse(xml=render_drawio(req.spec))
+
+
+async def _generate_drawio_xml(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateResponse:
+    chat_req = _drawio_request(req)
+    provider = get_provider()
+    resp = await provider.chat(chat_req)
+    return _drawio_from_content(resp.content)
+
+
+async def generate_diagram(req: DiagramGenerateRequest) -> DiagramGenerateResponse:
+    fast = _fast_path_response(req)
+    if fast is not None:
+        return fast
+    return await _coalesce("diagram", req, lambda: _generate_diagram(req), DiagramGenerateResponse)
+
+
+async def generate_integration_plan(req: IntegrationGenerateRequest) -> IntegrationGenerateResponse:
+    return await _coalesce("integration", req, lambda: _generate_integration_plan(req), IntegrationGenerateResponse)
+
+
+async def generate_drawio_xml(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateResponse:
+    if req.use_layout:
+        # Deterministic and provider-free: nothing to coalesce; keep large layouts off the loop.
+        return await asyncio.to_thread(_drawio_from_spec, req)
+    return await _coalesce("drawio", req, lambda: _generate_drawio_xml(req), DrawioXmlGenerateResponse)
+
+
+async def generate_diagram_batch(req: DiagramBatchRequest) -> DiagramBatchResponse:
+    """Generate many diagrams concurrently; results keep input order, errors stay per item.
+
+    Parallelism is bounded twice: by the batch's own `concurrency` and by the shared
+    per-provider limiter, so several batches together never exceed LLM_MAX_CONCURRENCY.
+    """
+
+    if len(req.items) > settings.DIAGRAM_BATCH_MAX_ITEMS:
+        raise ValueError(f"batch too large: {len(req.items)} > {settings.DIAGRAM_BATCH_MAX_ITEMS}")
+
+    provider_limiter = get_provider_limiter()
+    batch_limiter = asyncio.Semaphore(min(req.concurrency or settings.LLM_MAX_CONCURRENCY, settings.LLM_MAX_CONCURRENCY))
+
+    async def _one(item: DiagramGenerateRequest) -> DiagramGenerateResponse:
+        fast = _fast_path_response(item)
+        if fast is not None:
+            return fast  # no provider call, so no limiter slot
+        if len(_split_diagram_text(item)) > 1:
+            # Chunk calls take provider slots themselves; holding one here could deadlock.
+            async with batch_limiter:
+                return await generate_diagram(item)
+        async with batch_limiter, provider_limiter:
+            return await generate_diagram(item)
+
+    outcomes = await asyncio.gather(*(_one(item) for item in req.items), return_exceptions=True)
+
+    results: list[Optional[DiagramGenerateResponse]] = [
+        o if isinstance(o, DiagramGenerateResponse) else None for o in outcomes
+    ]
+    artifact_ids: list[Optional[str]] = [None] * len(results)
+    if req.persist and any(r is not None for r in results):
+        from app.generator.artifacts import save_diagram_artifacts
+
+        artifact_ids = await asyncio.to_thread(save_diagram_artifacts, list(zip(req.items, results)))
+
+    return diagram_batch_response(outcomes, artifact_ids)
+
+
+def diagram_batch_response(outcomes: list[Any], artifact_ids: list[Optional[str]]) -> DiagramBatchResponse:
+    items: list[DiagramBatchItem] = []
+    for i, o in enumerate(outcomes):
+        if isinstance(o, DiagramGenerateResponse):
+            items.append(DiagramBatchItem(index=i, ok=True, result=o, artifact_id=artifact_ids[i]))
+        else:
+            items.append(DiagramBatchItem(index=i, ok=False, error=_batch_error(o)))
+    succeeded = sum(1 for it in items if it.ok)
+    return DiagramBatchResponse(items=items, succeeded=succeeded, failed=len(items) - succeeded)
+
+
+def _batch_error(e: Any) -> str:
+    if isinstance(e, ValidationError):
+        return f"spec validation failed: {e}"
+    if isinstance(e, json.JSONDecodeError):
+        return f"LLM output is not valid JSON: {e}"
+    if isinstance(e, BaseException):
+        return str(e) or e.__class__.__name__
+    return str(e)
+
+
+# Sync wrappers for Celery tasks (and other non-async callers). They run on the shared
+# background loop so pooled LLM connections are reused; API routes must await the
+# async functions above instead of blocking a threadpool thread.
+def generate_diagram_sync(req: DiagramGenerateRequest) -> DiagramGenerateResponse:
+    return run_sync(generate_diagram(req))
+
+
+def generate_integration_plan_sync(req: IntegrationGenerateRequest) -> IntegrationGenerateResponse:
+    return run_sync(generate_integration_plan(req))
+
+
+def generate_diagram_batch_sync(req: DiagramBatchRequest) -> DiagramBatchResponse:
+    return run_sync(generate_diagram_batch(req))
+
+
+def generate_drawio_xml_sync(req: DrawioXmlGenerateRequest) -> DrawioXmlGenerateResponse:
+    return run_sync(generate_drawio_xml(req))
+
+
+# Streaming variants: yield ("delta", text) for every model chunk, then ("result", response).
+# Chunked long documents yield ("progress", {"done", "total"}) per finished section instead
+# of deltas. The final result goes through exactly the same parsing/validation as the
+# blocking path.
+StreamEvent = Tuple[str, Any]
+
+
+async def _stream_content(chat_req: LLMChatRequest) -> AsyncIterator[str]:
+    provider = get_provider()
+    async for chunk in provider.chat_stream(chat_req):
+        yield chunk
+
+
+async def stream_diagram(req: DiagramGenerateRequest) -> AsyncIterator[StreamEvent]:
+    fast = _fast_path_response(req)
+    if fast is not None:
+        yield "result", fast
+        return
+    sections = _split_diagram_text(req)
+    if len(sections) > 1:
+        # Parallel section calls cannot be interleaved into one text stream; report progress.
+        tasks = _map_chunks(req, sections)
+        try:
+            for done, fut in enumerate(asyncio.as_completed(tasks), 1):
+                try:
+                    await fut
+                except Exception:
+                    pass  # collected below
+                yield "progress", {"done": done, "total": len(tasks)}
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for t in tasks:
+                t.cancel()
+        yield "result", _reduce_chunks(req, outcomes)
+        return
+    parts: list[str] = []
+    async for chunk in _stream_content(_diagram_request(req)):
+        parts.append(chunk)
+        yield "delta", chunk
+    yield "result", _diagram_from_content(req, "".join(parts))
+
+
+async def stream_integration_plan(req: IntegrationGenerateRequest) -> AsyncIterator[StreamEvent]:
+    parts: list[str] = []
+    async for chunk in _stream_content(await _integration_request(req)):
+        parts.append(chunk)
+        yield "delta", chunk
+    yield "result", IntegrationGenerateResponse(markdown="".join(parts))
+
+
+async def stream_drawio_xml(req: DrawioXmlGenerateRequest) -> AsyncIterator[StreamEvent]:
+    if req.use_layout:
+        yield "result", await asyncio.to_thread(_drawio_from_spec, req)
+        return
+    chat_req = _drawio_request(req)
+    parts: list[str] = []
+    async for chunk in _stream_content(chat_req):
+        parts.append(chunk)
+        yield "delta", chunk
+    yield "result", _drawio_from_content("".join(parts))
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-from typing import Literal
+from functools import lru_cache
+from typing import Annotated, Any, Literal, Union
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
+from app.llm.structured import strict_json_schema
+
 
 class FlowNode(BaseModel):
     id: str
@@ -49,3 +52,20 @@ class StateSpec(BaseModel):
     states: list[str]
     transitions: list[StateTransition]
     note: Optional[str] = None
+
+
+# Any spec, selected by its `type` field.
+DiagramSpec = Annotated[Union[FlowSpec, SequenceSpec, StateSpec], Field(discriminator="type")]
+
+SPEC_MODELS: dict[str, type[BaseModel]] = {"flow": FlowSpec, "sequence": SequenceSpec, "state": StateSpec}
+
+
+@lru_cache(maxsize=None)
+def spec_json_schema(diagram_type: str) -> Optional[dict[str, Any]]:
+    """Strict JSON schema of the spec for `diagram_type` (wire names, e.g. "from"); None if unknown.
+
+    Shared across requests: callers must not mutate it.
+    """
+
+    model = SPEC_MODELS.get((diagram_type or "").strip().lower())
+    return strict_json_schema(model.model_json_schema(by_alias=True)) if model else None
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from app.generator.jsonpatch import JsonPatcher, PatchOp, parse_pointer
+from app.generator.spec import DiagramSpec, FlowEdge, FlowNode, FlowSpec
+from app.renderer.mermaid import flow_edge_line, flow_header_line, flow_node_line, iter_render
+
+_spec_adapter: TypeAdapter = TypeAdapter(DiagramSpec)
+
+# Flow spec fields that reach the Mermaid output.
+_FLOW_RENDERED = {"type", "direction", "nodes", "edges"}
+
+
+class SpecPatchResult(BaseModel):
+    spec: dict[str, Any]
+    mermaid: str
+    # Lines re-rendered; None when the whole diagram had to be re-rendered.
+    rerendered_lines: Optional[int] = None
+
+
+class _FlowLines:
+    """Mermaid lines of a stored flow spec, kept in step with patch operations.
+
+    Edits that cannot change node-id allocation (node labels, edge labels,
+    edges between existing nodes, direction) only mark or insert lines; any other
+    edit makes `apply` return False and the caller renders the whole spec again.
+    Ids are taken from the stored node lines, so nothing is re-allocated.
+    """
+
+    def __init__(self, nodes: list[Any], lines: list[str]) -> None:
+        n = len(nodes)
+        self.header: Optional[str] = lines[0]
+        self.node_lines: list[str] = lines[1 : 1 + n]
+        self.dirty_nodes: set[int] = set()
+        self.edge_lines: list[Optional[str]] = list(lines[1 + n :])
+        self._node_ids: Optional[set[Any]] = None
+
+    @classmethod
+    def from_stored(cls, spec: Any, mermaid: Optional[str]) -> Optional["_FlowLines"]:
+        if not isinstance(spec, dict) or spec.get("type") != "flow" or not mermaid:
+            return None
+        nodes, edges = spec.get("nodes"), spec.get("edges")
+        if not isinstance(nodes, list) or not isinstance(edges, list):
+            return None
+        lines = mermaid.split("\n")
+        # Only trust text that lines up with the spec it was rendered from.
+        if len(lines) != 1 + len(nodes) + len(edges) or not lines[0].startswith("flowchart"):
+            return None
+        return cls(nodes, lines)
+
+    def _is_node(self, doc: dict[str, Any], raw: Any) -> bool:
+        if self._node_ids is None:
+            self._node_ids = {n.get("id") for n in doc["nodes"] if isinstance(n, dict)}
+        return raw in self._node_ids
+
+    def _edge_between_nodes(self, doc: dict[str, Any], edge: Any) -> bool:
+        # Edges whose endpoints are all node ids add no ids of their own.
+        return isinstance(edge, dict) and self._is_node(doc, edge.get("from")) and self._is_node(doc, edge.get("to"))
+
+    def apply(self, patcher: JsonPatcher, op: PatchOp) -> bool:
+        """Apply `op` through `patcher`; False if the lines can no longer be tracked."""
+
+        path = parse_pointer(op.path)
+        if op.op == "test":
+            patcher.apply(op)
+            return True
+        if op.op in {"move", "copy"}:
+            patcher.apply(op)
+            heads = {_head(path), _head(parse_pointer(op.from_ or ""))}
+            return not heads & (_FLOW_RENDERED | {None})
+
+        head = _head(path)
+        if head not in _FLOW_RENDERED:
+            patcher.apply(op)  # root (None) changes everything; other fields are not rendered
+            return head is not None
+        if head == "direction":
+            patcher.apply(op)
+            self.header = None
+            return len(path) == 1
+        if head == "nodes" and len(path) == 3 and path[2] == "label" and op.op in {"add", "replace"}:
+            patcher.apply(op)
+            self.dirty_nodes.add(int(path[1]))
+            return True
+        if head != "edges" or len(path) not in (2, 3) or (len(path) == 3 and path[2] not in {"label", "from", "to"}):
+            patcher.apply(op)
+            return False
+
+        if len(path) == 2 and op.op == "add":
+            patcher.apply(op)
+            i = len(self.edge_lines) if path[1] == "-" else int(path[1])
+            self.edge_lines.insert(i, None)
+            return self._edge_between_nodes(patcher.doc, patcher.doc["edges"][i])
+
+        old = patcher.get("/edges/" + path[1])
+        patcher.apply(op)
+        i = int(path[1])
+        if len(path) == 2 and op.op == "remove":
+            del self.edge_lines[i]
+            return self._edge_between_nodes(patcher.doc, old)
+        self.edge_lines[i] = None
+        new = patcher.doc["edges"][i]
+        # Re-rendered lines take their ids from node lines, so both ends must be nodes.
+        return self._edge_between_nodes(patcher.doc, old) and self._edge_between_nodes(patcher.doc, new)
+
+    def render(self, doc: dict[str, Any]) -> tuple[str, int]:
+        """Validate and re-render only what the patch touched; returns (mermaid, lines re-rendered).
+
+        The stored spec was valid, so untouched nodes/edges are not validated again:
+        the top-level fields plus each edited node/edge are.
+        """
+
+        head = FlowSpec.model_validate({**doc, "nodes": [], "edges": []})
+        count = 0
+        if self.header is None:
+            self.header = flow_header_line(head.direction)
+            count += 1
+
+        nodes = doc["nodes"]
+        # Mermaid id of each spec node id, read back from the stored node lines.
+        mids: dict[str, str] = {}
+        for n, line in zip(nodes, self.node_lines):
+            if n["id"] not in mids:
+                mids[n["id"]] = line[2 : line.index('["')]
+        for i in self.dirty_nodes:
+            node = FlowNode.model_validate(nodes[i])
+            self.node_lines[i] = flow_node_line(mids[node.id], node.label)
+            count += 1
+        edges = doc["edges"]
+        for i, line in enumerate(self.edge_lines):
+            if line is None:
+                edge = FlowEdge.model_validate(edges[i])
+                self.edge_lines[i] = flow_edge_line(mids[edge.from_], mids[edge.to], edge.label)
+                count += 1
+        return "\n".join([self.header, *self.node_lines, *self.edge_lines]), count
+
+
+def _head(path: list[str]) -> Optional[str]:
+    return path[0] if path else None
+
+
+def validate_spec(spec: Any) -> Any:
+    """FlowSpec / SequenceSpec / StateSpec by `type`; raises pydantic.ValidationError."""
+
+    return _spec_adapter.validate_python(spec)
+
+
+def patch_spec(spec: dict[str, Any], mermaid: Optional[str], ops: list[PatchOp]) -> SpecPatchResult:
+    """Apply a JSON patch to a stored spec and bring its Mermaid text up to date.
+
+    For flow specs whose stored text matches the spec, only the edited nodes/edges
+    are validated and re-rendered; otherwise the whole spec is. Raises JsonPatchError
+    (JsonPatchConflict for a failed `test`) or pydantic.ValidationError.
+    """
+
+    patcher = JsonPatcher(spec)
+    lines = _FlowLines.from_stored(spec, mermaid)
+    for op in ops:
+        if lines is None:
+            patcher.apply(op)
+        elif not lines.apply(patcher, op):
+            lines = None
+
+    patched = patcher.doc
+    if lines is not None and isinstance(patched, dict) and patched.get("type") == "flow":
+        text, count = lines.render(patched)
+        return SpecPatchResult(spec=patched, mermaid=text, rerendered_lines=count)
+    return SpecPatchResult(spec=patched, mermaid="\n".join(iter_render(validate_spec(patched))))
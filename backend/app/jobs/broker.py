@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.core.settings import settings
+
+
+CLOSED = "closed"  # broker healthy: submit via Celery
+OPEN = "open"  # broker failing: go straight to the in-process executor
+HALF_OPEN = "half_open"  # cool-down elapsed: let one submission through as a trial
+
+
+def probe_broker(url: str, timeout: float) -> bool:
+    if not url:
+        return False
+
+    try:
+        from kombu import Connection
+        from kombu.exceptions import OperationalError
+
+        with Connection(url, connect_timeout=timeout) as conn:
+            conn.ensure_connection(max_retries=1)
+        return True
+    except ImportError:
+        # kombu isn't installed (often because celery extras aren't installed).
+        return False
+    except OperationalError:
+        return False
+    except Exception:
+        return False
+
+
+class BrokerHealthMonitor:
+    """Background broker probing + circuit breaker for task submission.
+
+    The request path only reads cached state (`allow_request`), it never opens a
+    broker connection. A daemon thread probes every BROKER_PROBE_INTERVAL_SECONDS;
+    probe results and submission outcomes both feed the breaker.
+    """
+
+    def __init__(
+        self,
+        url_getter: Callable[[], str],
+        probe_interval: float,
+        status_ttl: float,
+        failure_threshold: int,
+        open_seconds: float,
+        probe_timeout: float = 0.5,
+    ) -> None:
+        self._url_getter = url_getter
+        self.probe_interval = float(probe_interval)
+        self.status_ttl = float(status_ttl)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_seconds = float(open_seconds)
+        self.probe_timeout = float(probe_timeout)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.state = CLOSED
+        self.healthy: Optional[bool] = None  # None until the first probe finishes
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ms: Optional[int] = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._trial_in_flight = False
+        self.counters = {"probes": 0, "probe_failures": 0, "allowed": 0, "short_circuited": 0, "send_failures": 0}
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pdc-broker-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.probe_timeout + 1)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.probe_now()
+            self._wake.wait(self.probe_interval)
+            self._wake.clear()
+
+    def probe_now(self) -> bool:
+        started = time.perf_counter()
+        ok = probe_broker(self._url_getter(), self.probe_timeout)
+        with self._lock:
+            self.counters["probes"] += 1
+            self.healthy = ok
+            self.last_probe_at = time.time()
+            self.last_probe_ms = int((time.perf_counter() - started) * 1000)
+            if ok:
+                self._on_success_locked()
+            else:
+                self.counters["probe_failures"] += 1
+                self._on_failure_locked()
+        return ok
+
+    def allow_request(self) -> bool:
+        """Decide Celery vs in-process from cached state only (no network I/O)."""
+
+        self.ensure_started()
+        now = time.time()
+        with self._lock:
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return self._deny_locked()
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    return self._deny_locked()
+                self._trial_in_flight = True
+                self.counters["allowed"] += 1
+                return True
+
+            stale = self.last_probe_at is None or now - self.last_probe_at > self.status_ttl
+            if stale:
+                # Prober is behind (or hasn't run yet): nudge it, don't probe inline.
+                self._wake.set()
+            if not self.healthy or stale:
+                return self._deny_locked()
+            self.counters["allowed"] += 1
+            return True
+
+    def _deny_locked(self) -> bool:
+        self.counters["short_circuited"] += 1
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._on_success_locked()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters["send_failures"] += 1
+            self.healthy = False
+            self._on_failure_locked()
+        self._wake.set()
+
+    def _on_success_locked(self) -> None:
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self._trial_in_flight = False
+
+    def _on_failure_locked(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.open_until = time.time() + self.open_seconds
+            self._trial_in_flight = False
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                "state": self.state,
+                "healthy": self.healthy,
+                "last_probe_at": self.last_probe_at,
+                "last_probe_age_s": round(now - self.last_probe_at, 3) if self.last_probe_at else None,
+                "last_probe_ms": self.last_probe_ms,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for_s": round(max(0.0, self.open_until - now), 3) if self.state == OPEN else 0.0,
+                "probe_running": bool(self._thread and self._thread.is_alive()),
+                **self.counters,
+            }
+
+
+broker_monitor = BrokerHealthMonitor(
+    url_getter=lambda: settings.REDIS_URL,
+    probe_interval=settings.BROKER_PROBE_INTERVAL_SECONDS,
+    status_ttl=settings.BROKER_STATUS_TTL_SECONDS,
+    failure_threshold=settings.BROKER_FAILURE_THRESHOLD,
+    open_seconds=settings.BROKER_OPEN_SECONDS,
+)
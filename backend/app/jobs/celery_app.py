@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
 
 from app.core.settings import settings
 
@@ -18,3 +19,15 @@ celery_app.conf.update(
     timezone="Asia/Shanghai",
     enable_utc=False,
 )
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _close_llm_clients(**_kwargs) -> None:
+    # Each worker process owns a background loop with pooled LLM connections
+    # (prefork children get worker_process_shutdown, solo/threads pools worker_shutdown).
+    from app.core.aio import stop_background_loop
+    from app.llm.http import close_http_clients
+
+    close_http_clients()
+    stop_background_loop()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.settings import settings
+
+
+# Celery-compatible state names so /api/tasks/{id} looks the same in both modes.
+PENDING = "PENDING"
+STARTED = "STARTED"
+SUCCESS = "SUCCESS"
+FAILURE = "FAILURE"
+REVOKED = "REVOKED"
+
+_FINISHED_STATES = {SUCCESS, FAILURE, REVOKED}
+
+
+class InprocQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class InprocTask:
+    id: str
+    kind: str
+    fn: Optional[Callable[[], Awaitable[dict]]]
+    # Context of the submitting request (e.g. its X-PDC-Cache policy); the job runs in it.
+    ctx: contextvars.Context = field(default_factory=contextvars.copy_context)
+    state: str = PENDING
+    result: Optional[dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    runner: Optional[asyncio.Task] = None
+
+
+class InprocExecutor:
+    """Bounded in-process task executor (TASK_MODE=inproc or when the broker is down).
+
+    A fixed number of worker coroutines drain a bounded queue on the API event loop.
+    Finished results are kept for a limited time and count, so memory stays flat.
+    """
+
+    def __init__(self, workers: int, max_queue: int, result_ttl_seconds: float, max_results: int) -> None:
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.result_ttl_seconds = float(result_ttl_seconds)
+        self.max_results = max(1, int(max_results))
+
+        self._lock = threading.Lock()
+        self._tasks: dict[str, InprocTask] = {}
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._queue: Optional[asyncio.Queue[str]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: list[asyncio.Task] = []
+        self._stopping = False
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "revoked": 0, "evicted": 0}
+
+    def _ensure_started(self) -> asyncio.Queue[str]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # (Re)start on the current loop, e.g. after shutdown or in a fresh TestClient.
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            # Workers start from an empty context, not the one of the request that happened
+            # to start them; each job runs in its own submitter's context (InprocTask.ctx).
+            self._workers = [
+                contextvars.Context().run(loop.create_task, self._worker(), name=f"pdc-inproc-{i}")
+                for i in range(self.workers)
+            ]
+        return self._queue
+
+    def submit(self, kind: str, fn: Callable[[], Awaitable[dict]]) -> str:
+        """Enqueue `fn` and return its task id immediately. Must be called on the event loop."""
+
+        queue = self._ensure_started()
+        task = InprocTask(id=f"inproc-{uuid.uuid4()}", kind=kind, fn=fn)
+        with self._lock:
+            self._evict_locked()
+            try:
+                queue.put_nowait(task.id)
+            except asyncio.QueueFull:
+                self.counters["rejected"] += 1
+                raise InprocQueueFull(f"in-process task queue is full ({self.max_queue} pending)")
+            self._tasks[task.id] = task
+            self.counters["submitted"] += 1
+        return task.id
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            task_id = await queue.get()
+            try:
+                with self._lock:
+                    task = self._tasks.get(task_id)
+                    if task is None or task.state != PENDING or task.fn is None:
+                        continue  # cancelled while queued
+                    task.state = STARTED
+                    task.started_at = time.time()
+                    fn, task.fn = task.fn, None
+                    runner = task.runner = task.ctx.run(lambda: asyncio.ensure_future(fn()))
+
+                try:
+                    result = await runner
+                    self._finish(task, SUCCESS, result if isinstance(result, dict) else {"result": result})
+                except asyncio.CancelledError:
+                    self._finish(task, REVOKED, {"error": "cancelled"})
+                    if self._stopping:
+                        raise
+                except Exception as e:
+                    self._finish(task, FAILURE, {"error": str(e) or e.__class__.__name__})
+            finally:
+                queue.task_done()
+
+    def _finish(self, task: InprocTask, state: str, result: Optional[dict[str, Any]]) -> None:
+        with self._lock:
+            if task.state in _FINISHED_STATES:
+                return
+            task.state = state
+            task.result = result
+            task.finished_at = time.time()
+            task.runner = None
+            self._finished[task.id] = task.finished_at
+            self.counters[{SUCCESS: "succeeded", FAILURE: "failed", REVOKED: "revoked"}[state]] += 1
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        now = time.time()
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            expired = self.result_ttl_seconds > 0 and now - finished_at > self.result_ttl_seconds
+            if not expired and len(self._finished) <= self.max_results:
+                break
+            self._finished.popitem(last=False)
+            self._tasks.pop(task_id, None)
+            self.counters["evicted"] += 1
+
+    def get(self, task_id: str) -> Optional[InprocTask]:
+        with self._lock:
+            self._evict_locked()
+            return self._tasks.get(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        """Revoke a queued task or cancel a running one. Returns False if unknown or finished."""
+
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.state in _FINISHED_STATES:
+                return False
+            runner = task.runner
+            if task.state == PENDING:
+                task.fn = None
+        if runner is not None:
+            runner.cancel()
+        self._finish(task, REVOKED, {"error": "cancelled"})
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._evict_locked()
+            states: dict[str, int] = {}
+            for t in self._tasks.values():
+                states[t.state] = states.get(t.state, 0) + 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "tracked": len(self._tasks),
+                "states": states,
+                **self.counters,
+            }
+
+    async def shutdown(self) -> None:
+        self._stopping = True
+        workers, self._workers = self._workers, []
+        with self._lock:
+            runners = [t.runner for t in self._tasks.values() if t.runner is not None]
+        for r in runners + workers:
+            r.cancel()
+        await asyncio.gather(*runners, *workers, return_exceptions=True)
+        self._queue = None
+        self._loop = None
+        self._stopping = False
+
+
+inproc_executor = InprocExecutor(
+    workers=settings.INPROC_WORKERS,
+    max_queue=settings.INPROC_MAX_QUEUE,
+    result_ttl_seconds=settings.INPROC_RESULT_TTL_SECONDS,
+    max_results=settings.INPROC_MAX_RESULTS,
+)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.core.settings import settings
+from app.llm.factory import provider_id
+
+# Prune expired leases, then take a slot if fewer than ARGV[2] are held. Scores are
+# Redis server time in ms, so worker clock skew does not matter.
+_ACQUIRE_LUA = """
+local t = redis.call('time')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('zremrangebyscore', KEYS[1], '-inf', now - tonumber(ARGV[1]))
+if redis.call('zcard', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('zadd', KEYS[1], now, ARGV[3])
+    redis.call('pexpire', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class ProviderBusy(Exception):
+    """All cluster-wide slots for the current LLM provider are taken."""
+
+
+class ProviderSlots:
+    """Redis-backed counting semaphore bounding LLM calls across Celery workers.
+
+    Each holder is a member of a sorted set scored by acquisition time; a lease older
+    than LLM_SLOT_LEASE_SECONDS is dropped, so a killed worker cannot leak its slot.
+    Without a reachable Redis the limit is not enforced (each process still applies
+    its own LLM_MAX_CONCURRENCY limiter).
+    """
+
+    prefix = "pdc:llm:slots:"
+
+    def __init__(self) -> None:
+        self._redis = None
+        self._redis_checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _redis_client(self):
+        with self._lock:
+            if self._redis is not None:
+                return self._redis
+            # Don't hammer an unreachable Redis: re-probe at most every 30 s.
+            now = time.monotonic()
+            if self._redis_checked_at is not None and now - self._redis_checked_at < 30:
+                return None
+            self._redis_checked_at = now
+            try:
+                import redis  # local import: optional dependency
+
+                client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.3, socket_timeout=1.0)
+                client.ping()
+                self._redis = client
+            except Exception:
+                self._redis = None
+            return self._redis
+
+    def limit(self) -> int:
+        return max(1, settings.LLM_CLUSTER_MAX_CONCURRENCY or settings.LLM_MAX_CONCURRENCY)
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """Hold one slot for the current provider; raise ProviderBusy if none is free."""
+
+        client = self._redis_client()
+        if client is None:
+            yield
+            return
+        key = self.prefix + provider_id()
+        token = uuid.uuid4().hex
+        lease_ms = int(settings.LLM_SLOT_LEASE_SECONDS * 1000)
+        try:
+            acquired = client.eval(_ACQUIRE_LUA, 1, key, lease_ms, self.limit(), token)
+        except Exception:
+            # Redis went away: run unlimited rather than stall the batch.
+            yield
+            return
+        if not acquired:
+            raise ProviderBusy(key)
+        try:
+            yield
+        finally:
+            try:
+                client.zrem(key, token)
+            except Exception:
+                pass  # the lease expires on its own
+
+
+provider_slots = ProviderSlots()
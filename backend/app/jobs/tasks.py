@@ -1,16 +1,28 @@
 from __future__ import annotations
 
-import json
+import random
+from typing import Any, Optional
 
-from sqlalchemy.exc import SQLAlchemyError
-
-from app.core.db import SessionLocal
-from app.core.storage import safe_put_text
-from app.generator.diagram import DiagramGenerateRequest
+from app.data_pipeline.parallel import aggregate_shard, shard_slices
+from app.data_pipeline.reconcile import ReconcileObjectsRequest, reconcile_objects
+from app.data_pipeline.settlement import SettlementAggregate, merge_aggregates
+from app.core.settings import settings
+from app.generator.artifacts import save_diagram_artifact, save_diagram_artifacts, save_integration_artifact
+from app.generator.diagram import DiagramGenerateRequest, DiagramGenerateResponse
 from app.generator.integration import IntegrationGenerateRequest
-from app.generator.service import generate_diagram, generate_integration_plan
+from app.generator.service import (
+    diagram_batch_response,
+    generate_diagram_sync,
+    generate_integration_plan_sync,
+)
 from app.jobs.celery_app import celery_app
-from app.models.artifact import Artifact
+from app.jobs.provider_slots import ProviderBusy, provider_slots
+
+
+def _retry_when_busy(task) -> Exception:
+    # Re-queue instead of blocking the worker; jitter spreads the retries of a large batch.
+    delay = settings.LLM_SLOT_RETRY_SECONDS
+    return task.retry(countdown=delay * random.uniform(0.5, 1.5), max_retries=None)
 
 
 @celery_app.task(name="pdc.ping")
@@ -18,57 +30,102 @@ def ping() -> str:
     return "pong"
 
 
-@celery_app.task(name="pdc.diagram.generate")
-def generate_diagram_task(payload: dict) -> dict:
+@celery_app.task(name="pdc.diagram.generate", bind=True)
+def generate_diagram_task(self, payload: dict) -> dict:
     req = DiagramGenerateRequest.model_validate(payload)
-    result = generate_diagram(req)
-
-    artifact_id = None
     try:
-        with SessionLocal() as db:
-            a = Artifact(
-                kind="diagram",
-                status="done",
-                request=req.model_dump(),
-                spec=result.spec,
-                mermaid=result.mermaid,
-            )
-            # Store a copy in MinIO (best-effort)
-            object_key = f"artifacts/{a.id}/diagram.mmd"
-            a.object_key = safe_put_text(object_key, result.mermaid, content_type="text/plain; charset=utf-8")
-            db.add(a)
-            db.commit()
-            artifact_id = a.id
-    except SQLAlchemyError:
-        artifact_id = None
-    except Exception:
-        artifact_id = None
-
+        with provider_slots.hold():
+            result = generate_diagram_sync(req)
+    except ProviderBusy:
+        raise _retry_when_busy(self)
+    artifact_id = save_diagram_artifact(req, result)
     return {"artifact_id": artifact_id, **result.model_dump()}
 
 
-@celery_app.task(name="pdc.integration.generate")
-def generate_integration_task(payload: dict) -> dict:
+@celery_app.task(name="pdc.integration.generate", bind=True)
+def generate_integration_task(self, payload: dict) -> dict:
     req = IntegrationGenerateRequest.model_validate(payload)
-    result = generate_integration_plan(req)
+    try:
+        with provider_slots.hold():
+            result = generate_integration_plan_sync(req)
+    except ProviderBusy:
+        raise _retry_when_busy(self)
+    artifact_id = save_integration_artifact(req, result)
+    return {"artifact_id": artifact_id, **result.model_dump()}
 
-    artifact_id = None
+
+@celery_app.task(name="pdc.diagram.batch_item", bind=True)
+def generate_diagram_batch_item_task(self, payload: dict) -> dict:
+    # Never raise (apart from the busy retry): a failed item must not fail the chord;
+    # errors are reported per item.
     try:
-        with SessionLocal() as db:
-            a = Artifact(
-                kind="integration",
-                status="done",
-                request=req.model_dump(),
-                markdown=result.markdown,
-            )
-            object_key = f"artifacts/{a.id}/integration.md"
-            a.object_key = safe_put_text(object_key, result.markdown, content_type="text/markdown; charset=utf-8")
-            db.add(a)
-            db.commit()
-            artifact_id = a.id
-    except SQLAlchemyError:
-        artifact_id = None
-    except Exception:
-        artifact_id = None
+        with provider_slots.hold():
+            try:
+                req = DiagramGenerateRequest.model_validate(payload)
+                return {"ok": True, "result": generate_diagram_sync(req).model_dump()}
+            except Exception as e:
+                return {"ok": False, "error": str(e) or e.__class__.__name__}
+    except ProviderBusy:
+        raise _retry_when_busy(self)
 
-    return {"artifact_id": artifact_id, **result.model_dump()}
+
+@celery_app.task(name="pdc.diagram.batch_persist")
+def persist_diagram_batch_task(item_results: list[dict], payloads: list[dict], persist: bool = True) -> dict:
+    """Chord callback: persist all successful items in one transaction, keep input order."""
+
+    reqs = [DiagramGenerateRequest.model_validate(p) for p in payloads]
+    outcomes: list[Any] = []
+    results: list[Optional[DiagramGenerateResponse]] = []
+    for r in item_results:
+        if r.get("ok"):
+            res = DiagramGenerateResponse.model_validate(r["result"])
+            outcomes.append(res)
+            results.append(res)
+        else:
+            outcomes.append(RuntimeError(r.get("error") or "unknown error"))
+            results.append(None)
+
+    artifact_ids: list[Optional[str]] = [None] * len(results)
+    if persist:
+        artifact_ids = save_diagram_artifacts(list(zip(reqs, results)))
+    return diagram_batch_response(outcomes, artifact_ids).model_dump()
+
+
+def submit_diagram_batch(payloads: list[dict], persist: bool = True) -> str:
+    """Fan the batch out as a Celery chord; returns the id of the callback task to poll."""
+
+    from celery import chord
+
+    header = [celery_app.signature("pdc.diagram.batch_item", args=[p]) for p in payloads]
+    callback = celery_app.signature("pdc.diagram.batch_persist", args=[payloads], kwargs={"persist": persist})
+    return chord(header)(callback).id
+
+
+@celery_app.task(name="pdc.settlement.partial")
+def settlement_partial_task(amounts: list[Any], statuses: list[Any]) -> dict:
+    return aggregate_shard(amounts, statuses).model_dump()
+
+
+@celery_app.task(name="pdc.settlement.merge")
+def settlement_merge_task(partials: list[dict], month: str) -> dict:
+    """Chord callback: merge the shard aggregates into the final metrics."""
+
+    agg = merge_aggregates(SettlementAggregate.model_validate(p) for p in partials)
+    return agg.result(month).model_dump()
+
+
+@celery_app.task(name="pdc.settlement.reconcile")
+def settlement_reconcile_task(payload: dict) -> dict:
+    req = ReconcileObjectsRequest.model_validate(payload)
+    return reconcile_objects(req).model_dump()
+
+
+def submit_settlement_metrics(month: str, amounts: list[Any], statuses: list[Any], shard_rows: int) -> str:
+    """Shard columnar settlement input over a Celery chord; returns the callback task id."""
+
+    from celery import chord
+
+    shards = shard_slices(len(amounts), max(1, -(-len(amounts) // max(1, shard_rows))))
+    header = [celery_app.signature("pdc.settlement.partial", args=[amounts[s], statuses[s]]) for s in shards]
+    callback = celery_app.signature("pdc.settlement.merge", kwargs={"month": month})
+    return chord(header)(callback).id
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Protocol
+from typing import AsyncIterator, Protocol
 
 from app.llm.types import LLMChatRequest, LLMChatResponse
 
@@ -9,3 +9,7 @@ class LLMProvider(Protocol):
     name: str
 
     async def chat(self, req: LLMChatRequest) -> LLMChatResponse: ...
+
+    def chat_stream(self, req: LLMChatRequest) -> AsyncIterator[str]:
+        """Yield content deltas as the model produces them."""
+        ...
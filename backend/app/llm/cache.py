@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional, Protocol
+
+from app.core.lru import MemoryLRU
+from app.core.settings import settings
+from app.llm.base import LLMProvider
+from app.llm.types import LLMChatRequest, LLMChatResponse
+
+
+CACHE_HEADER = "x-pdc-cache"
+
+# Per-request cache policy, set from the X-PDC-Cache header by CachePolicyMiddleware:
+#   bypass -> neither read nor write the cache
+#   force  -> cache even when temperature > 0
+_cache_policy: ContextVar[str] = ContextVar("pdc_llm_cache_policy", default="")
+
+
+def current_cache_policy() -> str:
+    return _cache_policy.get()
+
+
+class CachePolicyMiddleware:
+    """Pure ASGI middleware so the contextvar is visible to the endpoint and its streams."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = ""
+        for k, v in scope.get("headers") or []:
+            if k.decode("latin-1").lower() == CACHE_HEADER:
+                policy = v.decode("latin-1").strip().lower()
+                break
+
+        token = _cache_policy.set(policy)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _cache_policy.reset(token)
+
+
+def cache_key(provider_name: str, model: str, req: LLMChatRequest) -> str:
+    normalized = {
+        "provider": provider_name,
+        "model": model,
+        "messages": [{"role": m.role, "content": m.content} for m in req.messages],
+        "temperature": round(float(req.temperature), 4),
+        "max_tokens": int(req.max_tokens),
+    }
+    if req.response_schema is not None:
+        # Constrained and unconstrained completions differ; keys without a schema stay as before.
+        normalized["response_schema"] = req.response_schema
+    raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _PersistentTier(Protocol):
+    name: str
+
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict[str, Any]: ...
+
+
+class _RedisTier:
+    name = "redis"
+    prefix = "pdc:llmcache:"
+
+    def __init__(self, client, ttl_seconds: float) -> None:
+        self._client = client
+        self.ttl_seconds = int(ttl_seconds)
+
+    def get(self, key: str) -> Optional[str]:
+        v = self._client.get(self.prefix + key)
+        return v.decode("utf-8") if isinstance(v, bytes) else v
+
+    def set(self, key: str, value: str) -> None:
+        self._client.set(self.prefix + key, value, ex=self.ttl_seconds if self.ttl_seconds > 0 else None)
+
+    def clear(self) -> None:
+        for k in self._client.scan_iter(match=self.prefix + "*", count=500):
+            self._client.delete(k)
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+
+class _SqliteTier:
+    name = "sqlite"
+
+    def __init__(self, path: Path, ttl_seconds: float, max_entries: int) -> None:
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] and row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._trim_locked(now)
+
+    def _trim_locked(self, now: float) -> None:
+        cur = self._conn.execute("DELETE FROM llm_cache WHERE expires_at > 0 AND expires_at < ?", (now,))
+        self.evictions += max(cur.rowcount, 0)
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return {"backend": self.name, "path": str(self.path), "entries": count, "evictions": self.evictions}
+
+
+def _open_persistent_tier() -> Optional[_PersistentTier]:
+    if not settings.LLM_CACHE_PERSISTENT:
+        return None
+
+    ttl = settings.LLM_CACHE_PERSISTENT_TTL_SECONDS
+    if settings.REDIS_URL:
+        try:
+            import redis  # local import: optional dependency
+
+            client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.3, socket_timeout=0.5)
+            client.ping()
+            return _RedisTier(client, ttl)
+        except Exception:
+            pass
+
+    data_dir = (settings.PDC_DATA_DIR or "").strip()
+    if data_dir:
+        try:
+            return _SqliteTier(Path(data_dir) / "llm_cache.sqlite3", ttl, settings.LLM_CACHE_PERSISTENT_MAX_ENTRIES)
+        except Exception:
+            return None
+    return None
+
+
+class LLMCache:
+    """Two-tier completion cache: in-process LRU in front of Redis or SQLite."""
+
+    def __init__(self) -> None:
+        self.memory = MemoryLRU(
+            settings.LLM_CACHE_MAX_ENTRIES,
+            settings.LLM_CACHE_MAX_BYTES,
+            settings.LLM_CACHE_TTL_SECONDS,
+        )
+        self._persistent: Optional[_PersistentTier] = None
+        self._persistent_resolved = False
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits_memory": 0,
+            "hits_persistent": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+            "persistent_errors": 0,
+        }
+
+    def _tier(self) -> Optional[_PersistentTier]:
+        if not self._persistent_resolved:
+            with self._lock:
+                if not self._persistent_resolved:
+                    self._persistent = _open_persistent_tier()
+                    self._persistent_resolved = True
+        return self._persistent
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def should_use(self, req: LLMChatRequest) -> bool:
+        policy = current_cache_policy()
+        if policy == "bypass":
+            return False
+        if req.temperature > 0 and not (settings.LLM_CACHE_SAMPLED or policy == "force"):
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits_memory")
+            return value
+
+        tier = await asyncio.to_thread(self._tier)
+        if tier is not None:
+            try:
+                value = await asyncio.to_thread(tier.get, key)
+            except Exception:
+                self._count("persistent_errors")
+                value = None
+            if value is not None:
+                self._count("hits_persistent")
+                self.memory.set(key, value)
+                return value
+
+        self._count("misses")
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        self._count("stores")
+        tier = await asyncio.to_thread(self._tier)
+        if tier is not None:
+            try:
+                await asyncio.to_thread(tier.set, key, value)
+            except Exception:
+                self._count("persistent_errors")
+
+    def clear(self) -> None:
+        self.memory.clear()
+        tier = self._tier()
+        if tier is not None:
+            try:
+                tier.clear()
+            except Exception:
+                self._count("persistent_errors")
+
+    def stats(self) -> dict[str, Any]:
+        tier = self._tier()
+        persistent: Optional[dict[str, Any]] = None
+        if tier is not None:
+            try:
+                persistent = tier.stats()
+            except Exception:
+                persistent = {"backend": tier.name, "error": "unavailable"}
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters["hits_memory"] + counters["hits_persistent"] + counters["misses"]
+        hits = counters["hits_memory"] + counters["hits_persistent"]
+        return {
+            "enabled": bool(settings.LLM_CACHE_ENABLED),
+            "cache_sampled": bool(settings.LLM_CACHE_SAMPLED),
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "persistent": persistent,
+        }
+
+
+class CachedProvider:
+    """LLMProvider wrapper that serves repeated identical requests from LLMCache."""
+
+    def __init__(self, inner: LLMProvider, cache: LLMCache) -> None:
+        self.inner = inner
+        self.cache = cache
+        self.name = inner.name
+        self.model = getattr(inner, "model", "")
+
+    def _key(self, req: LLMChatRequest) -> str:
+        return cache_key(self.name, self.model, req)
+
+    async def chat(self, req: LLMChatRequest) -> LLMChatResponse:
+        if not self.cache.should_use(req):
+            self.cache._count("bypassed")
+            return await self.inner.chat(req)
+
+        key = self._key(req)
+        hit = await self.cache.get(key)
+        if hit is not None:
+            return LLMChatResponse(content=hit, raw={"cache": "hit"})
+
+        resp = await self.inner.chat(req)
+        if resp.content:
+            await self.cache.set(key, resp.content)
+        return resp
+
+    async def chat_stream(self, req: LLMChatRequest) -> AsyncIterator[str]:
+        if not self.cache.should_use(req):
+            self.cache._count("bypassed")
+            async for chunk in self.inner.chat_stream(req):
+                yield chunk
+            return
+
+        key = self._key(req)
+        hit = await self.cache.get(key)
+        if hit is not None:
+            yield hit
+            return
+
+        parts: list[str] = []
+        async for chunk in self.inner.chat_stream(req):
+            parts.append(chunk)
+            yield chunk
+        # Only completed streams are cached; an exception above skips this.
+        content = "".join(parts)
+        if content:
+            await self.cache.set(key, content)
+
+
+llm_cache = LLMCache()
@@ -1,12 +1,38 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import threading
+
 from app.core.settings import settings
 from app.llm.base import LLMProvider
 
 
-def get_provider() -> LLMProvider:
-    mode = (settings.LLM_MODE or "ollama").lower()
+# Providers are cheap, but they are stateless apart from config, so keep one per config
+# instead of rebuilding on every request. Connection pooling lives in app.llm.http.
+_providers: dict[tuple[str, ...], LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+# Per-provider concurrency limiters, one per event loop (asyncio primitives are loop-bound).
+# Each entry keeps its loop: a recycled id() is told apart by identity, and entries of
+# closed loops are pruned (as in app.llm.http). A weak key would not help: a semaphore
+# holds a strong reference to its loop once contended.
+_limiters: dict[tuple[int, tuple[str, ...]], tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+
+def _provider_key(mode: str) -> tuple[str, ...]:
+    if mode == "openai_compat":
+        return (
+            mode,
+            settings.OPENAI_COMPAT_BASE_URL,
+            settings.OPENAI_COMPAT_API_KEY,
+            settings.OPENAI_COMPAT_MODEL,
+            (settings.OPENAI_COMPAT_API_STYLE or "").strip().lower(),
+        )
+    return (mode, settings.OLLAMA_BASE_URL, settings.OLLAMA_MODEL)
+
 
+def _build_provider(mode: str) -> LLMProvider:
     if mode == "openai_compat":
         from app.llm.openai_compat import provider
 
@@ -18,3 +44,50 @@ def get_provider() -> LLMProvider:
         return provider()
 
     raise ValueError(f"Unsupported LLM_MODE: {settings.LLM_MODE}. Supported: ollama | openai_compat")
+
+
+def get_provider() -> LLMProvider:
+    mode = (settings.LLM_MODE or "ollama").lower()
+    key = _provider_key(mode)
+
+    cached = _providers.get(key)
+    if cached is not None:
+        return cached
+
+    with _providers_lock:
+        cached = _providers.get(key)
+        if cached is None:
+            cached = _build_provider(mode)
+            if settings.LLM_CACHE_ENABLED:
+                from app.llm.cache import CachedProvider, llm_cache
+
+                cached = CachedProvider(cached, llm_cache)
+            _providers[key] = cached
+        return cached
+
+
+def clear_providers() -> None:
+    with _providers_lock:
+        _providers.clear()
+
+
+def provider_id() -> str:
+    """Stable short id of the current provider config (no secrets), for shared keys."""
+
+    key = _provider_key((settings.LLM_MODE or "ollama").lower())
+    return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()[:16]
+
+
+def get_provider_limiter() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent calls to the current provider (LLM_MAX_CONCURRENCY)."""
+
+    mode = (settings.LLM_MODE or "ollama").lower()
+    loop = asyncio.get_running_loop()
+    key = (id(loop), _provider_key(mode))
+    with _providers_lock:
+        for k in [k for k, (owner, _) in _limiters.items() if owner.is_closed()]:
+            del _limiters[k]
+        entry = _limiters.get(key)
+        if entry is None or entry[0] is not loop:
+            entry = _limiters[key] = (loop, asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY)))
+        return entry[1]
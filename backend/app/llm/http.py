@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from app.core.aio import run_on_loop
+from app.core.settings import settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (optional dependency: pip install httpx[http2])
+
+        return True
+    except Exception:
+        return False
+
+
+@dataclass
+class _PooledClient:
+    base_url: str
+    loop: asyncio.AbstractEventLoop
+    client: httpx.AsyncClient
+
+
+class HttpClientRegistry:
+    """Long-lived, pooled httpx clients shared by all LLM providers.
+
+    One client per (event loop, base URL): httpx connections are bound to the loop
+    that opened them, so the FastAPI loop and the background loop used by Celery
+    tasks each get their own pool.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[int, str], _PooledClient] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        key = (id(loop), _normalize_base_url(base_url))
+
+        with self._lock:
+            self._prune_locked()
+            entry = self._clients.get(key)
+            if entry is not None and entry.loop is loop and not entry.client.is_closed:
+                return entry.client
+
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=bool(settings.LLM_HTTP2) and _http2_available(),
+                timeout=120,
+            )
+            self._clients[key] = _PooledClient(base_url=key[1], loop=loop, client=client)
+            return client
+
+    def _prune_locked(self) -> None:
+        # Drop clients whose loop is gone (e.g. a worker restarted its loop).
+        stale = [k for k, e in self._clients.items() if e.loop.is_closed()]
+        for k in stale:
+            self._clients.pop(k, None)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            self._prune_locked()
+            entries = list(self._clients.values())
+        return [_pool_stats(e) for e in entries]
+
+    async def aclose(self) -> None:
+        """Close every client; those owned by other loops are closed on their own loop."""
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for e in entries:
+            if e.loop is loop:
+                await e.client.aclose()
+            else:
+                await asyncio.to_thread(run_on_loop, e.loop, e.client.aclose())
+
+    def close(self) -> None:
+        """Sync variant for shutdown hooks that run outside any event loop (Celery)."""
+
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for e in entries:
+            run_on_loop(e.loop, e.client.aclose())
+
+
+def _normalize_base_url(base_url: str) -> str:
+    u = httpx.URL((base_url or "").strip())
+    return f"{u.scheme}://{u.netloc.decode('ascii')}".lower()
+
+
+def _pool_stats(entry: _PooledClient) -> dict[str, Any]:
+    out: dict[str, Any] = {
+        "base_url": entry.base_url,
+        "http2": bool(settings.LLM_HTTP2) and _http2_available(),
+        "max_connections": settings.LLM_HTTP_MAX_CONNECTIONS,
+        "max_keepalive": settings.LLM_HTTP_MAX_KEEPALIVE,
+        "connections_open": 0,
+        "connections_active": 0,
+        "connections_idle": 0,
+        "requests_waiting": 0,
+    }
+
+    # httpcore internals; guarded so a library upgrade degrades to zeros instead of failing.
+    pool = getattr(getattr(entry.client, "_transport", None), "_pool", None)
+    if pool is None:
+        return out
+    try:
+        conns = list(pool.connections)
+        idle = sum(1 for c in conns if c.is_idle())
+        out["connections_open"] = len(conns)
+        out["connections_idle"] = idle
+        out["connections_active"] = len(conns) - idle
+        out["requests_waiting"] = sum(1 for r in list(getattr(pool, "_requests", [])) if r.is_queued())
+    except Exception:
+        pass
+    return out
+
+
+http_clients = HttpClientRegistry()
+
+
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    return http_clients.get(base_url)
+
+
+def pool_stats() -> list[dict[str, Any]]:
+    return http_clients.stats()
+
+
+def close_http_clients() -> None:
+    http_clients.close()
+
+
+async def aclose_http_clients() -> None:
+    await http_clients.aclose()
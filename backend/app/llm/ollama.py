@@ -1,35 +1,86 @@
 from __future__ import annotations
 
-import httpx
+import json
+from typing import Any, AsyncIterator, Optional
 
 from app.core.settings import settings
 from app.llm.base import LLMProvider
+from app.llm.http import get_http_client
+from app.llm.structured import StructuredLevel, rejects_structured
 from app.llm.types import LLMChatRequest, LLMChatResponse
 
 
+# The request field a server without (schema) format support complains about.
+_FORMAT_FIELDS = ("format",)
+
+
 class OllamaProvider:
     name = "ollama"
 
-    async def chat(self, req: LLMChatRequest) -> LLMChatResponse:
-        url = settings.OLLAMA_BASE_URL.rstrip("/") + "/api/chat"
-        payload = {
-            "model": settings.OLLAMA_MODEL,
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None) -> None:
+        self.base_url = (base_url or settings.OLLAMA_BASE_URL).rstrip("/")
+        self.model = model or settings.OLLAMA_MODEL
+        # `format` takes a JSON schema since Ollama 0.5; older servers only know "json".
+        self.structured = StructuredLevel()
+
+    def _payload(self, req: LLMChatRequest, stream: bool, level: str) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "model": self.model,
             "messages": [m.model_dump() for m in req.messages],
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": req.temperature,
                 # Ollama doesn't use max_tokens universally; keep it best-effort.
             },
         }
+        if level == "schema":
+            payload["format"] = req.response_schema
+        elif level == "json":
+            payload["format"] = "json"
+        return payload
 
-        async with httpx.AsyncClient(timeout=120) as client:
-            r = await client.post(url, json=payload)
+    async def chat(self, req: LLMChatRequest) -> LLMChatResponse:
+        url = self.base_url + "/api/chat"
+        client = get_http_client(self.base_url)
+        while True:
+            level = self.structured.current(req.response_schema)
+            r = await client.post(url, json=self._payload(req, False, level), timeout=120)
+            if not r.is_success and rejects_structured(r.status_code, r.text, _FORMAT_FIELDS) and self.structured.downgrade(level):
+                continue
             r.raise_for_status()
-            data = r.json()
+            break
+        data = r.json()
 
         content = data.get("message", {}).get("content", "")
         return LLMChatResponse(content=content, raw=data)
 
+    async def chat_stream(self, req: LLMChatRequest) -> AsyncIterator[str]:
+        # Ollama streams NDJSON: one {"message": {"content": ...}, "done": bool} object per line.
+        url = self.base_url + "/api/chat"
+        client = get_http_client(self.base_url)
+        while True:
+            level = self.structured.current(req.response_schema)
+            async with client.stream("POST", url, json=self._payload(req, True, level), timeout=120) as r:
+                if not r.is_success:
+                    # Rejections arrive before any content, so retrying cannot duplicate output.
+                    await r.aread()
+                    if rejects_structured(r.status_code, r.text, _FORMAT_FIELDS) and self.structured.downgrade(level):
+                        continue
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama error: {data.get('error')}")
+                    chunk = (data.get("message") or {}).get("content") or ""
+                    if chunk:
+                        yield chunk
+                    if data.get("done"):
+                        break
+            return
+
 
 def provider() -> LLMProvider:
     return OllamaProvider()
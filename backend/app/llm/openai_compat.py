@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-import httpx
+import json
+from typing import Any, AsyncIterator
 
 from app.core.settings import settings
 from app.llm.base import LLMProvider
+from app.llm.http import get_http_client
+from app.llm.structured import StructuredLevel, rejects_structured
 from app.llm.types import LLMChatRequest, LLMChatResponse
 
 
+# Output-format fields of chat completions and the Responses API, as named in gateway errors.
+_FORMAT_FIELDS = ("response_format", "text.format")
+
+
 class OpenAICompatProvider:
     name = "openai_compat"
 
@@ -17,15 +24,17 @@ class OpenAICompatProvider:
             raise ValueError("OPENAI_COMPAT_API_KEY is required")
         if not settings.OPENAI_COMPAT_MODEL:
             raise ValueError("OPENAI_COMPAT_MODEL is required")
+        self.model = settings.OPENAI_COMPAT_MODEL
+        # Not every gateway/model accepts json_schema (or response_format at all).
+        self.structured = StructuredLevel()
 
-    async def chat(self, req: LLMChatRequest) -> LLMChatResponse:
+    def _build_request(self, req: LLMChatRequest, stream: bool, level: str) -> tuple[str, str, dict[str, Any]]:
         style = (settings.OPENAI_COMPAT_API_STYLE or "chat_completions").strip().lower()
-        headers = {"Authorization": f"Bearer {settings.OPENAI_COMPAT_API_KEY}"}
 
         if style == "responses":
             url = _build_v1_url("/responses")
-            payload = {
-                "model": settings.OPENAI_COMPAT_MODEL,
+            payload: dict[str, Any] = {
+                "model": self.model,
                 "input": [
                     {
                         "role": m.role,
@@ -37,23 +46,41 @@ class OpenAICompatProvider:
                 "max_output_tokens": req.max_tokens,
                 "temperature": req.temperature,
             }
+            if level == "schema":
+                payload["text"] = {"format": {"type": "json_schema", **_schema_format(req.response_schema)}}
+            elif level == "json":
+                payload["text"] = {"format": {"type": "json_object"}}
         else:
             url = _build_v1_url("/chat/completions")
             payload = {
-                "model": settings.OPENAI_COMPAT_MODEL,
+                "model": self.model,
                 "messages": [m.model_dump() for m in req.messages],
                 "temperature": req.temperature,
                 "max_tokens": req.max_tokens,
             }
+            if level == "schema":
+                payload["response_format"] = {"type": "json_schema", "json_schema": _schema_format(req.response_schema)}
+            elif level == "json":
+                payload["response_format"] = {"type": "json_object"}
 
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, json=payload, headers=headers)
-            if not r.is_success:
-                body = (r.text or "").strip()
-                if len(body) > 1200:
-                    body = body[:1200] + "…"
-                raise RuntimeError(f"LLM gateway error HTTP {r.status_code}: {body}")
-            data = r.json()
+        if stream:
+            payload["stream"] = True
+        return style, url, payload
+
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {settings.OPENAI_COMPAT_API_KEY}"}
+
+    async def chat(self, req: LLMChatRequest) -> LLMChatResponse:
+        client = get_http_client(settings.OPENAI_COMPAT_BASE_URL)
+        while True:
+            level = self.structured.current(req.response_schema)
+            style, url, payload = self._build_request(req, False, level)
+            r = await client.post(url, json=payload, headers=self._headers(), timeout=60)
+            if r.is_success:
+                break
+            if not (rejects_structured(r.status_code, r.text, _FORMAT_FIELDS) and self.structured.downgrade(level)):
+                raise _gateway_error(r.status_code, r.text)
+        data = r.json()
 
         if style == "responses":
             content = _extract_responses_text(data)
@@ -61,6 +88,81 @@ class OpenAICompatProvider:
             content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
         return LLMChatResponse(content=content, raw=data)
 
+    async def chat_stream(self, req: LLMChatRequest) -> AsyncIterator[str]:
+        client = get_http_client(settings.OPENAI_COMPAT_BASE_URL)
+        while True:
+            level = self.structured.current(req.response_schema)
+            style, url, payload = self._build_request(req, True, level)
+            async with client.stream("POST", url, json=payload, headers=self._headers(), timeout=60) as r:
+                if not r.is_success:
+                    await r.aread()
+                    # A rejected response_format fails before anything is streamed: retry lower.
+                    if rejects_structured(r.status_code, r.text, _FORMAT_FIELDS) and self.structured.downgrade(level):
+                        continue
+                    raise _gateway_error(r.status_code, r.text)
+
+                async for event, data in _iter_sse(r.aiter_lines()):
+                    if data == "[DONE]":
+                        break
+                    obj = json.loads(data)
+
+                    if style == "responses":
+                        # Responses API: typed events; text arrives as response.output_text.delta.
+                        kind = obj.get("type") or event
+                        if kind == "response.output_text.delta":
+                            chunk = obj.get("delta") or ""
+                            if chunk:
+                                yield chunk
+                        elif kind in {"response.completed", "response.incomplete"}:
+                            break
+                        elif kind in {"error", "response.failed"}:
+                            raise RuntimeError(f"LLM gateway stream error: {json.dumps(obj, ensure_ascii=False)[:1200]}")
+                        continue
+
+                    if obj.get("error"):
+                        raise RuntimeError(f"LLM gateway stream error: {json.dumps(obj, ensure_ascii=False)[:1200]}")
+                    choices = obj.get("choices") or [{}]
+                    chunk = (choices[0].get("delta") or {}).get("content") or ""
+                    if chunk:
+                        yield chunk
+            return
+
+
+def _schema_format(schema: dict[str, Any]) -> dict[str, Any]:
+    # Same fields for chat completions' json_schema and the Responses text.format.
+    return {"name": "structured_output", "schema": schema, "strict": True}
+
+
+def _gateway_error(status_code: int, text: str) -> RuntimeError:
+    body = (text or "").strip()
+    if len(body) > 1200:
+        body = body[:1200] + "…"
+    return RuntimeError(f"LLM gateway error HTTP {status_code}: {body}")
+
+
+async def _iter_sse(lines: AsyncIterator[str]) -> AsyncIterator[tuple[str, str]]:
+    """Minimal text/event-stream parser: yields (event, data) per dispatched event."""
+
+    event = ""
+    data_lines: list[str] = []
+    async for line in lines:
+        if not line:
+            if data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = "", []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+    if data_lines:
+        yield event or "message", "\n".join(data_lines)
+
 
 def _build_v1_url(path: str) -> str:
     base = settings.OPENAI_COMPAT_BASE_URL.rstrip("/")
@@ -7,7 +7,9 @@ from typing import Optional
 from app.llm.types import ChatMessage
 
 
-def diagram_prompt(diagram_type: str, text: str, scene: Optional[str]) -> list[ChatMessage]:
+def diagram_prompt(
+    diagram_type: str, text: str, scene: Optional[str], part: Optional[tuple[int, int]] = None
+) -> list[ChatMessage]:
     sys = (
         "你是资深产品/系统分析助手。\n"
         "你只输出严格 JSON（不要 markdown，不要解释）。\n"
@@ -16,6 +18,13 @@ def diagram_prompt(diagram_type: str, text: str, scene: Optional[str]) -> list[C
         "根据输入文本提取结构化图规范（Diagram Spec）。\n"
         "必须可用于生成 Mermaid。"
     )
+    if part is not None:
+        # Chunked long documents: the per-part specs are merged by name afterwards.
+        sys += (
+            f"\n输入只是一份长文档的第 {part[0]}/{part[1]} 段：只提取本段出现的内容，不要补全其它段。\n"
+            "同一步骤/参与者/状态在各段必须使用完全相同的名称。\n"
+            "流程图用 label 为“开始”“结束”的节点标记本段的起止；状态图用 [*] 标记。"
+        )
 
     schema_hint = {
         "flow": {
@@ -49,13 +58,19 @@ def diagram_prompt(diagram_type: str, text: str, scene: Optional[str]) -> list[C
     ]
 
 
-def integration_prompt(text: str, swagger_text: Optional[str]) -> list[ChatMessage]:
+def integration_prompt(
+    text: str, swagger_text: Optional[str], swagger_index: Optional[str] = None
+) -> list[ChatMessage]:
     sys = (
         "你是资深对接方案架构师。输出 Markdown 方案（可直接粘贴到产品方案文档）。\n"
         "内容必须包含：角色与系统边界、调用链路、关键接口、鉴权、幂等、异常与重试、回调/对账、监控告警、落地步骤。\n"
         "若缺少信息，请用‘待确认’列出问题。"
     )
     payload = {"text": text, "swagger_text": swagger_text}
+    if swagger_index is not None:
+        # Large specs arrive pre-indexed (app.generator.openapi) instead of verbatim.
+        sys += "\nswagger_index 是接口文档的精简索引，只列出与需求相关的接口（* 表示必填）；索引中没有的细节请标注‘待确认’，不要编造。"
+        payload = {"text": text, "swagger_index": swagger_index}
     import json
 
     return [
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import copy
+import json
+import re
+import time
+from typing import Any, Optional, Sequence
+
+from app.core.settings import settings
+
+# Constrained-decoding levels, best first: the JSON schema itself, plain "any JSON
+# object" mode, then prompt-only. A provider starts at the best level and moves down
+# when the server rejects one, e.g. an Ollama without schema support or a gateway
+# without response_format; after LLM_STRUCTURED_RETRY_SECONDS it tries the best again.
+LEVELS = ("schema", "json", "none")
+
+# How servers say a request field is not supported (as opposed to a bad value for it).
+_UNSUPPORTED = re.compile(
+    r"not supported|unsupported|does not support|unrecognized|unknown (?:field|parameter|argument)"
+    r"|extra (?:fields?|inputs?)|not permitted|not allowed|cannot unmarshal",
+    re.I,
+)
+
+
+def strict_json_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """A pydantic JSON schema in the subset strict structured-output engines accept.
+
+    $refs are inlined, every object gets additionalProperties=false and lists all its
+    properties as required (optional ones already allow null), `const` becomes a
+    one-value enum, and titles/defaults are dropped.
+    """
+
+    defs = schema.get("$defs", {})
+
+    def _walk(node: Any) -> Any:
+        if isinstance(node, list):
+            return [_walk(x) for x in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return _walk(copy.deepcopy(defs[node["$ref"].rsplit("/", 1)[-1]]))
+        out = {k: _walk(v) for k, v in node.items() if k not in {"$defs", "title", "default"}}
+        if "const" in out:
+            out["enum"] = [out.pop("const")]
+        if out.get("type") == "object" and "properties" in out:
+            out["required"] = list(out["properties"])
+            out["additionalProperties"] = False
+        return out
+
+    return _walk(schema)
+
+
+def _parse_error(body: str) -> tuple[Optional[str], str]:
+    """(offending parameter if the error names one, error message) of an HTTP error body.
+
+    Understands OpenAI-style {"error": {"message", "param"}}, Ollama's {"error": "..."} and
+    pydantic-style {"detail": [{"loc", "msg"}]}; anything else is taken as plain text.
+    """
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None, body
+    if not isinstance(data, dict):
+        return None, body
+    err = data.get("error")
+    if isinstance(err, str):
+        return None, err
+    if isinstance(err, dict):
+        param = err.get("param") if isinstance(err.get("param"), str) else None
+        return param, str(err.get("message") or "")
+    detail = data.get("detail")
+    if isinstance(detail, list) and detail and isinstance(detail[0], dict):
+        loc = ".".join(str(p) for p in detail[0].get("loc") or [] if p != "body")
+        return loc or None, str(detail[0].get("msg") or "")
+    return None, body
+
+
+def _field_pattern(field_name: str) -> re.Pattern[str]:
+    f = re.escape(field_name)
+    if "_" in field_name or "." in field_name:
+        # Distinctive names (response_format, text.format) count wherever they appear.
+        return re.compile(rf"(?<![\w.]){f}(?![\w])")
+    # A plain word like "format" only as a field reference: quoted, a struct member
+    # (ChatRequest.format) or "field/parameter format", not "unsupported image format".
+    return re.compile(
+        rf"[.'\"`]{f}\b|\b{f}['\"`]|\b(?:field|parameter|argument)\s+['\"`]?{f}\b|\b{f}\s+(?:field|parameter)\b"
+    )
+
+
+def rejects_structured(status_code: int, body: str, fields: Sequence[str]) -> bool:
+    """Whether an HTTP error is the server refusing one of the output-format `fields` as unsupported.
+
+    The error has to name the field and say it is unsupported: a malformed message, or a
+    bad value for a supported field, is an ordinary error and must not downgrade.
+    """
+
+    if status_code not in (400, 422):
+        return False
+    param, message = _parse_error(body or "")
+    if not _UNSUPPORTED.search(message):
+        return False
+    if param is not None:
+        return any(param == f or param.startswith(f + ".") for f in fields)
+    return any(_field_pattern(f).search(message) for f in fields)
+
+
+class StructuredLevel:
+    """The best constrained-decoding level a provider has not seen rejected yet."""
+
+    def __init__(self) -> None:
+        self.start = 0 if settings.LLM_STRUCTURED_OUTPUT else len(LEVELS) - 1
+        self.level = self.start
+        self.downgraded_at = 0.0
+
+    def current(self, schema: Optional[dict[str, Any]]) -> str:
+        if self.level != self.start and time.monotonic() - self.downgraded_at > settings.LLM_STRUCTURED_RETRY_SECONDS:
+            # Servers get upgraded and rejections can be transient: probe the best level again.
+            self.level = self.start
+        return LEVELS[self.level] if schema is not None else "none"
+
+    def downgrade(self, rejected: str) -> bool:
+        """Step below `rejected`; False when there is nothing left to drop."""
+
+        if rejected == "none":
+            return False
+        self.level = max(self.level, LEVELS.index(rejected) + 1)
+        self.downgraded_at = time.monotonic()
+        return True
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Literal
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -17,6 +17,9 @@ class LLMChatRequest(BaseModel):
     messages: list[ChatMessage]
     temperature: float = 0.2
     max_tokens: int = 2048
+    # JSON schema the output must follow; providers use native constrained decoding when
+    # the server supports it (see app.llm.structured), the prompt still describes the shape.
+    response_schema: Optional[dict[str, Any]] = None
 
 
 class LLMChatResponse(BaseModel):
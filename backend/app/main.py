@@ -1,12 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
+from app.core.aio import stop_background_loop
 from app.core.settings import settings
+from app.data_pipeline.parallel import shutdown_settlement_pool
+from app.jobs.broker import broker_monitor
+from app.jobs.inproc import inproc_executor
+from app.llm.cache import CachePolicyMiddleware
+from app.llm.http import aclose_http_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if (settings.TASK_MODE or "inproc").lower() == "celery":
+        # Probe early so the first task submission already has a broker status.
+        broker_monitor.ensure_started()
+    yield
+    broker_monitor.stop()
+    await inproc_executor.shutdown()
+    shutdown_settlement_pool()
+    # Close pooled LLM connections (including those owned by the background loop).
+    await aclose_http_clients()
+    stop_background_loop()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.APP_NAME)
+    app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -14,7 +36,10 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Rerendered-Lines"],
     )
+    # X-PDC-Cache: bypass | force -> per-request LLM cache policy.
+    app.add_middleware(CachePolicyMiddleware)
 
     app.include_router(api_router, prefix="/api")
 
@@ -1,2 +1,3 @@
 from app.models.artifact import Artifact  # noqa: F401
 from app.models.base import Base  # noqa: F401
+from app.models.settlement import SettlementAggregateRecord, SettlementBatch  # noqa: F401
@@ -4,14 +4,25 @@ import uuid
 from datetime import datetime
 from typing import Any, Dict, Optional
 
-from sqlalchemy import JSON, DateTime, String, Text
+from sqlalchemy import JSON, DateTime, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
 
 
+# Light columns served by `GET /api/artifacts/?fields=summary`; on PostgreSQL the
+# listing indexes INCLUDE them so summary pages are index-only scans.
+SUMMARY_COLUMNS = ("kind", "status", "object_key", "updated_at")
+
+
 class Artifact(Base):
     __tablename__ = "artifacts"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id) desc, optionally filtered by kind/status.
+        Index("ix_artifacts_created_at_id", "created_at", "id", postgresql_include=list(SUMMARY_COLUMNS)),
+        Index("ix_artifacts_kind_created_at_id", "kind", "created_at", "id", postgresql_include=list(SUMMARY_COLUMNS)),
+        Index("ix_artifacts_status_created_at_id", "status", "created_at", "id", postgresql_include=list(SUMMARY_COLUMNS)),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     kind: Mapped[str] = mapped_column(String(32), index=True)  # diagram | integration
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import JSON, BigInteger, DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+# `channel` value of the row that aggregates every channel of a month.
+ALL_CHANNELS = "*"
+
+
+class SettlementAggregateRecord(Base):
+    """Running settlement aggregate for one month (and one channel, or ALL_CHANNELS).
+
+    `state` is the mergeable SettlementAggregate (exact sums) that deltas are folded
+    into; the metric columns are derived from it on every write so reads are O(1).
+    """
+
+    __tablename__ = "settlement_aggregates"
+    __table_args__ = (UniqueConstraint("month", "channel", name="uq_settlement_aggregates_month_channel"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    month: Mapped[str] = mapped_column(String(7))  # YYYY-MM
+    channel: Mapped[str] = mapped_column(String(64), default=ALL_CHANNELS)
+
+    state: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict)
+
+    total_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    success_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    success_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    failed_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    pending_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    success_rate: Mapped[float] = mapped_column(Float, default=0.0)
+
+    batches: Mapped[int] = mapped_column(Integer, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SettlementBatch(Base):
+    """Delta batches already applied, so a retried batch_id is not counted twice."""
+
+    __tablename__ = "settlement_batches"
+
+    batch_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), index=True)
+    rows: Mapped[int] = mapped_column(BigInteger, default=0)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=False), default=datetime.utcnow)
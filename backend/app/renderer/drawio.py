@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import html
+import xml.etree.ElementTree as ET
+from typing import Iterable, Optional, Union
+
+from app.generator.spec import FlowSpec, SequenceSpec, StateSpec
+from app.renderer.layout import MARKER_SIZE, LayoutOptions, SpecGraph, fit_node_width, layered_layout, spec_graph
+
+_MARGIN = 40
+
+_FLOW_NODE_STYLE = "rounded=1;whiteSpace=wrap;html=1;"
+_STATE_STYLE = "rounded=1;arcSize=40;whiteSpace=wrap;html=1;"
+_START_STYLE = "ellipse;html=1;fillColor=#000000;strokeColor=#000000;"
+_END_STYLE = "ellipse;shape=doubleEllipse;html=1;fillColor=#000000;strokeColor=#000000;"
+# Straight segments through the layout's bend points (draw.io would re-route orthogonal edges).
+_EDGE_STYLE = "edgeStyle=none;rounded=1;html=1;endArrow=block;endFill=1;"
+_LIFELINE_STYLE = (
+    "shape=umlLifeline;perimeter=lifelinePerimeter;whiteSpace=wrap;html=1;container=1;"
+    "collapsible=0;recursiveResize=0;outlineConnect=0;"
+)
+_MESSAGE_STYLE = "html=1;verticalAlign=bottom;endArrow=block;endFill=1;rounded=0;"
+_NOTE_STYLE = "shape=note;whiteSpace=wrap;html=1;size=14;align=left;spacingLeft=8;"
+
+
+def _value(label: Optional[str]) -> str:
+    # html=1 cells treat their value as HTML.
+    return html.escape((label or "").strip(), quote=False).replace("\n", "<br>")
+
+
+def _num(v: float) -> str:
+    return str(round(v))
+
+
+class _MxGraph:
+    """Builds the <mxfile> document cell by cell (ElementTree does the XML escaping)."""
+
+    def __init__(self) -> None:
+        self.root = ET.Element("root")
+        ET.SubElement(self.root, "mxCell", id="0")
+        ET.SubElement(self.root, "mxCell", id="1", parent="0")
+
+    def vertex(self, cid: str, label: Optional[str], style: str, x: float, y: float, w: float, h: float, parent: str = "1") -> None:
+        cell = ET.SubElement(self.root, "mxCell", id=cid, value=_value(label), style=style, vertex="1", parent=parent)
+        ET.SubElement(cell, "mxGeometry", {"x": _num(x), "y": _num(y), "width": _num(w), "height": _num(h), "as": "geometry"})
+
+    def edge(
+        self,
+        cid: str,
+        label: Optional[str],
+        style: str,
+        source: Optional[str] = None,
+        target: Optional[str] = None,
+        points: Iterable[tuple[float, float]] = (),
+        ends: Optional[tuple[tuple[float, float], tuple[float, float]]] = None,
+    ) -> None:
+        attrs = {"id": cid, "value": _value(label), "style": style, "edge": "1", "parent": "1"}
+        if source is not None:
+            attrs["source"] = source
+        if target is not None:
+            attrs["target"] = target
+        cell = ET.SubElement(self.root, "mxCell", attrs)
+        geo = ET.SubElement(cell, "mxGeometry", {"relative": "1", "as": "geometry"})
+        if ends is not None:
+            for (x, y), role in zip(ends, ("sourcePoint", "targetPoint")):
+                ET.SubElement(geo, "mxPoint", {"x": _num(x), "y": _num(y), "as": role})
+        points = list(points)
+        if points:
+            arr = ET.SubElement(geo, "Array", {"as": "points"})
+            for x, y in points:
+                ET.SubElement(arr, "mxPoint", {"x": _num(x), "y": _num(y)})
+
+    def to_xml(self, name: str, width: float, height: float) -> str:
+        mxfile = ET.Element("mxfile", host="app.diagrams.net", agent="ProductDiagramCopilot", version="22.1.0")
+        diagram = ET.SubElement(mxfile, "diagram", id="generated", name=name)
+        model = ET.SubElement(
+            diagram,
+            "mxGraphModel",
+            {
+                "dx": "1200",
+                "dy": "800",
+                "grid": "1",
+                "gridSize": "10",
+                "guides": "1",
+                "tooltips": "1",
+                "connect": "1",
+                "arrows": "1",
+                "fold": "1",
+                "page": "1",
+                "pageScale": "1",
+                "pageWidth": _num(max(width + 2 * _MARGIN, 850)),
+                "pageHeight": _num(max(height + 2 * _MARGIN, 1100)),
+                "math": "0",
+                "shadow": "0",
+            },
+        )
+        model.append(self.root)
+        return ET.tostring(mxfile, encoding="unicode")
+
+
+def _note(g: _MxGraph, note: Optional[str], y: float, width: float) -> float:
+    if not (note or "").strip():
+        return 0.0
+    g.vertex("note", note, _NOTE_STYLE, _MARGIN, y, max(width, 240), 60)
+    return 80.0
+
+
+_VERTEX_STYLES = {"start": _START_STYLE, "end": _END_STYLE}
+
+
+def _render_graph(graph: SpecGraph, node_style: str, name: str, note: Optional[str]) -> str:
+    g = _MxGraph()
+    opts = LayoutOptions(direction=graph.direction, node_width=fit_node_width(s for s in graph.labels if s))
+    lay = layered_layout(len(graph.labels), [(u, v) for u, v, _ in graph.edges], opts)
+    for i, (label, kind) in enumerate(zip(graph.labels, graph.kinds)):
+        x, y = lay.x[i] + _MARGIN, lay.y[i] + _MARGIN
+        w, h = opts.node_width, opts.node_height
+        if kind != "node":
+            # Start/end markers sit centred in their slot.
+            x, y = x + (w - MARKER_SIZE) / 2, y + (h - MARKER_SIZE) / 2
+            w = h = MARKER_SIZE
+        g.vertex(f"n{i}", label, _VERTEX_STYLES.get(kind, node_style), x, y, w, h)
+    for k, (u, v, label) in enumerate(graph.edges):
+        points = ((x + _MARGIN, y + _MARGIN) for x, y in lay.edge_points[k])
+        g.edge(f"e{k}", label, _EDGE_STYLE, source=f"n{u}", target=f"n{v}", points=points)
+    height = lay.height + _note(g, note, lay.height + 2 * _MARGIN, lay.width)
+    return g.to_xml(name, lay.width, height)
+
+
+def render_flow_drawio(spec: FlowSpec) -> str:
+    """Flow spec -> mxfile, laid out by layered_layout."""
+
+    return _render_graph(spec_graph(spec), _FLOW_NODE_STYLE, "Flow", spec.note)
+
+
+def render_state_drawio(spec: StateSpec) -> str:
+    """State spec -> mxfile; `[*]` becomes start/end markers."""
+
+    return _render_graph(spec_graph(spec), _STATE_STYLE, "State", spec.note)
+
+
+def render_sequence_drawio(spec: SequenceSpec) -> str:
+    """Sequence spec -> mxfile: a UML lifeline per participant, one message row per step."""
+
+    participants = list(dict.fromkeys(spec.participants))
+    seen = set(participants)
+    for m in spec.messages:
+        for p in (m.from_, m.to):
+            if p not in seen:
+                seen.add(p)
+                participants.append(p)
+
+    width = fit_node_width(participants, low=100, high=240)
+    gap, head, row = 60, 40, 40
+    rows = sum(2 if m.from_ == m.to else 1 for m in spec.messages)
+    life_h = head + row * (rows + 1)
+    center = {p: _MARGIN + i * (width + gap) + width / 2 for i, p in enumerate(participants)}
+
+    g = _MxGraph()
+    for i, p in enumerate(participants):
+        g.vertex(f"p{i}", p, _LIFELINE_STYLE, center[p] - width / 2, _MARGIN, width, life_h)
+    y = _MARGIN + head + row
+    for k, m in enumerate(spec.messages):
+        x1, x2 = center[m.from_], center[m.to]
+        if x1 == x2:
+            # Self message: a small loop to the right of the lifeline.
+            g.edge(f"m{k}", m.label, _MESSAGE_STYLE, ends=((x1, y), (x1, y + row)), points=[(x1 + 40, y), (x1 + 40, y + row)])
+            y += 2 * row
+        else:
+            g.edge(f"m{k}", m.label, _MESSAGE_STYLE, ends=((x1, y), (x2, y)))
+            y += row
+
+    total_w = max(len(participants) * (width + gap) - gap, 0)
+    height = life_h + _note(g, spec.note, _MARGIN + life_h + 20, total_w)
+    return g.to_xml("Sequence", total_w, height)
+
+
+def render_drawio(spec: Union[FlowSpec, SequenceSpec, StateSpec]) -> str:
+    """Deterministic spec -> draw.io mxfile XML, no LLM involved."""
+
+    if isinstance(spec, FlowSpec):
+        return render_flow_drawio(spec)
+    if isinstance(spec, SequenceSpec):
+        return render_sequence_drawio(spec)
+    return render_state_drawio(spec)
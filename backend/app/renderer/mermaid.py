@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from typing import Iterable, Iterator, Optional, Union
 
 from app.generator.spec import FlowSpec, SequenceSpec, StateSpec
 
@@ -20,9 +21,12 @@ _FLOW_RESERVED_IDS = {
 }
 
 
-def _safe_flow_id(raw: str, used: set[str]) -> str:
-    s = (raw or "").strip()
-    s = re.sub(r"[^0-9A-Za-z_]", "_", s)
+# Compiled once: _flow_base runs for every node id of (possibly very large) specs.
+_FLOW_ID_INVALID = re.compile(r"[^0-9A-Za-z_]")
+
+
+def _flow_base(raw: str) -> str:
+    s = _FLOW_ID_INVALID.sub("_", (raw or "").strip())
     if not s:
         s = "node"
     if s[0].isdigit():
@@ -30,81 +34,140 @@ def _safe_flow_id(raw: str, used: set[str]) -> str:
 
     if s.lower() in _FLOW_RESERVED_IDS:
         s = f"n_{s}"
+    return s
 
-    candidate = s
-    i = 2
-    while candidate in used:
-        candidate = f"{s}_{i}"
-        i += 1
-    used.add(candidate)
-    return candidate
 
+class FlowIdAllocator:
+    """Unique Mermaid-safe node ids: sanitized raw id, then `_2`, `_3`, ... on collision.
 
-def render_flow(spec: FlowSpec) -> str:
-    lines: list[str] = []
-    direction = spec.direction or "TD"
-    lines.append(f"flowchart {direction}")
+    Remembers the next free suffix per sanitized base, so ids that all sanitize to
+    the same base (e.g. non-ASCII labels -> "___") cost O(1) each instead of
+    re-probing every suffix taken so far; allocation is O(n) for the whole spec.
+    """
 
-    used: set[str] = set()
-    id_map: dict[str, str] = {}
+    def __init__(self) -> None:
+        self.used: set[str] = set()
+        self._next: dict[str, int] = {}
+
+    def __call__(self, raw: str) -> str:
+        s = _flow_base(raw)
+        candidate = s
+        if candidate in self.used:
+            # A suffix skipped here stays taken, so later probes never revisit it.
+            i = self._next.get(s, 2)
+            candidate = f"{s}_{i}"
+            while candidate in self.used:
+                i += 1
+                candidate = f"{s}_{i}"
+            self._next[s] = i + 1
+        self.used.add(candidate)
+        return candidate
+
+
+def flow_header_line(direction: Optional[str]) -> str:
+    return f"flowchart {direction or 'TD'}"
 
+
+def flow_node_line(nid: str, label: str) -> str:
+    safe_label = label.replace("\n", " ")
+    return f"  {nid}[\"{safe_label}\"]"
+
+
+def flow_edge_line(from_id: str, to_id: str, label: Optional[str]) -> str:
+    label = (label or "").strip()
+    if label:
+        return f"  {from_id} -->|{label}| {to_id}"
+    return f"  {from_id} --> {to_id}"
+
+
+def flow_id_map(spec: FlowSpec, alloc: Optional[FlowIdAllocator] = None) -> dict[str, str]:
+    """Spec id -> Mermaid id, allocated in render order (nodes, then edge-only ids)."""
+
+    alloc = alloc or FlowIdAllocator()
+    id_map: dict[str, str] = {}
     for n in spec.nodes:
         if n.id not in id_map:
-            id_map[n.id] = _safe_flow_id(n.id, used)
+            id_map[n.id] = alloc(n.id)
+    for e in spec.edges:
+        for raw in (e.from_, e.to):
+            if raw not in id_map:
+                id_map[raw] = alloc(raw)
+    return id_map
 
-    for n in spec.nodes:
-        safe_label = n.label.replace("\n", " ")
-        nid = id_map.get(n.id) or _safe_flow_id(n.id, used)
-        id_map[n.id] = nid
-        lines.append(f"  {nid}[\"{safe_label}\"]")
 
-    for e in spec.edges:
-        from_id = id_map.get(e.from_)
-        if not from_id:
-            from_id = _safe_flow_id(e.from_, used)
-            id_map[e.from_] = from_id
+def iter_render_flow(spec: FlowSpec) -> Iterator[str]:
+    """Yield the lines of render_flow one at a time (no trailing newlines)."""
 
-        to_id = id_map.get(e.to)
-        if not to_id:
-            to_id = _safe_flow_id(e.to, used)
-            id_map[e.to] = to_id
+    yield flow_header_line(spec.direction)
+    id_map = flow_id_map(spec)
+    for n in spec.nodes:
+        yield flow_node_line(id_map[n.id], n.label)
+    for e in spec.edges:
+        yield flow_edge_line(id_map[e.from_], id_map[e.to], e.label)
 
-        label = (e.label or "").strip()
-        if label:
-            lines.append(f"  {from_id} -->|{label}| {to_id}")
-        else:
-            lines.append(f"  {from_id} --> {to_id}")
 
-    return "\n".join(lines)
+def render_flow(spec: FlowSpec) -> str:
+    return "\n".join(iter_render_flow(spec))
 
 
-def render_sequence(spec: SequenceSpec) -> str:
-    lines: list[str] = ["sequenceDiagram"]
+def iter_render_sequence(spec: SequenceSpec) -> Iterator[str]:
+    yield "sequenceDiagram"
 
     for p in spec.participants:
-        lines.append(f"  participant {p}")
+        yield f"  participant {p}"
 
     for m in spec.messages:
-        lines.append(f"  {m.from_}->>{m.to}: {m.label}")
+        yield f"  {m.from_}->>{m.to}: {m.label}"
 
     if spec.note:
-        lines.append(f"  Note over {spec.participants[0]},{spec.participants[-1]}: {spec.note}")
+        yield f"  Note over {spec.participants[0]},{spec.participants[-1]}: {spec.note}"
 
-    return "\n".join(lines)
 
+def render_sequence(spec: SequenceSpec) -> str:
+    return "\n".join(iter_render_sequence(spec))
 
-def render_state(spec: StateSpec) -> str:
-    lines: list[str] = ["stateDiagram-v2"]
+
+def iter_render_state(spec: StateSpec) -> Iterator[str]:
+    yield "stateDiagram-v2"
 
     # Mermaid stateDiagram doesn't require explicit state declarations, but adding improves readability.
     for s in spec.states:
-        lines.append(f"  state {s}")
+        yield f"  state {s}"
 
     for t in spec.transitions:
         label = (t.label or "").strip()
         if label:
-            lines.append(f"  {t.from_} --> {t.to}: {label}")
+            yield f"  {t.from_} --> {t.to}: {label}"
         else:
-            lines.append(f"  {t.from_} --> {t.to}")
+            yield f"  {t.from_} --> {t.to}"
+
 
-    return "\n".join(lines)
+def render_state(spec: StateSpec) -> str:
+    return "\n".join(iter_render_state(spec))
+
+
+def iter_render(spec: Union[FlowSpec, SequenceSpec, StateSpec]) -> Iterator[str]:
+    if isinstance(spec, FlowSpec):
+        return iter_render_flow(spec)
+    if isinstance(spec, SequenceSpec):
+        return iter_render_sequence(spec)
+    return iter_render_state(spec)
+
+
+def iter_chunks(lines: Iterable[str], max_chars: int = 64 * 1024) -> Iterator[str]:
+    """Group lines into newline-joined text chunks of about `max_chars` for streaming.
+
+    Concatenating the chunks gives exactly "\\n".join(lines).
+    """
+
+    buf: list[str] = []
+    size = 0
+    first = True
+    for line in lines:
+        buf.append(line)
+        size += len(line) + 1
+        if size >= max_chars:
+            yield ("" if first else "\n") + "\n".join(buf)
+            buf, size, first = [], 0, False
+    if buf:
+        yield ("" if first else "\n") + "\n".join(buf)
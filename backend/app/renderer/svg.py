@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+from typing import Any, Optional, Union
+
+from app.core.lru import MemoryLRU
+from app.core.settings import settings
+from app.core.storage import open_object, safe_put_text
+from app.generator.spec import FlowSpec, SequenceSpec, StateSpec
+from app.renderer.layout import MARKER_SIZE, LayoutOptions, SpecGraph, fit_node_width, layered_layout, spec_graph, text_width
+
+# Part of every cache key: bump whenever the SVG output changes.
+SVG_RENDERER_VERSION = 1
+
+_MARGIN = 20
+_LINE_HEIGHT = 15
+_STYLE = (
+    "<style>"
+    "text{font-family:-apple-system,'Segoe UI','PingFang SC','Microsoft YaHei',sans-serif;font-size:12px;fill:#222}"
+    ".n{fill:#fff;stroke:#666}.s{fill:#222}.e{fill:none;stroke:#555;marker-end:url(#arrow)}"
+    ".l{font-size:11px;paint-order:stroke;stroke:#fff;stroke-width:3px}"
+    ".life{stroke:#999;stroke-dasharray:4 3}.note{fill:#fff8c4;stroke:#c8b560}"
+    "</style>"
+    '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" '
+    'orient="auto-start-reverse"><path d="M0,0L10,5L0,10z" fill="#555"/></marker></defs>'
+)
+
+
+def _esc(s: str) -> str:
+    return html.escape(s, quote=True)
+
+
+def _n(v: float) -> str:
+    return f"{v:.1f}".rstrip("0").rstrip(".")
+
+
+def _wrap(label: str, width: float, max_lines: int) -> list[str]:
+    """Greedy per-character wrap (works for CJK and latin alike); the last line gets "…" on overflow."""
+
+    lines: list[str] = []
+    cur, cur_w = "", 0
+    for ch in label.replace("\n", " ").strip():
+        w = text_width(ch)
+        if cur and cur_w + w > width:
+            lines.append(cur)
+            if len(lines) == max_lines:
+                lines[-1] = lines[-1][:-1] + "…"
+                return lines
+            cur, cur_w = "", 0
+        cur += ch
+        cur_w += w
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+def _text(parts: list[str], label: str, cx: float, cy: float, width: float, max_lines: int) -> None:
+    lines = _wrap(label, width, max_lines)
+    if not lines:
+        return
+    y0 = cy - (len(lines) - 1) * _LINE_HEIGHT / 2
+    spans = "".join(
+        f'<tspan x="{_n(cx)}" y="{_n(y0 + i * _LINE_HEIGHT)}">{_esc(s)}</tspan>' for i, s in enumerate(lines)
+    )
+    parts.append(f'<text text-anchor="middle" dominant-baseline="central">{spans}</text>')
+
+
+def _label(parts: list[str], label: Optional[str], x: float, y: float) -> None:
+    label = (label or "").strip()
+    if label:
+        parts.append(f'<text class="l" x="{_n(x)}" y="{_n(y)}" text-anchor="middle">{_esc(label)}</text>')
+
+
+def _clip(cx: float, cy: float, hw: float, hh: float, tx: float, ty: float, round_: bool) -> tuple[float, float]:
+    # Point where the segment from the shape centre towards (tx, ty) leaves the box (or circle).
+    dx, dy = tx - cx, ty - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    if round_:
+        t = hw / (dx * dx + dy * dy) ** 0.5
+    else:
+        t = min(hw / abs(dx) if dx else float("inf"), hh / abs(dy) if dy else float("inf"))
+    return cx + dx * t, cy + dy * t
+
+
+def _document(parts: list[str], width: float, height: float) -> str:
+    w, h = _n(width + 2 * _MARGIN), _n(height + 2 * _MARGIN)
+    head = f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" viewBox="0 0 {w} {h}">{_STYLE}'
+    return head + "".join(parts) + "</svg>"
+
+
+def _note(parts: list[str], note: Optional[str], y: float, width: float) -> float:
+    note = (note or "").strip()
+    if not note:
+        return 0.0
+    w = max(width, 240)
+    parts.append(f'<rect class="note" x="{_MARGIN}" y="{_n(y)}" width="{_n(w)}" height="50"/>')
+    _text(parts, note, _MARGIN + w / 2, y + 25, w - 16, 2)
+    return 70.0
+
+
+def _render_graph(graph: SpecGraph, rx: int, note: Optional[str]) -> str:
+    opts = LayoutOptions(direction=graph.direction, node_width=fit_node_width(s for s in graph.labels if s))
+    lay = layered_layout(len(graph.labels), [(u, v) for u, v, _ in graph.edges], opts)
+    hw, hh = opts.node_width / 2, opts.node_height / 2
+    centers = [(x + hw + _MARGIN, y + hh + _MARGIN) for x, y in zip(lay.x, lay.y)]
+    marker = [kind != "node" for kind in graph.kinds]
+
+    parts: list[str] = []
+    for k, (u, v, label) in enumerate(graph.edges):
+        (ux, uy), (vx, vy) = centers[u], centers[v]
+        if u == v:
+            # Self-loop on the right-hand side of the node.
+            r = MARKER_SIZE / 2 if marker[u] else hw
+            parts.append(
+                f'<path class="e" d="M{_n(ux + r)},{_n(uy - 10)}C{_n(ux + r + 40)},{_n(uy - 35)} '
+                f'{_n(ux + r + 40)},{_n(uy + 35)} {_n(ux + r)},{_n(uy + 10)}"/>'
+            )
+            _label(parts, label, ux + r + 44, uy - 20)
+            continue
+        bends = [(x + _MARGIN, y + _MARGIN) for x, y in lay.edge_points[k]]
+        first, last = bends[0] if bends else (vx, vy), bends[-1] if bends else (ux, uy)
+        sx, sy = _clip(ux, uy, MARKER_SIZE / 2 if marker[u] else hw, hh, *first, marker[u])
+        ex, ey = _clip(vx, vy, MARKER_SIZE / 2 if marker[v] else hw, hh, *last, marker[v])
+        pts = [(sx, sy), *bends, (ex, ey)]
+        parts.append(f'<path class="e" d="M{"L".join(f"{_n(x)},{_n(y)}" for x, y in pts)}"/>')
+        mid = len(pts) // 2
+        (ax, ay), (bx, by) = pts[mid - 1], pts[mid]
+        _label(parts, label, (ax + bx) / 2, (ay + by) / 2 - 4)
+
+    for i, (label, kind) in enumerate(zip(graph.labels, graph.kinds)):
+        cx, cy = centers[i]
+        if kind == "start":
+            parts.append(f'<circle class="s" cx="{_n(cx)}" cy="{_n(cy)}" r="{MARKER_SIZE // 2 - 3}"/>')
+        elif kind == "end":
+            parts.append(f'<circle class="n" cx="{_n(cx)}" cy="{_n(cy)}" r="{MARKER_SIZE // 2}"/>')
+            parts.append(f'<circle class="s" cx="{_n(cx)}" cy="{_n(cy)}" r="{MARKER_SIZE // 2 - 5}"/>')
+        else:
+            parts.append(
+                f'<rect class="n" x="{_n(cx - hw)}" y="{_n(cy - hh)}" width="{_n(2 * hw)}" height="{_n(2 * hh)}" rx="{rx}"/>'
+            )
+            _text(parts, label, cx, cy, 2 * hw - 16, 3)
+
+    # Self-loops and their labels stick out to the right of the layout box.
+    width = lay.width + (60 if any(u == v for u, v, _ in graph.edges) else 0)
+    height = lay.height + _note(parts, note, lay.height + 2 * _MARGIN, lay.width)
+    return _document(parts, width, height)
+
+
+def render_flow_svg(spec: FlowSpec) -> str:
+    return _render_graph(spec_graph(spec), 6, spec.note)
+
+
+def render_state_svg(spec: StateSpec) -> str:
+    return _render_graph(spec_graph(spec), 16, spec.note)
+
+
+def render_sequence_svg(spec: SequenceSpec) -> str:
+    """Participant boxes with dashed lifelines, one message row per step (same geometry as the draw.io export)."""
+
+    participants = list(dict.fromkeys(spec.participants))
+    seen = set(participants)
+    for m in spec.messages:
+        for p in (m.from_, m.to):
+            if p not in seen:
+                seen.add(p)
+                participants.append(p)
+
+    width = fit_node_width(participants, low=100, high=240)
+    gap, head, row = 60, 40, 40
+    rows = sum(2 if m.from_ == m.to else 1 for m in spec.messages)
+    life_h = head + row * (rows + 1)
+    center = {p: _MARGIN + i * (width + gap) + width / 2 for i, p in enumerate(participants)}
+
+    parts: list[str] = []
+    for p in participants:
+        cx = center[p]
+        parts.append(f'<line class="life" x1="{_n(cx)}" y1="{_MARGIN + head}" x2="{_n(cx)}" y2="{_MARGIN + life_h}"/>')
+        parts.append(f'<rect class="n" x="{_n(cx - width / 2)}" y="{_MARGIN}" width="{width}" height="{head}" rx="3"/>')
+        _text(parts, p, cx, _MARGIN + head / 2, width - 12, 2)
+    y = _MARGIN + head + row
+    for m in spec.messages:
+        x1, x2 = center[m.from_], center[m.to]
+        if x1 == x2:
+            parts.append(f'<path class="e" d="M{_n(x1)},{y}L{_n(x1 + 40)},{y}L{_n(x1 + 40)},{y + row}L{_n(x1 + 4)},{y + row}"/>')
+            _label(parts, m.label, x1 + 44, y + row / 2 + 4)
+            y += 2 * row
+        else:
+            tip = x2 - 4 if x2 > x1 else x2 + 4
+            parts.append(f'<path class="e" d="M{_n(x1)},{y}L{_n(tip)},{y}"/>')
+            _label(parts, m.label, (x1 + x2) / 2, y - 6)
+            y += row
+
+    total_w = max(len(participants) * (width + gap) - gap, 0)
+    height = life_h + _note(parts, spec.note, _MARGIN + life_h + 20, total_w)
+    return _document(parts, total_w, height)
+
+
+def render_svg(spec: Union[FlowSpec, SequenceSpec, StateSpec]) -> str:
+    """Spec -> standalone SVG document, laid out in Python (no browser, Node or Mermaid CLI)."""
+
+    if isinstance(spec, FlowSpec):
+        return render_flow_svg(spec)
+    if isinstance(spec, SequenceSpec):
+        return render_sequence_svg(spec)
+    return render_state_svg(spec)
+
+
+def spec_hash(spec: Any) -> str:
+    """Content address of a stored spec (JSON) for the current renderer version."""
+
+    raw = json.dumps(
+        {"renderer": SVG_RENDERER_VERSION, "spec": spec}, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SvgCache:
+    """Rendered SVG by spec hash: in-process LRU, then svg/<hash>.svg in object storage.
+
+    Entries never go stale (the key is the content), so there is no TTL and no
+    invalidation; a patched spec simply gets a new key.
+    """
+
+    def __init__(self) -> None:
+        self.memory = MemoryLRU(settings.SVG_CACHE_MAX_ENTRIES, settings.SVG_CACHE_MAX_BYTES, 0)
+        self.counters = {"hits_memory": 0, "hits_store": 0, "renders": 0}
+
+    @staticmethod
+    def _object_key(key: str) -> str:
+        return f"svg/{key}.svg"
+
+    def _load(self, key: str) -> Optional[str]:
+        if not settings.SVG_CACHE_STORE:
+            return None
+        try:
+            with open_object(self._object_key(key)) as f:
+                return f.read().decode("utf-8")
+        except Exception:
+            return None
+
+    def get_or_render(self, key: str, render) -> str:
+        """Cached SVG for `key`, else `render()` (called with no arguments) and store it."""
+
+        svg = self.memory.get(key)
+        if svg is not None:
+            self.counters["hits_memory"] += 1
+            return svg
+        svg = self._load(key)
+        if svg is not None:
+            self.counters["hits_store"] += 1
+        else:
+            svg = render()
+            self.counters["renders"] += 1
+            if settings.SVG_CACHE_STORE:
+                safe_put_text(self._object_key(key), svg, content_type="image/svg+xml")
+        self.memory.set(key, svg)
+        return svg
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.counters, "memory": self.memory.stats()}
+
+
+svg_cache = SvgCache()
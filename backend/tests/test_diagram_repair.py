@@ -0,0 +1,30 @@
+import pytest
+from pydantic import ValidationError
+
+from app.generator.diagram import DiagramGenerateRequest
+from app.generator.service import _diagram_from_content
+
+
+def _req(diagram_type: str = "flow") -> DiagramGenerateRequest:
+    return DiagramGenerateRequest(diagram_type=diagram_type, text="提交申请 -> 主管审批 -> 归档")
+
+
+def test_output_cut_after_nodes_keeps_the_nodes():
+    resp = _diagram_from_content(_req(), '{"type": "flow", "nodes": [{"id": "n1", "label": "A"}, {"id": "n2", "label": "B"}], "ed')
+    assert [n["id"] for n in resp.spec["nodes"]] == ["n1", "n2"]
+    assert resp.spec["edges"] == []
+
+
+def test_flow_cut_before_the_first_list_falls_back_to_the_text():
+    resp = _diagram_from_content(_req(), '{"type": "flow", "direction": "TD", "nod')
+    assert [n["label"] for n in resp.spec["nodes"]] == ["提交申请", "主管审批", "归档"]
+
+
+def test_sequence_cut_before_the_first_list_is_an_error():
+    with pytest.raises(ValidationError):
+        _diagram_from_content(_req("sequence"), '{"type": "sequence", "partic')
+
+
+def test_unrepairable_output_is_an_error():
+    with pytest.raises(ValueError):
+        _diagram_from_content(_req(), "{'type': 'flow'}")
@@ -0,0 +1,16 @@
+import pytest
+from pydantic import ValidationError
+
+from app.generator.diagram import DrawioXmlGenerateRequest
+
+_SPEC = {"type": "flow", "nodes": [{"id": "n1", "label": "A"}], "edges": []}
+
+
+@pytest.mark.parametrize("body", [{}, {"text": "  "}, {"spec": _SPEC, "engine": "llm"}])
+def test_drawio_request_without_text_is_rejected_for_the_llm(body):
+    with pytest.raises(ValidationError):
+        DrawioXmlGenerateRequest.model_validate(body)
+
+
+def test_drawio_request_with_spec_needs_no_text():
+    assert DrawioXmlGenerateRequest.model_validate({"spec": _SPEC}).use_layout
@@ -0,0 +1,27 @@
+import asyncio
+
+from app.jobs.inproc import SUCCESS, InprocExecutor
+from app.llm.cache import _cache_policy, current_cache_policy
+
+
+def test_each_job_sees_its_own_submitters_cache_policy():
+    executor = InprocExecutor(workers=2, max_queue=10, result_ttl_seconds=60, max_results=10)
+
+    async def job():
+        return {"policy": current_cache_policy()}
+
+    async def submit(policy: str) -> str:
+        # Like CachePolicyMiddleware: the request sets the policy for its own context.
+        token = _cache_policy.set(policy)
+        try:
+            return executor.submit("test", job)
+        finally:
+            _cache_policy.reset(token)
+
+    async def main():
+        ids = [await asyncio.create_task(submit(p)) for p in ("bypass", "force", "")]
+        while any(executor.get(i).state != SUCCESS for i in ids):
+            await asyncio.sleep(0.01)
+        return [executor.get(i).result["policy"] for i in ids]
+
+    assert asyncio.run(main()) == ["bypass", "force", ""]
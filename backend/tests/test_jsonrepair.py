@@ -0,0 +1,24 @@
+import pytest
+
+from app.generator.jsonrepair import repair_json
+
+
+def test_truncated_output_keeps_complete_elements():
+    fixed = repair_json('```json\n{"type": "flow", "nodes": [{"id": "n1", "label": "A"}, {"id": "n2", "lab')
+    assert fixed.value == {"type": "flow", "nodes": [{"id": "n1", "label": "A"}]}
+    assert "dropped incomplete trailing element" in fixed.repairs
+
+
+def test_number_cut_at_the_end_is_dropped_not_shortened():
+    assert repair_json('{"a": 1, "b": 2.').value == {"a": 1}
+    assert repair_json('{"a": 1, "b": 12').value == {"a": 1}
+
+
+@pytest.mark.parametrize("text", ['{"a": 1.', "{'type': 'flow'}", "{", '{"a": {"b": 1.'])
+def test_repair_that_loses_every_key_is_rejected(text):
+    with pytest.raises(ValueError):
+        repair_json(text)
+
+
+def test_empty_object_in_the_output_is_not_a_repair():
+    assert repair_json("{}").value == {}
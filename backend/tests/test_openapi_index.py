@@ -0,0 +1,53 @@
+import pytest
+
+from app.generator.openapi import build_index, parse_document, render_index, swagger_context
+
+_BASE = """
+openapi: 3.0.0
+info: {title: Pay, version: 1}
+paths:
+  /payments:
+    post:
+      operationId: createPayment
+      summary: Create a payment
+      requestBody:
+        content:
+          application/json:
+            schema: {type: object, required: [amount], properties: {amount: {type: number}}}
+      responses: {"201": {description: ok}}
+"""
+
+
+def _with(extra: str) -> str:
+    return _BASE + extra
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        _BASE.replace("info: {title: Pay, version: 1}", "info: Pay API"),
+        _BASE.replace("responses:", "callbacks: [a, b]\n      responses:"),
+        _with("components:\n  securitySchemes: [bearer]\n"),
+        _BASE.replace("required: [amount]", "required: true"),
+        _BASE.replace("summary: Create a payment", "summary: 2024-01-01"),
+        _BASE.replace("summary: Create a payment", "summary: Yes"),
+        _BASE.replace("operationId: createPayment", "operationId: 12"),
+        _BASE.replace("summary: Create a payment", "tags: payments"),
+    ],
+    ids=["info-str", "callbacks-list", "schemes-list", "required-true", "summary-date", "summary-bool", "id-int", "tags-str"],
+)
+def test_loosely_typed_documents_are_indexed(text):
+    pytest.importorskip("yaml")
+    index = build_index(parse_document(text))
+    assert [op.path for op in index.operations] == ["/payments"]
+    assert render_index(index, index.operations, True)
+
+
+def test_swagger_context_falls_back_instead_of_raising(monkeypatch):
+    from app.generator import openapi
+
+    def broken(doc):
+        raise TypeError("unexpected shape")
+
+    monkeypatch.setattr(openapi, "build_index", broken)
+    assert swagger_context('{"openapi": "3.0.0", "paths": {}, "x-unique": 1}', "pay") is None
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.llm import factory
+
+
+async def _contended_limiter() -> asyncio.Semaphore:
+    limiter = factory.get_provider_limiter()
+
+    async def hold():
+        async with limiter:
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*(hold() for _ in range(factory.settings.LLM_MAX_CONCURRENCY + 2)))
+    return limiter
+
+
+def test_limiters_of_closed_loops_are_dropped():
+    for _ in range(3):
+        asyncio.run(_contended_limiter())
+
+    async def live_loops():
+        factory.get_provider_limiter()
+        return len(factory._limiters)
+
+    assert asyncio.run(live_loops()) == 1
+
+
+def test_each_loop_gets_its_own_limiter():
+    first = asyncio.run(_contended_limiter())
+    second = asyncio.run(_contended_limiter())
+    assert first is not second
@@ -0,0 +1,35 @@
+import math
+
+from app.data_pipeline.ingest import resolve_format
+from app.data_pipeline.reconcile import LedgerStreamParser, Reconciler
+
+
+def _feed(rec: Reconciler, side: str, text: str) -> None:
+    parser = LedgerStreamParser(rec, side, resolve_format("csv"))
+    parser.feed(text.encode())
+    parser.close()
+
+
+def test_non_finite_amounts_are_invalid_rows():
+    with Reconciler() as rec:
+        _feed(rec, "ours", "id,amount\nx,nan\ny,inf\nz,1.5\n")
+        _feed(rec, "theirs", "id,amount\nx,nan\nz,1.5\n")
+        out = rec.finish()
+
+    assert out.invalid_rows == {"ours": 2, "theirs": 1}
+    assert out.categories["matched"].count == 1
+    assert out.categories["matched"].ours_amount == 1.5
+    out.model_dump_json()  # no NaN/inf left to reject
+
+
+def test_overflowing_sum_is_a_mismatch_without_infinite_amounts():
+    with Reconciler() as rec:
+        rec.add("ours", ["x", "x"], [1e308, 1e308])
+        rec.add("theirs", ["x"], [1e308])
+        out = rec.finish()
+
+    assert out.categories["amount_mismatch"].count == 1
+    (item,) = out.samples["amount_mismatch"]
+    assert item.ours_amount is None and item.theirs_amount == 1e308
+    assert all(math.isfinite(c.ours_amount) and math.isfinite(c.theirs_amount) for c in out.categories.values())
+    out.model_dump_json()
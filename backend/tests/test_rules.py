@@ -0,0 +1,24 @@
+import time
+
+import pytest
+
+from app.generator.rules import spec_from_text
+
+
+def test_sequence_messages_are_split_at_the_first_arrow_and_colon():
+    spec = spec_from_text("sequence", "用户->>系统: 登录\n系统 -->> 用户：成功: 跳转首页\nA→B: x->y")
+    assert [(m["from"], m["to"], m["label"]) for m in spec["messages"]] == [
+        ("用户", "系统", "登录"),
+        ("系统", "用户", "成功: 跳转首页"),
+        ("A", "B", "x->y"),
+    ]
+
+
+@pytest.mark.parametrize("diagram_type", ["flow", "sequence", "state"])
+@pytest.mark.parametrize(
+    "line", ["a->" * 4000, "a->" * 4000 + ":", "a -> " * 300 + ": b"], ids=["arrows", "arrows-colon", "spaced"]
+)
+def test_long_arrow_lines_are_rejected_quickly(diagram_type, line):
+    start = time.perf_counter()
+    assert spec_from_text(diagram_type, line) is None
+    assert time.perf_counter() - start < 0.1
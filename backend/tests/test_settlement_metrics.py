@@ -0,0 +1,64 @@
+import pytest
+from pydantic import ValidationError
+
+from app.data_pipeline.groupby import SettlementGroupByRequest, compute_settlement_groupby
+from app.data_pipeline.reconcile import Reconciler
+from app.data_pipeline.settlement import (
+    SettlementColumnarRequest,
+    SettlementMetricsRequest,
+    compute_settlement_metrics,
+    compute_settlement_metrics_columnar,
+)
+
+
+def test_list_and_dict_amounts_count_as_zero():
+    rows = [{"amount": 1, "status": "success"}, {"amount": [1, 2], "status": "success"}, {"amount": {"v": 3}}]
+
+    metrics = compute_settlement_metrics(SettlementMetricsRequest(month="2024-01", rows=rows)).metrics
+    assert metrics["total_amount"] == 1.0
+    assert metrics["success_amount"] == 1.0
+    assert metrics["total_count"] == 3.0
+
+    columnar = SettlementColumnarRequest(
+        month="2024-01", amount=[r["amount"] for r in rows], status=[r.get("status", "") for r in rows]
+    )
+    assert compute_settlement_metrics_columnar(columnar).metrics == metrics
+
+
+def test_row_totals_are_exact_sums_like_the_columnar_endpoint():
+    # A left-to-right float sum gives 0.0 here; every endpoint reports the exact 1.0.
+    amounts = [1e16, 1.0, -1e16]
+    rows = [{"amount": a, "status": "success"} for a in amounts]
+
+    metrics = compute_settlement_metrics(SettlementMetricsRequest(month="2024-01", rows=rows)).metrics
+    columnar = compute_settlement_metrics_columnar(
+        SettlementColumnarRequest(month="2024-01", amount=amounts, status=["success"] * 3)
+    ).metrics
+    assert metrics["total_amount"] == metrics["success_amount"] == 1.0
+    assert columnar == metrics
+
+
+def test_groupby_and_reconcile_accept_ragged_amounts():
+    req = SettlementGroupByRequest(month="2024-01", amount=[1, [1, 2]], status=["success", "success"], channel=["a", "a"])
+    (group,) = compute_settlement_groupby(req).groups["channel"]
+    assert group.metrics["total_amount"] == 1.0
+
+    with Reconciler() as rec:
+        rec.add("ours", ["x", "y"], [1, [1, 2]])
+        rec.add("theirs", ["x", "y"], [1, 0])
+        assert rec.finish().categories["matched"].count == 2
+
+
+@pytest.mark.parametrize("accuracy", [1e-17, 1e-9, 0.9])
+def test_groupby_rejects_unusable_relative_accuracy(accuracy):
+    with pytest.raises(ValidationError):
+        SettlementGroupByRequest(month="2024-01", amount=[1.0], status=["success"], relative_accuracy=accuracy)
+
+
+def test_groupby_quantiles_at_the_finest_accuracy():
+    amounts = [float(i) for i in range(1, 1001)]
+    req = SettlementGroupByRequest(
+        month="2024-01", amount=amounts, status=["success"] * 1000, channel=["a"] * 1000, relative_accuracy=1e-4
+    )
+    (group,) = compute_settlement_groupby(req).groups["channel"]
+    assert group.metrics["amount_p50"] == pytest.approx(500.5, rel=2e-3)
@@ -0,0 +1,31 @@
+import json
+import math
+
+from app.data_pipeline.settlement import SettlementAggregate
+from app.data_pipeline.store import _decode_state, _encode_state
+
+
+def test_state_with_nan_amount_round_trips_through_strict_json():
+    agg = SettlementAggregate()
+    agg.add_columns([10.5, float("nan"), float("inf")], ["success", "success", "failed"])
+
+    # Strict JSON, as PostgreSQL's json/jsonb types require.
+    stored = json.loads(json.dumps(_encode_state(agg), allow_nan=False))
+    loaded = _decode_state(stored)
+
+    assert math.isnan(loaded.total_amount_special)
+    assert math.isnan(loaded.success_amount_special)
+    assert loaded.model_dump(exclude={"total_amount_special", "success_amount_special"}) == agg.model_dump(
+        exclude={"total_amount_special", "success_amount_special"}
+    )
+    assert math.isnan(loaded.merge(SettlementAggregate()).metrics()["total_amount"])
+
+
+def test_negative_infinity_round_trips():
+    agg = SettlementAggregate()
+    agg.add_columns([-math.inf, 1.0], ["success", "pending"])
+
+    loaded = _decode_state(json.loads(json.dumps(_encode_state(agg), allow_nan=False)))
+
+    assert loaded.total_amount_special == -math.inf
+    assert loaded.metrics()["success_amount"] == -math.inf
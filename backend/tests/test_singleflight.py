@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.core.settings import settings
+from app.core.singleflight import SingleFlight
+from app.generator.rules import FastPathUnavailable
+
+
+class FakeRedis:
+    """The handful of Redis commands SingleFlight uses, shared by several "processes"."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+        self.lock = threading.Lock()
+
+    def ping(self):
+        return True
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode() if isinstance(value, str) else value
+            return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def incr(self, key):
+        with self.lock:
+            self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+            return int(self.data[key])
+
+    def decr(self, key):
+        with self.lock:
+            self.data[key] = str(int(self.data.get(key, b"0")) - 1).encode()
+            return int(self.data[key])
+
+    def expire(self, key, seconds):
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token.encode():
+            self.data.pop(key)
+
+
+class _Spec(BaseModel):
+    count: int
+
+
+def _validation_error() -> ValidationError:
+    try:
+        _Spec.model_validate({"count": "many"})
+    except ValidationError as e:
+        return e
+    raise AssertionError("unreachable")
+
+
+@pytest.fixture
+def processes(monkeypatch):
+    monkeypatch.setattr(settings, "TASK_MODE", "celery")
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_DISTRIBUTED", True)
+    redis = FakeRedis()
+
+    def make() -> SingleFlight:
+        sf = SingleFlight()
+        sf._redis = redis
+        return sf
+
+    return [make() for _ in range(3)]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        FastPathUnavailable("text is not structured"),
+        ValueError("missing nodes"),
+        json.JSONDecodeError("Expecting value", "not json", 0),
+        _validation_error(),
+    ],
+    ids=["fast_path", "value", "json", "validation"],
+)
+def test_leader_error_reaches_followers_with_its_type_and_no_extra_calls(processes, error):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        raise error
+
+    async def main():
+        return await asyncio.gather(
+            *(sf.do("k", fn, encode=lambda v: v, decode=lambda v: v) for sf in processes), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    for r in results:
+        assert type(r) is type(error)
+        if isinstance(error, ValidationError):
+            assert r.errors()[0]["loc"] == ("count",)
+        else:
+            assert str(error) in str(r)
+
+
+def test_local_fallback_does_not_retry_a_failing_call(processes):
+    def unreachable(*args, **kwargs):
+        raise ConnectionError("redis went away")
+
+    processes[0]._redis.set = unreachable
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        raise ValueError("provider said no")
+
+    with pytest.raises(ValueError):
+        asyncio.run(processes[0].do("k", fn, encode=lambda v: v, decode=lambda v: v))
+    assert len(calls) == 1
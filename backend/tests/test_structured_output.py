@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app.llm.ollama as ollama
+from app.core.settings import settings
+from app.llm.structured import StructuredLevel, rejects_structured
+from app.llm.types import ChatMessage, LLMChatRequest
+
+_SCHEMA = {"type": "object", "properties": {"type": {"type": "string"}}}
+
+
+@pytest.mark.parametrize(
+    "status, body, fields, expected",
+    [
+        (400, '{"error": "invalid json in messages"}', ("format",), False),
+        (
+            400,
+            '{"error": {"message": "Invalid value for response_format: expected an object", "param": "response_format"}}',
+            ("response_format",),
+            False,
+        ),
+        (
+            400,
+            '{"error": {"message": "response_format json_schema is not supported with this model", "param": "response_format"}}',
+            ("response_format",),
+            True,
+        ),
+        (400, '{"error":"json: cannot unmarshal object into Go struct field ChatRequest.format of type string"}', ("format",), True),
+        (422, '{"detail": [{"loc": ["body", "response_format"], "msg": "Extra inputs are not permitted"}]}', ("response_format",), True),
+        (400, '{"error": "unsupported image format"}', ("format",), False),
+        (400, "Unrecognized request argument supplied: response_format", ("response_format",), True),
+        (500, "response_format is not supported", ("response_format",), False),
+    ],
+)
+def test_rejects_structured_needs_the_field_named_as_unsupported(status, body, fields, expected):
+    assert rejects_structured(status, body, fields) is expected
+
+
+def _run_chat(monkeypatch, error_body: str) -> tuple[ollama.OllamaProvider, list]:
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        sent.append(body.get("format"))
+        if len(sent) == 1:
+            return httpx.Response(400, json={"error": error_body})
+        return httpx.Response(200, json={"message": {"content": "{}"}})
+
+    async def main() -> ollama.OllamaProvider:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(ollama, "get_http_client", lambda *a, **k: client)
+        provider = ollama.OllamaProvider("http://ollama", "m")
+        req = LLMChatRequest(messages=[ChatMessage(role="user", content="x")], response_schema=_SCHEMA)
+        try:
+            await provider.chat(req)
+        except httpx.HTTPStatusError:
+            pass
+        return provider
+
+    return asyncio.run(main()), sent
+
+
+def test_unrelated_400_leaves_the_level_unchanged(monkeypatch):
+    provider, sent = _run_chat(monkeypatch, "invalid json in messages")
+    assert sent == [_SCHEMA]
+    assert provider.structured.current(_SCHEMA) == "schema"
+
+
+def test_unsupported_format_downgrades_and_retries(monkeypatch):
+    provider, sent = _run_chat(monkeypatch, "json: cannot unmarshal object into Go struct field ChatRequest.format of type string")
+    assert sent == [_SCHEMA, "json"]
+    assert provider.structured.current(_SCHEMA) == "json"
+
+
+def test_downgrade_expires(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_STRUCTURED_OUTPUT", True)
+    monkeypatch.setattr(settings, "LLM_STRUCTURED_RETRY_SECONDS", 0.0)
+    level = StructuredLevel()
+    assert level.downgrade("schema")
+    level.downgraded_at -= 1
+    assert level.current(_SCHEMA) == "schema"
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark model-output JSON parsing: legacy extractor vs app.generator.jsonrepair.
+
+  speed     a large flow spec wrapped in prose + a markdown fence (the legacy path
+            fails json.loads, then scans every character in Python)
+  recovery  near-miss outputs (cut at random offsets as by max_tokens, trailing
+            commas, Python literals): share that still becomes a valid spec built
+            from the output (legacy parse vs the service's parsing path)
+
+  python scripts/bench_jsonrepair.py --nodes 20000 --samples 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.generator.diagram import DiagramGenerateRequest  # noqa: E402
+from app.generator.jsonrepair import repair_json  # noqa: E402
+from app.generator.service import _diagram_from_content  # noqa: E402
+from app.generator.spec import FlowSpec  # noqa: E402
+
+
+def _legacy_extract(text: str) -> Optional[str]:
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+    return None
+
+
+def _legacy_parse(text: str) -> dict:
+    t = (text or "").strip()
+    try:
+        return json.loads(t)
+    except Exception:
+        pass
+    candidate = _legacy_extract(t)
+    if not candidate:
+        raise ValueError("LLM output does not contain a JSON object")
+    return json.loads(candidate)
+
+
+def _spec(nodes: int, rng: random.Random) -> dict:
+    return {
+        "type": "flow",
+        "direction": "TD",
+        "nodes": [{"id": f"n{i}", "label": f"步骤 {i} \"校验\""} for i in range(nodes)],
+        "edges": [{"from": f"n{i}", "to": f"n{rng.randrange(nodes)}", "label": "ok"} for i in range(nodes)],
+    }
+
+
+def _wrap(body: str) -> str:
+    return f"Here is the diagram spec:\n```json\n{body}\n```\nLet me know if you need changes."
+
+
+def _legacy_valid(text: str) -> bool:
+    try:
+        FlowSpec.model_validate(_legacy_parse(text))
+        return True
+    except Exception:
+        return False
+
+
+_REQ = DiagramGenerateRequest(diagram_type="flow", text="fallback")
+
+
+def _service_valid(text: str) -> bool:
+    try:
+        resp = _diagram_from_content(_REQ, text)
+    except Exception:
+        return False
+    # Specs here use ids n0..; the text fallback would start at n1.
+    return bool(resp.spec["nodes"]) and resp.spec["nodes"][0]["id"] == "n0"
+
+
+def _near_misses(samples: int, rng: random.Random) -> list[str]:
+    out = []
+    for _ in range(samples):
+        body = json.dumps(_spec(rng.randint(3, 40), rng), ensure_ascii=False, indent=rng.choice([None, 2]))
+        kind = rng.random()
+        if kind < 0.7:
+            # Cut off by max_tokens somewhere after the type field.
+            body = body[: rng.randint(body.index('"nodes"') + 20, len(body) - 1)]
+            out.append(f"```json\n{body}")
+        elif kind < 0.85:
+            out.append(_wrap(body.replace("}]", "},]", 1)))
+        else:
+            out.append(_wrap(body.replace('"label": "ok"', '"label": None', 1)))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--samples", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    text = _wrap(json.dumps(_spec(args.nodes, rng), ensure_ascii=False, indent=2))
+    print(f"speed: {len(text) / 1e6:.1f} MB of wrapped JSON")
+    t0 = time.perf_counter()
+    legacy = _legacy_parse(text)
+    print(f"  legacy scan            {time.perf_counter() - t0:8.3f}s")
+    t0 = time.perf_counter()
+    fixed = repair_json(text)
+    print(f"  repair_json            {time.perf_counter() - t0:8.3f}s  identical={fixed.value == legacy}")
+
+    truncated = text[: len(text) * 2 // 3]
+    t0 = time.perf_counter()
+    fixed = repair_json(truncated)
+    elapsed = time.perf_counter() - t0
+    print(f"  repair_json truncated  {elapsed:8.3f}s  nodes kept={len(fixed.value['nodes'])}  {fixed.repairs}")
+
+    cases = _near_misses(args.samples, rng)
+    ok_legacy = sum(_legacy_valid(c) for c in cases)
+    ok_new = sum(_service_valid(c) for c in cases)
+    print(f"recovery: {len(cases)} near-miss outputs")
+    print(f"  legacy                 {ok_legacy / len(cases):8.1%}")
+    print(f"  repair_json            {ok_new / len(cases):8.1%}")
+
+
+if __name__ == "__main__":
+    main()
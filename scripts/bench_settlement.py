@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark row-dict vs columnar (NumPy) settlement metrics.
+
+For each size, builds synthetic payment rows, then times request validation and
+metric computation for both paths and checks that the metrics are identical.
+`--workers N` adds the process-pool sharded path (N worker processes); `--files`
+adds Parquet and Arrow IPC files read through the memory-mapped file path
+(needs pyarrow; file writing is not timed).
+
+  python scripts/bench_settlement.py --sizes 10000,1000000,10000000 --workers 4
+
+The row path needs several GB of RAM at 10M rows; use --skip-rows-above to cap it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.settings import settings  # noqa: E402
+from app.data_pipeline.arrow_input import SettlementFileRequest, compute_settlement_metrics_file  # noqa: E402
+from app.data_pipeline.parallel import compute_settlement_metrics_parallel, shutdown_settlement_pool  # noqa: E402
+from app.data_pipeline.settlement import (  # noqa: E402
+    SettlementColumnarRequest,
+    SettlementMetricsRequest,
+    compute_settlement_metrics,
+    compute_settlement_metrics_columnar,
+)
+
+_STATUSES = ["success", "succeeded", "ok", "failed", "error", "pending", "processing"]
+_CHANNELS = ["alipay", "wechat", "card", "bank"]
+
+
+def _columns(n: int, seed: int) -> tuple[list[float], list[str], list[str]]:
+    rng = random.Random(seed)
+    amount = [round(rng.uniform(1, 5000), 2) for _ in range(n)]
+    status = [rng.choice(_STATUSES) for _ in range(n)]
+    channel = [rng.choice(_CHANNELS) for _ in range(n)]
+    return amount, status, channel
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def _file_lines(n: int, amount: list[float], status: list[str], expected: dict[str, float]) -> list[str]:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = pa.table({"amount": amount, "status": status})
+    lines: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SETTLEMENT_DATA_DIR = tmp
+        pq.write_table(table, f"{tmp}/s.parquet")
+        feather.write_feather(table, f"{tmp}/s.arrow", compression="uncompressed")
+        for name, label in (("s.parquet", "parquet"), ("s.arrow", "arrow")):
+            res, t = _timed(lambda: compute_settlement_metrics_file(SettlementFileRequest(month="2026-01", path=name)))
+            lines.append(f"{n:>10}  {label:<8} {0.0:>10.3f} {t:>10.3f} {t:>9.3f}  {res.metrics == expected}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,1000000,10000000")
+    parser.add_argument("--skip-rows-above", type=int, default=0, help="skip the row-dict path above this size (0 = never)")
+    parser.add_argument("--workers", type=int, default=0, help="also time the sharded path with N processes")
+    parser.add_argument("--files", action="store_true", help="also time Parquet / Arrow IPC file input")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<8} {'validate_s':>10} {'compute_s':>10} {'total_s':>9}  match")
+    for n in (int(x) for x in args.sizes.split(",") if x.strip()):
+        amount, status, channel = _columns(n, args.seed)
+
+        creq, cv = _timed(lambda: SettlementColumnarRequest(month="2026-01", amount=amount, status=status, channel=channel))
+        cres, cc = _timed(lambda: compute_settlement_metrics_columnar(creq))
+        parallel_line = ""
+        if args.workers:
+            compute_settlement_metrics_parallel(creq, args.workers)  # warm the pool
+            pres, pc = _timed(lambda: compute_settlement_metrics_parallel(creq, args.workers))
+            parallel_line = f"{n:>10}  {'parallel':<8} {cv:>10.3f} {pc:>10.3f} {cv + pc:>9.3f}  {pres.metrics == cres.metrics}"
+        if args.files:
+            parallel_line = "\n".join(filter(None, [parallel_line, *_file_lines(n, amount, status, cres.metrics)]))
+
+        if args.skip_rows_above and n > args.skip_rows_above:
+            print(f"{n:>10}  {'columnar':<8} {cv:>10.3f} {cc:>10.3f} {cv + cc:>9.3f}  (rows skipped)")
+            if parallel_line:
+                print(parallel_line)
+            continue
+
+        rows = [{"amount": a, "status": s, "channel": c} for a, s, c in zip(amount, status, channel)]
+        rreq, rv = _timed(lambda: SettlementMetricsRequest(month="2026-01", rows=rows))
+        rres, rc = _timed(lambda: compute_settlement_metrics(rreq))
+        match = rres.metrics == cres.metrics
+
+        print(f"{n:>10}  {'rows':<8} {rv:>10.3f} {rc:>10.3f} {rv + rc:>9.3f}")
+        print(f"{n:>10}  {'columnar':<8} {cv:>10.3f} {cc:>10.3f} {cv + cc:>9.3f}  {match}")
+        if parallel_line:
+            print(parallel_line)
+        if not match:
+            print(f"  rows:     {rres.metrics}\n  columnar: {cres.metrics}")
+        del rows, rreq
+    shutdown_settlement_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Concurrency load test for the generate endpoints (no real LLM needed).
+
+Replaces the LLM provider with a fake one that sleeps `--delay` seconds, fires
+`--requests` concurrent POST /api/diagram/generate calls through the ASGI app and
+probes /health and /api/artifacts/ while they are in flight.
+
+  python scripts/load_test_generate.py --requests 200 --delay 2
+
+With the async pipeline the wall time stays close to one provider delay and peak
+in-flight provider calls equals the request count. `--mode threadpool` routes the
+same load through the sync wrapper inside a threadpool (the old design) for
+comparison: it is capped by the anyio thread limiter (40 by default).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+from app.generator import service  # noqa: E402
+from app.generator.diagram import DiagramGenerateRequest  # noqa: E402
+from app.llm.types import LLMChatResponse  # noqa: E402
+from app.main import create_app  # noqa: E402
+
+_FLOW_JSON = '{"type":"flow","direction":"TD","nodes":[{"id":"a","label":"A"},{"id":"b","label":"B"}],"edges":[{"from":"a","to":"b"}]}'
+
+
+class FakeProvider:
+    name = "fake"
+    model = "fake"
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def chat(self, req):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return LLMChatResponse(content=_FLOW_JSON)
+        finally:
+            self.in_flight -= 1
+
+    async def chat_stream(self, req):
+        yield (await self.chat(req)).content
+
+
+async def _probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.05)
+
+
+async def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--delay", type=float, default=2.0, help="fake LLM latency in seconds")
+    p.add_argument("--mode", choices=["async", "threadpool"], default="async")
+    args = p.parse_args()
+
+    fake = FakeProvider(args.delay)
+    service.get_provider = lambda: fake  # type: ignore[assignment]
+
+    app = create_app()
+    path = "/api/diagram/generate"
+    if args.mode == "threadpool":
+        path = "/_loadtest/generate-threadpool"
+
+        @app.post(path)
+        def _threadpool_generate(req: DiagramGenerateRequest):  # sync route -> anyio threadpool
+            return service.generate_diagram_sync(req)
+
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=600, limits=limits) as client:
+        stop = asyncio.Event()
+        health: list[float] = []
+        artifacts: list[float] = []
+        probes = [
+            asyncio.create_task(_probe(client, "/health", stop, health)),
+            asyncio.create_task(_probe(client, "/api/artifacts/?limit=1", stop, artifacts)),
+        ]
+
+        body = {"diagram_type": "flow", "text": "A -> B"}
+        started = time.perf_counter()
+        results = await asyncio.gather(*(client.post(path, json=body) for _ in range(args.requests)))
+        wall = time.perf_counter() - started
+
+        stop.set()
+        await asyncio.gather(*probes)
+
+    ok = sum(1 for r in results if r.status_code == 200)
+    thread_capped = -(-args.requests // 40)  # default anyio thread limiter: 40 tokens
+    print(f"mode={args.mode} requests={args.requests} ok={ok} delay={args.delay}s")
+    print(f"wall={wall:.2f}s (~{wall / args.delay:.1f}x provider delay; a 40-thread cap needs ~{thread_capped}x)")
+    print(f"peak concurrent provider calls={fake.peak}")
+    for name, samples in (("/health", health), ("/api/artifacts/", artifacts)):
+        if samples:
+            print(f"{name}: n={len(samples)} p50={statistics.median(samples):.1f}ms max={max(samples):.1f}ms")
+    return 0 if ok == args.requests else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))